@@ -2,6 +2,8 @@
 # __date__: 2018-12-1
 # expression: -A + B + -C - --D + --E - +F
 
+import operator
+
 ###############################################################################
 #                                                                             #
 #  LEXER                                                                      #
@@ -194,6 +196,8 @@ class Parser(object):
 			node = self.expr()
 			self.eat(RPAREN)
 			return node
+		else:
+			self.error()
 
 	def term(self):
 		'''
@@ -265,7 +269,7 @@ class NodeVisitor(object):
 		'''
 		节点默认访问方法
 		'''
-		raise Exception("No visit_{} method".format(node.__name__))
+		raise Exception("No visit_{} method".format(type(node).__name__))
 
 class Interpreter(NodeVisitor):
 	'''
@@ -311,6 +315,94 @@ class Interpreter(NodeVisitor):
 		return self.visit(tree)
 
 
+###############################################################################
+#                                                                             #
+#  EVALUATOR                                                                  #
+#                                                                             #
+###############################################################################
+
+class EvalError(object):
+	'''
+	求值过程中产生的异常，推迟到解析完成后再抛出
+	'''
+	def __init__(self, exc):
+		self.exc = exc
+
+class Evaluator(Parser):
+	'''
+	单遍求值器
+	在算符优先解析的同时直接计算结果，不构建语法树，适用于只求值一次的表达式。
+	语法错误立即抛出，运算错误推迟到解析结束，
+	因此结果和异常都与Parser + Interpreter的路径一致
+	'''
+	BINARY = {
+		PLUS: (1, operator.add),
+		MINUS: (1, operator.sub),
+		MUL: (2, operator.mul),
+		DIV: (2, operator.truediv),
+	}
+
+	UNARY = {
+		PLUS: operator.pos,
+		MINUS: operator.neg,
+	}
+
+	def apply(self, op, *args):
+		'''
+		计算一次运算，操作数中已有错误时按求值顺序传递第一个错误
+		'''
+		for arg in args:
+			if arg.__class__ is EvalError:
+				return arg
+		try:
+			return op(*args)
+		except Exception as e:
+			return EvalError(e)
+
+	def factor(self):
+		'''
+		因子求值
+		factor : (PLUS|MINUS) factor | INTEGER | LPAREN expr RPAREN
+		'''
+		token = self.current_token
+		if token.type == INTEGER:
+			self.eat(INTEGER)
+			return token.value
+		elif token.type in self.UNARY:
+			self.eat(token.type)
+			return self.apply(self.UNARY[token.type], self.factor())
+		elif token.type == LPAREN:
+			self.eat(LPAREN)
+			value = self.expr()
+			self.eat(RPAREN)
+			return value
+		else:
+			self.error()
+
+	def expr(self, min_prec=1):
+		'''
+		算符优先求值，同级运算左结合
+		'''
+		value = self.factor()
+		while True:
+			token = self.current_token
+			binary = self.BINARY.get(token.type)
+			if binary is None or binary[0] < min_prec:
+				return value
+			prec, op = binary
+			self.eat(token.type)
+			value = self.apply(op, value, self.expr(prec + 1))
+
+	def evaluate(self):
+		'''
+		解析并计算表达式
+		'''
+		value = self.expr()
+		if value.__class__ is EvalError:
+			raise value.exc
+		return value
+
+
 def main():
 	while True:
 		try:
@@ -322,9 +414,8 @@ def main():
 			continue
 
 		lexer = Lexer(text)
-		parser = Parser(lexer)
-		interpreter = Interpreter(parser)
-		result = interpreter.interpret()
+		evaluator = Evaluator(lexer)
+		result = evaluator.evaluate()
 		print(result)
 
 
@@ -0,0 +1,61 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+语句的变量读写分析
+
+usage返回语句读取和写入的变量名，供并行调度、循环编译、部分求值和规范化共用，
+只依赖inter模块。
+'''
+
+from inter import NodeVisitor
+
+class VariableUsage(NodeVisitor):
+	'''
+	收集语句读取和写入的变量名
+	'''
+	def __init__(self):
+		self.reads = set()
+		self.writes = set()
+
+	def visit_BinOp(self, node):
+		self.visit(node.left)
+		self.visit(node.right)
+
+	def visit_UnaryOp(self, node):
+		self.visit(node.expr)
+
+	def visit_Num(self, node):
+		pass
+
+	def visit_Compound(self, node):
+		for child in node.children:
+			self.visit(child)
+
+	def visit_NoOp(self, node):
+		pass
+
+	def visit_Assign(self, node):
+		self.visit(node.right)
+		self.writes.add(node.left.value)
+
+	def visit_Var(self, node):
+		self.reads.add(node.value)
+
+	def visit_While(self, node):
+		self.visit(node.cond)
+		self.visit(node.body)
+
+	def visit_For(self, node):
+		self.visit(node.start)
+		self.visit(node.end)
+		self.writes.add(node.var.value)
+		self.visit(node.body)
+
+def usage(node):
+	'''
+	返回语句的(读集合, 写集合)
+	'''
+	collector = VariableUsage()
+	collector.visit(node)
+	return collector.reads, collector.writes
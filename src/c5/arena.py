@@ -0,0 +1,194 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+多进程求值的共享内存结果区
+
+结果区是一块multiprocessing.shared_memory，每个程序占一行，
+每个变量(按共享的标识符表编号)占一列，每个槽由1字节类型标记和8字节值组成:
+
+	values : rows * columns * 8 字节，按标记解释为int64或float64
+	tags   : rows * columns 字节，EMPTY / INT / FLOAT
+
+工作进程把最终变量直接写入自己那一行，只有超出int64的大整数和
+不在标识符表中的变量才通过pickle返回。父进程通过memoryview
+(或NumPy视图)零拷贝读取。出错的程序对应异常对象，它的那一行为空。
+
+	with make_executor() as executor, ResultArena(names, len(texts)) as arena:
+		overflows = evaluate_many(texts, arena, executor)
+		scope = arena.read(0, overflows[0])
+'''
+
+from multiprocessing.shared_memory import SharedMemory
+
+from inter import Lexer, Parser, Interpreter, SymbolTable
+
+TAG_EMPTY, TAG_INT, TAG_FLOAT = 0, 1, 2
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+class ResultArena(object):
+	'''
+	共享内存结果区
+	names: 列对应的变量名(列表或SymbolTable)
+	rows: 行数，即程序个数
+	'''
+	def __init__(self, names, rows, name=None):
+		if isinstance(names, SymbolTable):
+			names = names.names
+		self.names = list(names)
+		self.columns = {name: i for i, name in enumerate(self.names)}
+		self.rows = rows
+		slots = rows * len(self.names)
+		if name is None:
+			self.shm = SharedMemory(create=True, size=max(slots * 9, 1))
+			self.owner = True
+		else:
+			self.shm = SharedMemory(name=name)
+			self.owner = False
+		self.values = self.shm.buf[:slots * 8]
+		self.ints = self.values.cast('q')
+		self.floats = self.values.cast('d')
+		self.tags = self.shm.buf[slots * 8:slots * 9]
+
+	def layout(self):
+		'''
+		在其他进程中重新打开结果区所需的参数
+		'''
+		return self.shm.name, self.names, self.rows
+
+	@classmethod
+	def attach(cls, layout):
+		name, names, rows = layout
+		return cls(names, rows, name)
+
+	def clear(self, row):
+		'''
+		清空第row行
+		'''
+		width = len(self.names)
+		self.tags[row * width:(row + 1) * width] = bytes(width)
+
+	def write(self, row, scope):
+		'''
+		把变量写入第row行，返回放不进槽的变量
+		行中原有的变量先清空，复用的行不会读出上一个程序的变量
+		'''
+		overflow = {}
+		base = row * len(self.names)
+		columns = self.columns
+		ints, floats, tags = self.ints, self.floats, self.tags
+		self.clear(row)
+		for name, value in scope.items():
+			column = columns.get(name)
+			if column is None:
+				overflow[name] = value
+			elif type(value) is int and INT64_MIN <= value <= INT64_MAX:
+				ints[base + column] = value
+				tags[base + column] = TAG_INT
+			elif type(value) is float:
+				floats[base + column] = value
+				tags[base + column] = TAG_FLOAT
+			else:
+				overflow[name] = value
+		return overflow
+
+	def read(self, row, overflow=None):
+		'''
+		读出第row行的变量，合并写入时放不进槽的变量(为异常对象时忽略)
+		'''
+		scope = {}
+		base = row * len(self.names)
+		ints, floats, tags = self.ints, self.floats, self.tags
+		for column, name in enumerate(self.names, base):
+			tag = tags[column]
+			if tag == TAG_INT:
+				scope[name] = ints[column]
+			elif tag == TAG_FLOAT:
+				scope[name] = floats[column]
+		if overflow and not isinstance(overflow, Exception):
+			scope.update(overflow)
+		return scope
+
+	def numpy(self):
+		'''
+		返回(tags, ints, floats)三个rows x columns的NumPy视图，不复制数据
+		关闭结果区前需要先释放这些视图
+		'''
+		import numpy
+
+		shape = (self.rows, len(self.names))
+		return (
+			numpy.frombuffer(self.tags, numpy.uint8).reshape(shape),
+			numpy.frombuffer(self.values, numpy.int64).reshape(shape),
+			numpy.frombuffer(self.values, numpy.float64).reshape(shape),
+		)
+
+	def close(self):
+		for view in (self.ints, self.floats, self.values, self.tags):
+			view.release()
+		self.shm.close()
+		if self.owner:
+			self.shm.unlink()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+
+###############################################################################
+#                                                                             #
+#  EVALUATION                                                                 #
+#                                                                             #
+###############################################################################
+
+_attached = None		#工作进程中最近打开的结果区
+
+def make_executor(max_workers=None):
+	'''
+	创建用于结果区的进程池
+	先启动resource_tracker再创建工作进程，使工作进程与父进程共用同一个tracker，
+	否则工作进程退出时它自己的tracker会删除父进程仍在使用的共享内存
+	'''
+	import multiprocessing
+	from multiprocessing import resource_tracker
+	from concurrent.futures import ProcessPoolExecutor
+
+	resource_tracker.ensure_running()
+	if 'fork' in multiprocessing.get_all_start_methods():
+		context = multiprocessing.get_context('fork')
+	else:
+		context = multiprocessing.get_context()
+	return ProcessPoolExecutor(max_workers, mp_context=context)
+
+def evaluate_into(layout, row, text):
+	'''
+	在工作进程中执行程序，结果写入结果区的第row行，返回放不进槽的变量
+	'''
+	global _attached
+	if _attached is None or _attached.shm.name != layout[0]:
+		if _attached is not None:
+			_attached.close()
+		_attached = ResultArena.attach(layout)
+	interpreter = Interpreter(Parser(Lexer(text)), scope={})
+	interpreter.interpret()
+	return _attached.write(row, interpreter.GLOBAL_SCOPE)
+
+def evaluate_many(texts, arena, executor):
+	'''
+	用make_executor()创建的进程池并行执行多个程序，第i个程序的结果写入第i行
+	返回每个程序放不进槽的变量，出错的程序对应异常对象，它的那一行被清空
+	'''
+	layout = arena.layout()
+	futures = [
+		executor.submit(evaluate_into, layout, row, text) for row, text in enumerate(texts)
+	]
+	results = []
+	for row, future in enumerate(futures):
+		try:
+			results.append(future.result())
+		except Exception as e:
+			arena.clear(row)
+			results.append(e)
+	return results
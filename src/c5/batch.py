@@ -0,0 +1,140 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+批处理模式
+
+从文件或标准输入读取多个程序(每个程序以END.结束)，逐个执行，
+每个程序输出一行JSON，结果成批写出:
+
+	{"program": 1, "line": 1, "scope": {"a": 1}}
+	{"program": 2, "line": 3, "error": {"type": "ParserError", "message": "Invalid syntax", "line": 4, "column": 7}}
+
+每个程序在独立的变量作用域中执行，有程序出错时inter.py --batch以状态码1退出。
+'''
+
+import json
+import re
+import sys
+
+from inter import Error, Lexer, Parser, Interpreter
+
+BOUNDARY = re.compile(r'\bEND\s*\.')
+
+#结果中没有循环引用，复用一个不做循环检查的编码器
+ENCODER = json.JSONEncoder(check_circular=False)
+
+def split_programs(source):
+	'''
+	按END.切分输入，产生(行号, 列号, 程序文本)，行列号为程序第一个字符的位置
+	source为文件对象，按块读取
+	'''
+	buffer = ''
+	pos = 0
+	line = column = 1
+	for chunk in iter(lambda: source.read(1 << 16), ''):
+		buffer = buffer[pos:] + chunk
+		pos = 0
+		while True:
+			match = BOUNDARY.search(buffer, pos)
+			if match is None:
+				break
+			text = buffer[pos:match.end()]
+			pos = match.end()
+			yield start(line, column, text)
+			line, column = advance(line, column, text)
+	if buffer[pos:].strip():
+		yield start(line, column, buffer[pos:])
+
+def advance(line, column, text):
+	'''
+	位于(line, column)的文本之后的位置
+	'''
+	newlines = text.count('\n')
+	if newlines:
+		return line + newlines, len(text) - text.rfind('\n')
+	return line, column + len(text)
+
+def start(line, column, text):
+	'''
+	跳过程序前的空白字符
+	'''
+	program = text.lstrip()
+	line, column = advance(line, column, text[:len(text) - len(program)])
+	return line, column, program
+
+class Pipeline(object):
+	'''
+	可复用的执行管线: 解析并执行一个程序，返回可序列化为JSON的结果
+	'''
+	def __init__(self):
+		self.count = 0
+
+	def run(self, line, column, text):
+		self.count += 1
+		result = {'program': self.count, 'line': line}
+		try:
+			tree = Parser(Lexer(text)).parse()
+		except Exception as e:
+			error = {'type': type(e).__name__, 'message': getattr(e, 'message', str(e))}
+			error_line, error_column = e.location() if isinstance(e, Error) else (None, None)
+			if error_line is not None:
+				if error_line == 1:
+					error_column += column - 1
+				error['line'] = line + error_line - 1
+				error['column'] = error_column
+			result['error'] = error
+			return result
+
+		try:
+			interpreter = Interpreter(None, scope={})
+			interpreter.visit(tree)
+		except Exception as e:
+			result['error'] = {'type': type(e).__name__, 'message': str(e)}
+		else:
+			result['scope'] = interpreter.GLOBAL_SCOPE
+		return result
+
+class BufferedWriter(object):
+	'''
+	累积输出行，达到batch_size行后一次写出
+	'''
+	def __init__(self, out, batch_size=1024):
+		self.out = out
+		self.batch_size = batch_size
+		self.lines = []
+
+	def write(self, line):
+		self.lines.append(line)
+		if len(self.lines) >= self.batch_size:
+			self.flush()
+
+	def flush(self):
+		if self.lines:
+			self.out.write(''.join(self.lines))
+			self.lines = []
+		self.out.flush()
+
+def run_batch(args, out=None):
+	'''
+	批处理入口，args为文件列表，为空或-表示标准输入
+	返回出错的程序数
+	'''
+	pipeline = Pipeline()
+	writer = BufferedWriter(out or sys.stdout)
+	names = args or ['-']
+	failed = 0
+	for name in names:
+		source = sys.stdin if name == '-' else open(name)
+		try:
+			for line, column, text in split_programs(source):
+				result = pipeline.run(line, column, text)
+				if len(names) > 1:
+					result['file'] = name
+				failed += 'error' in result
+				writer.write(ENCODER.encode(result) + '\n')
+		finally:
+			if source is not sys.stdin:
+				source.close()
+	writer.flush()
+	return failed
@@ -0,0 +1,1192 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+性能基准
+
+用法:
+	python bench.py            运行全部基准
+	python bench.py dispatch   只运行指定的基准
+'''
+
+import sys
+import time
+import tracemalloc
+
+from inter import (
+	EOF, ID, Token, Lexer, StreamLexer, Parser, RecoveringParser, Interpreter, NodeVisitor, Scope,
+	Evaluator, SymbolTable, ParserError
+)
+
+BENCHMARKS = {}
+
+def benchmark(name):
+	'''
+	注册基准函数
+	'''
+	def decorator(func):
+		BENCHMARKS[name] = func
+		return func
+	return decorator
+
+def timeit(func, repeat=5):
+	'''
+	重复执行func，返回最短耗时(秒)
+	'''
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func()
+		elapsed = time.perf_counter() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+def report(name, seconds, baseline=None):
+	'''
+	打印一行基准结果，给出相对基线的加速比
+	'''
+	line = '  {:<32} {:>10.2f} ms'.format(name, seconds * 1000)
+	if baseline is not None:
+		line += '   x{:.2f}'.format(baseline / seconds)
+	print(line)
+
+def make_program(n, width=4):
+	'''
+	生成含n条赋值语句的程序，每条语句引用前面的变量
+	'''
+	statements = ['v0 := 1']
+	for i in range(1, n):
+		operands = ['v{}'.format(j) for j in range(max(0, i - width), i)]
+		statements.append('v{} := ({}) * 3 - -{} / 2'.format(
+			i, ' + '.join(operands), i
+		))
+	return 'BEGIN ' + '; '.join(statements) + ' END.'
+
+def parse(text):
+	return Parser(Lexer(text)).parse()
+
+
+###############################################################################
+#                                                                             #
+#  DISPATCH                                                                   #
+#                                                                             #
+###############################################################################
+
+class ReflectiveInterpreter(Interpreter):
+	'''
+	按旧的方式通过拼接方法名和getattr分派的解释器，作为对照
+	'''
+	def visit(self, node):
+		method_name = 'visit_' + type(node).__name__
+		visitor = getattr(self, method_name, self.generic_visit)
+		return visitor(node)
+
+@benchmark('dispatch')
+def bench_dispatch():
+	tree = parse(make_program(2000))
+
+	def run(cls):
+		interpreter = cls(None)
+		interpreter.GLOBAL_SCOPE = {}
+		return lambda: interpreter.visit(tree)
+
+	baseline = timeit(run(ReflectiveInterpreter))
+	report('reflective getattr', baseline)
+	report('dispatch table', timeit(run(Interpreter)), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  STREAMING                                                                  #
+#                                                                             #
+###############################################################################
+
+class GeneratedSource(object):
+	'''
+	按需生成程序文本的只读文件对象，程序文本不会整体驻留内存
+	'''
+	def __init__(self, n):
+		self.n = n
+		self.i = 0
+		self.buffer = 'BEGIN '
+
+	def read(self, size):
+		while len(self.buffer) < size and self.i <= self.n:
+			if self.i == self.n:
+				self.buffer += ' END.'
+			else:
+				sep = '; ' if self.i else ''
+				self.buffer += '{}v{} := {} * 2 + {}'.format(sep, self.i % 1000, self.i, self.i % 7)
+			self.i += 1
+		data, self.buffer = self.buffer[:size], self.buffer[size:]
+		return data
+
+def peak_memory(func):
+	'''
+	返回func执行期间的内存峰值(字节)
+	'''
+	tracemalloc.start()
+	try:
+		func()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+@benchmark('stream')
+def bench_stream():
+	for n in (10000, 100000):
+		def tree():
+			interpreter = Interpreter(Parser(StreamLexer(GeneratedSource(n))))
+			interpreter.GLOBAL_SCOPE = {}
+			interpreter.interpret()
+
+		def stream():
+			interpreter = Interpreter(Parser(StreamLexer(GeneratedSource(n))))
+			interpreter.GLOBAL_SCOPE = {}
+			interpreter.interpret_stream()
+
+		print('  {} statements, peak memory'.format(n))
+		print('    {:<30} {:>10.1f} KB'.format('compound tree', peak_memory(tree) / 1024))
+		print('    {:<30} {:>10.1f} KB'.format('streaming', peak_memory(stream) / 1024))
+
+
+###############################################################################
+#                                                                             #
+#  PARALLEL                                                                   #
+#                                                                             #
+###############################################################################
+
+@benchmark('parallel')
+def bench_parallel():
+	from parallel import ParallelScheduler
+
+	factors = ' * '.join(['x'] * 24)
+	statements = ['x := ' + '7' * 2000]
+	statements += ['r{} := {} + {}'.format(i, factors, i) for i in range(8)]
+	statements += ['s{} := r{} - x'.format(i, i) for i in range(8)]
+	tree = parse('BEGIN ' + '; '.join(statements) + ' END.')
+
+	def sequential():
+		interpreter = Interpreter(None)
+		interpreter.GLOBAL_SCOPE = {}
+		interpreter.visit(tree)
+		return interpreter.GLOBAL_SCOPE
+
+	with ParallelScheduler() as scheduler:
+		def parallel():
+			scope = {}
+			scheduler.run(tree, scope)
+			return scope
+
+		assert list(parallel().items()) == list(sequential().items())
+		#变量按顺序执行时第一次赋值的顺序写入作用域，而不是按依赖层次
+		ordered = {}
+		scheduler.run(parse('BEGIN x := 1; y := x; z := 2 END.'), ordered)
+		assert list(ordered) == ['x', 'y', 'z']
+		#出错的语句之后不终止的循环不会与它并发执行，与顺序执行一样抛出异常
+		try:
+			scheduler.run(parse('BEGIN a := 1 / 0; WHILE 1 DO b := 1 END.'), {})
+		except ZeroDivisionError:
+			pass
+		else:
+			raise AssertionError('expected ZeroDivisionError')
+		baseline = timeit(sequential, repeat=3)
+		report('sequential visit_Compound', baseline)
+		report('parallel scheduler', timeit(parallel, repeat=3), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  SNAPSHOT                                                                   #
+#                                                                             #
+###############################################################################
+
+@benchmark('fork')
+def bench_fork():
+	prefix = make_program(1000)
+	variants = [
+		'BEGIN v1 := {}; w := v1 * v999 END.'.format(i) for i in range(20)
+	]
+
+	def rerun():
+		for variant in variants:
+			interpreter = Interpreter(Parser(Lexer(prefix)), scope={})
+			interpreter.interpret()
+			Interpreter(Parser(Lexer(variant)), scope=interpreter.GLOBAL_SCOPE).interpret()
+
+	def fork():
+		interpreter = Interpreter(Parser(Lexer(prefix)), scope={})
+		interpreter.interpret()
+		snapshot = interpreter.snapshot()
+		for variant in variants:
+			Interpreter(Parser(Lexer(variant)), scope=snapshot.child()).interpret()
+
+	baseline = timeit(rerun, repeat=1)
+	report('re-execute prefix per variant', baseline)
+	report('snapshot + fork', timeit(fork, repeat=3), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  SERIALIZATION                                                              #
+#                                                                             #
+###############################################################################
+
+@benchmark('serialize')
+def bench_serialize():
+	import pickle
+	import serialize
+
+	text = make_program(3000)
+	tree = parse(text)
+	data = serialize.dumps(tree)
+	pickled = pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)
+	print('  size: source {} B, binary {} B, pickle {} B'.format(
+		len(text), len(data), len(pickled)
+	))
+
+	baseline = timeit(lambda: parse(text))
+	report('re-parse source', baseline)
+	report('pickle.loads', timeit(lambda: pickle.loads(pickled)), baseline)
+	report('serialize.loads', timeit(lambda: serialize.loads(data)), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  FAST PATH                                                                  #
+#                                                                             #
+###############################################################################
+
+def make_expressions(n, seed=0):
+	'''
+	生成n条随机的单行算术表达式
+	'''
+	import random
+	rng = random.Random(seed)
+
+	def expr(depth):
+		if depth == 0 or rng.random() < 0.3:
+			return str(rng.randint(1, 999))
+		if rng.random() < 0.15:
+			return '(' + expr(depth - 1) + ')'
+		if rng.random() < 0.1:
+			return '-' + expr(depth - 1)
+		return '{} {} {}'.format(expr(depth - 1), rng.choice('+-*/'), expr(depth - 1))
+
+	return [expr(4) for _ in range(n)]
+
+def evaluate_tree(text):
+	'''
+	语法树路径: Parser.expr + Interpreter
+	'''
+	parser = Parser(Lexer(text))
+	tree = parser.expr()
+	if parser.current_token.type != EOF:
+		parser.error()
+	return Interpreter(None).visit(tree)
+
+@benchmark('fastpath')
+def bench_fastpath():
+	expressions = make_expressions(5000)
+	assert [evaluate_tree(e) for e in expressions] == \
+		[Evaluator(Lexer(e)).evaluate() for e in expressions]
+
+	baseline = timeit(lambda: [evaluate_tree(e) for e in expressions])
+	report('parse + tree walk', baseline)
+	report('single-pass evaluator', timeit(
+		lambda: [Evaluator(Lexer(e)).evaluate() for e in expressions]
+	), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  WORKER POOL                                                                #
+#                                                                             #
+###############################################################################
+
+@benchmark('pool')
+def bench_pool():
+	import os
+	import subprocess
+	from pool import WorkerPool
+
+	program = 'BEGIN a := 2; b := a * (3 + -1) END.'
+	script = 'from inter import *; i = Interpreter(Parser(Lexer({!r}))); i.interpret()'.format(program)
+	here = os.path.dirname(os.path.abspath(__file__))
+
+	spawn = timeit(lambda: subprocess.run([sys.executable, '-c', script], cwd=here, check=True), repeat=10)
+	report('spawn process per job', spawn)
+
+	with WorkerPool(2, max_jobs=500) as pool:
+		pool.map([program] * 100)
+		jobs = 2000
+		elapsed = timeit(lambda: pool.map([program] * jobs), repeat=3)
+		report('prefork pool, per job', elapsed / jobs, spawn)
+		latency = timeit(lambda: pool.run(program), repeat=200)
+		report('prefork pool, round trip', latency, spawn)
+		print('  workers recycled: {}'.format(pool.recycled))
+
+	#异常退出的进程: 正在执行的任务失败，排在后面的任务由新进程执行，close不会阻塞
+	import signal
+	from concurrent.futures.process import BrokenProcessPool
+	with WorkerPool(1) as pool:
+		endless = pool.submit('BEGIN WHILE 1 DO a := 1 END.')
+		queued = pool.submit(program)
+		time.sleep(0.2)
+		os.kill(pool.workers[0].process.pid, signal.SIGKILL)
+		assert isinstance(endless.exception(timeout=10), BrokenProcessPool)
+		assert queued.result(timeout=10) == {'a': 2, 'b': 4}
+		assert pool.crashed == 1
+
+
+###############################################################################
+#                                                                             #
+#  STARTUP                                                                    #
+#                                                                             #
+###############################################################################
+
+STARTUP_BUDGET = 0.030		#导入inter的累计耗时上限(秒)
+STARTUP_FORBIDDEN = (		#导入inter时不允许加载的模块
+	'collections', 'asyncio', 'multiprocessing', 'concurrent',
+	'threading', 'numpy', 'argparse', 'json',
+)
+
+def import_times(code):
+	'''
+	用-X importtime执行code，返回 模块名 -> 累计耗时(秒)
+	'''
+	import os
+	import subprocess
+	here = os.path.dirname(os.path.abspath(__file__))
+	process = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', code],
+		cwd=here, stderr=subprocess.PIPE, universal_newlines=True, check=True
+	)
+	times = {}
+	for line in process.stderr.splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		_, cumulative, name = line[len('import time:'):].split('|')
+		times[name.strip()] = int(cumulative) / 1e6
+	return times
+
+@benchmark('startup')
+def bench_startup():
+	import os
+	import subprocess
+	here = os.path.dirname(os.path.abspath(__file__))
+
+	def run(*args):
+		return lambda: subprocess.run(
+			[sys.executable] + list(args), cwd=here, input='BEGIN a := 1 END.',
+			stdout=subprocess.DEVNULL, universal_newlines=True, check=True
+		)
+
+	baseline = timeit(run('-c', 'pass'), repeat=10)
+	report('python -c pass', baseline)
+	report('inter.py (repl)', timeit(run('inter.py'), repeat=10))
+	report('inter.py --stream', timeit(run('inter.py', '--stream'), repeat=10))
+	report('inter.py --parallel', timeit(run('inter.py', '--parallel'), repeat=10))
+
+	interpreter = import_times('pass')
+	best = None
+	for _ in range(5):
+		times = import_times('import inter')
+		if best is None or times['inter'] < best['inter']:
+			best = times
+	loaded = sorted(name for name in best if name != 'inter' and name not in interpreter)
+	print('  import inter: {:.2f} ms (budget {:.0f} ms), loads {}'.format(
+		best['inter'] * 1000, STARTUP_BUDGET * 1000, ', '.join(loaded) or '-'
+	))
+	forbidden = [name for name in loaded if name.split('.')[0] in STARTUP_FORBIDDEN]
+	if forbidden:
+		raise SystemExit('startup imports {}'.format(', '.join(forbidden)))
+	if best['inter'] > STARTUP_BUDGET:
+		raise SystemExit('startup over budget')
+
+
+###############################################################################
+#                                                                             #
+#  BATCH                                                                      #
+#                                                                             #
+###############################################################################
+
+@benchmark('batch')
+def bench_batch():
+	import os
+	import subprocess
+	here = os.path.dirname(os.path.abspath(__file__))
+	programs = ''.join(
+		'BEGIN a := {}; b := a * (a + 1); c := b / 2 END.\n'.format(i) for i in range(20000)
+	)
+
+	def run(*args):
+		return lambda: subprocess.run(
+			[sys.executable, 'inter.py'] + list(args), cwd=here, input=programs,
+			stdout=subprocess.DEVNULL, universal_newlines=True, check=True
+		)
+
+	baseline = timeit(run(), repeat=3)
+	report('interactive loop', baseline)
+	report('batch mode', timeit(run('--batch'), repeat=3), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  LEXER                                                                      #
+#                                                                             #
+###############################################################################
+
+def tokenize(text):
+	lexer = Lexer(text)
+	count = 0
+	while lexer.get_next_token().type != EOF:
+		count += 1
+	return count
+
+@benchmark('lexer')
+def bench_lexer():
+	text = make_program(3000)
+	count = tokenize(text)
+	elapsed = timeit(lambda: tokenize(text))
+	report('tokenize {} chars'.format(len(text)), elapsed)
+	print('  {:.2f} MB/s, {:.0f}k tokens/s'.format(
+		len(text) / elapsed / 1e6, count / elapsed / 1e3
+	))
+
+
+###############################################################################
+#                                                                             #
+#  ERROR RECOVERY                                                             #
+#                                                                             #
+###############################################################################
+
+@benchmark('recover')
+def bench_recover():
+	text = make_program(3000)
+	statements = text[len('BEGIN '):-len(' END.')].split('; ')
+	for i in range(0, len(statements), 150):
+		statements[i] = statements[i].replace(':=', ':= *', 1)
+	broken = 'BEGIN ' + '; '.join(statements) + ' END.'
+
+	parser = RecoveringParser(Lexer(broken))
+	parser.parse()
+	errors = len(parser.errors)
+
+	baseline = timeit(lambda: parse(text), repeat=3) * errors
+	report('{} parses, one per error'.format(errors), baseline)
+	report('one recovering parse', timeit(
+		lambda: RecoveringParser(Lexer(broken)).parse(), repeat=3
+	), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  CHUNKED PARSING                                                            #
+#                                                                             #
+###############################################################################
+
+@benchmark('chunked')
+def bench_chunked():
+	import serialize
+	from parallel import ChunkedParser
+
+	text = make_program(6000)
+	with ChunkedParser() as parser:
+		assert serialize.dumps(parser.parse(text)) == serialize.dumps(parse(text))
+		baseline = timeit(lambda: parse(text), repeat=3)
+		report('Parser.parse', baseline)
+		report('ChunkedParser.parse', timeit(lambda: parser.parse(text), repeat=3), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  SYMBOLS                                                                    #
+#                                                                             #
+###############################################################################
+
+class PlainLexer(Lexer):
+	'''
+	不登记符号表、每次出现都新建标识符字符串的词法分析器，作为对照
+	'''
+	def _id(self):
+		pos = self.offset + self.pos
+		result = ''
+		while self.current_char is not None and self.current_char.isalnum():
+			result += self.current_char
+			self.advance()
+		if result in ('BEGIN', 'END'):
+			return Token(result, result, pos)
+		return Token(ID, result, pos)
+
+def retained_memory(func):
+	'''
+	返回func的结果驻留的内存(字节)
+	'''
+	tracemalloc.start()
+	try:
+		result = func()
+		return tracemalloc.get_traced_memory()[0], result
+	finally:
+		tracemalloc.stop()
+
+@benchmark('symbols')
+def bench_symbols():
+	names = ['variable{}'.format(i) for i in range(200)]
+	texts = [
+		'BEGIN ' + '; '.join(
+			'{} := {} + {} * {}'.format(names[(i + k) % 200], names[i % 200], names[(i * 7) % 200], k)
+			for i in range(400)
+		) + ' END.'
+		for k in range(20)
+	]
+	seed = {name: 1 for name in names}
+
+	def trees(make_lexer):
+		return lambda: [Parser(make_lexer(text)).parse() for text in texts]
+
+	symbols = SymbolTable()
+	plain, plain_trees = retained_memory(trees(PlainLexer))
+	shared, shared_trees = retained_memory(trees(lambda text: Lexer(text, symbols)))
+	print('  retained by {} trees'.format(len(texts)))
+	print('    {:<30} {:>10.1f} KB'.format('plain identifiers', plain / 1024))
+	print('    {:<30} {:>10.1f} KB'.format('shared symbol table', shared / 1024))
+
+	def run(trees):
+		def interpret():
+			for tree in trees:
+				Interpreter(None, scope=dict(seed)).visit(tree)
+		return interpret
+
+	baseline = timeit(run(plain_trees))
+	report('interpret, plain identifiers', baseline)
+	report('interpret, interned symbols', timeit(run(shared_trees)), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  TIERED EXECUTION                                                           #
+#                                                                             #
+###############################################################################
+
+def make_hot_program(n):
+	'''
+	生成含n条赋值语句、值不会无限增长的程序，用于反复执行
+	'''
+	statements = ['x := 3', 'y := 4']
+	for i in range(n):
+		statements.append('v{} := (x + {}) * (y - 2 * 3) + v{} / 7 - (1 + 2 * 5)'.format(
+			i, i, max(i - 1, 0)
+		) if i else 'v0 := x * y - 12 / 4')
+	return 'BEGIN ' + '; '.join(statements) + ' END.'
+
+@benchmark('jit')
+def bench_jit():
+	from jit import JIT, TieredInterpreter
+
+	tree = parse(make_hot_program(200))
+	runs = 200
+
+	def walk():
+		for _ in range(runs):
+			Interpreter(None, scope={}).visit(tree)
+
+	jit = JIT(threshold=10)
+
+	def tiered():
+		for _ in range(runs):
+			TieredInterpreter(None, scope={}, jit=jit).visit(tree)
+
+	baseline = timeit(walk, repeat=3)
+	report('tree walker, {} runs'.format(runs), baseline)
+	report('tiered, {} runs'.format(runs), timeit(tiered, repeat=3), baseline)
+	stats = jit.stats()
+	print('  hit rate {:.1%}, tier-ups {}, compile time {:.2f} ms'.format(
+		stats['hit_rate'], stats['tier_ups'], stats['compile_time'] * 1000
+	))
+
+
+###############################################################################
+#                                                                             #
+#  ENGINES                                                                    #
+#                                                                             #
+###############################################################################
+
+def engines():
+	'''
+	执行引擎: 名称 -> 编译函数，编译函数返回 run(scope)
+	'''
+	from closure import compile_tree
+	from jit import BlockCompiler
+
+	def tree_walker(tree):
+		return lambda scope: Interpreter(None, scope=scope).visit(tree)
+
+	return [
+		('tree walker', tree_walker),
+		('closures', compile_tree),
+		('generated code', lambda tree: BlockCompiler().compile(tree)),
+	]
+
+@benchmark('engines')
+def bench_engines():
+	workloads = [
+		('hot program x200', parse(make_hot_program(200)), 200),
+		('one-shot program', parse(make_program(1000)), 1),
+	]
+	for title, tree, runs in workloads:
+		print('  ' + title)
+		results = []
+		baseline = None
+		for name, compile_engine in engines():
+			def run():
+				code = compile_engine(tree)
+				for _ in range(runs):
+					scope = {}
+					code(scope)
+				return scope
+			results.append(run())
+			elapsed = timeit(run, repeat=3)
+			report('  ' + name, elapsed, baseline)
+			baseline = baseline or elapsed
+		assert all(result == results[0] for result in results)
+
+
+###############################################################################
+#                                                                             #
+#  ARENA                                                                      #
+#                                                                             #
+###############################################################################
+
+def make_wide_program(n):
+	'''
+	生成含2n个变量的程序，一半为整数，一半为浮点数
+	'''
+	statements = []
+	for i in range(n):
+		statements.append('i{} := {} * 3 - 1'.format(i, i))
+		statements.append('f{} := {} / 4'.format(i, i))
+	return 'BEGIN ' + '; '.join(statements) + ' END.'
+
+def evaluate_pickled(text):
+	'''
+	对照: 在工作进程中执行程序，通过pickle返回变量字典
+	'''
+	interpreter = Interpreter(Parser(Lexer(text)), scope={})
+	interpreter.interpret()
+	return interpreter.GLOBAL_SCOPE
+
+@benchmark('arena')
+def bench_arena():
+	from arena import ResultArena, evaluate_many, make_executor
+
+	texts = [make_wide_program(2000) for _ in range(16)]
+	symbols = SymbolTable()
+	lexer = Lexer(texts[0], symbols)
+	while lexer.get_next_token().type != EOF:
+		pass
+	expected = evaluate_pickled(texts[0])
+
+	with make_executor(2) as executor:
+		def pickled():
+			return list(executor.map(evaluate_pickled, texts))
+
+		def arena(read):
+			with ResultArena(symbols, len(texts)) as results:
+				overflows = evaluate_many(texts, results, executor)
+				values = read(results, overflows)
+				del values
+			return overflows
+
+		def read_scopes(results, overflows):
+			return [results.read(row, overflow) for row, overflow in enumerate(overflows)]
+
+		def read_numpy(results, overflows):
+			tags, ints, floats = results.numpy()
+			return float(floats[:, 1::2].sum())
+
+		assert pickled()[0] == expected
+		with ResultArena(symbols, len(texts)) as results:
+			overflows = evaluate_many(texts, results, executor)
+			assert results.read(0, overflows[0]) == expected
+			#复用的行只剩新程序的变量，出错的程序不影响其他行
+			reused = evaluate_many(['BEGIN i1 := 1 END.', 'BEGIN i1 := 1 / 0 END.'], results, executor)
+			assert results.read(0, reused[0]) == {'i1': 1}
+			assert isinstance(reused[1], ZeroDivisionError) and results.read(1, reused[1]) == {}
+
+		baseline = timeit(pickled, repeat=3)
+		report('pickle results', baseline)
+		report('arena + read()', timeit(lambda: arena(read_scopes), repeat=3), baseline)
+		try:
+			import numpy
+		except ImportError:
+			return
+		report('arena + numpy views', timeit(lambda: arena(read_numpy), repeat=3), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  MEMO                                                                       #
+#                                                                             #
+###############################################################################
+
+@benchmark('memo')
+def bench_memo():
+	from memo import MemoCache, MemoInterpreter
+
+	#v0作为输入变量，共10种取值反复重放
+	tree = parse(make_program(300).replace('v0 := 1; ', ''))
+	inputs = [i % 10 + 1 for i in range(500)]
+
+	def plain():
+		for v0 in inputs:
+			Interpreter(None, scope={'v0': v0}).visit(tree)
+
+	def memoized():
+		cache = MemoCache()
+		for v0 in inputs:
+			MemoInterpreter(None, scope={'v0': v0}, cache=cache).evaluate(tree)
+		return cache
+
+	scope = {'v0': 3}
+	MemoInterpreter(None, scope=scope).evaluate(tree)
+	expected = {'v0': 3}
+	Interpreter(None, scope=expected).visit(tree)
+	assert scope == expected
+
+	#未命中和命中时，循环中赋值的变量都按第一次赋值的顺序写入作用域
+	cache = MemoCache()
+	for text in (
+		'BEGIN w := 1; WHILE w DO BEGIN t := 5; w := w - 1 END; c := 2 END.',
+		'BEGIN w1 := 1; WHILE w1 DO BEGIN w2 := 1; WHILE w2 DO BEGIN b := 1; w2 := 0 END; w1 := 0 END END.',
+	):
+		looped = parse(text)
+		expected = {}
+		Interpreter(None, scope=expected).visit(looped)
+		for _ in range(2):
+			scope = {}
+			MemoInterpreter(None, scope=scope, cache=cache).evaluate(looped)
+			assert list(scope.items()) == list(expected.items())
+
+	baseline = timeit(plain, repeat=3)
+	report('Interpreter.visit', baseline)
+	report('MemoInterpreter.evaluate', timeit(memoized, repeat=3), baseline)
+	print('  hit rate {hit_rate:.1%}'.format(**memoized().stats()))
+
+
+###############################################################################
+#                                                                             #
+#  LOOPS                                                                      #
+#                                                                             #
+###############################################################################
+
+@benchmark('loops')
+def bench_loops():
+	from loops import LoopInterpreter
+
+	n = 20000
+	programs = [
+		('accumulation', 'BEGIN k := 7; s := 0; FOR i := 1 TO {} DO s := s + i * 3 + k END.'.format(n),
+			'BEGIN k := 7; s := 0; {} END.'.format('; '.join(
+				'i := {}; s := s + i * 3 + k'.format(i) for i in range(1, n + 1)
+			))),
+		('general body', 'BEGIN k := 7; s := 0; FOR i := 1 TO {} DO BEGIN t := (k * k + 1) * i; s := s + t / 3 END END.'.format(n),
+			None),
+	]
+	for title, text, unrolled in programs:
+		print('  ' + title)
+		tree = parse(text)
+
+		def interpreted():
+			scope = {}
+			Interpreter(None, scope=scope).visit(tree)
+			return scope
+
+		def optimized():
+			scope = {}
+			LoopInterpreter(None, scope=scope).visit(tree)
+			return scope
+
+		assert list(interpreted().items()) == list(optimized().items())
+		baseline = timeit(interpreted, repeat=3)
+		report('  Interpreter loop', baseline)
+		report('  LoopInterpreter', timeit(optimized, repeat=3), baseline)
+		if unrolled is not None:
+			def parse_unrolled():
+				scope = {}
+				Interpreter(None, scope=scope).visit(parse(unrolled))
+				return scope
+
+			assert parse_unrolled() == interpreted()
+			print('    unrolled source {:,} chars, loop source {:,} chars'.format(len(unrolled), len(text)))
+			report('  unrolled parse + run', timeit(parse_unrolled, repeat=3), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  PGEN                                                                       #
+#                                                                             #
+###############################################################################
+
+@benchmark('pgen')
+def bench_pgen():
+	from pgen import TableParser, default_table
+	from serialize import dumps
+
+	default_table()
+
+	#语法错误的输入: 两个解析器抛出相同的错误和位置
+	def failure(parser_class, text):
+		try:
+			parser_class(Lexer(text)).parse()
+		except ParserError as e:
+			return str(e)
+		raise AssertionError('{} accepted {!r}'.format(parser_class.__name__, text))
+
+	for text in (' ', '\n\t', 'BEGIN END', 'BEGIN END. x', 'BEGIN a := END.', 'BEGIN a := (1 END.'):
+		assert failure(Parser, text) == failure(TableParser, text), text
+
+	programs = [
+		('make_program(5000)', make_program(5000)),
+		('make_program(5000, width=1)', make_program(5000, width=1)),
+		('nested loops', 'BEGIN ' + '; '.join(
+			'FOR i := 1 TO {0} DO WHILE v{0} - i DO BEGIN v{0} := v{0} - 1; s := s + i * v{0} END'.format(i)
+			for i in range(3000)
+		) + ' END.'),
+	]
+	for title, text in programs:
+		print('  {} ({:,} chars)'.format(title, len(text)))
+		assert dumps(parse(text)) == dumps(TableParser(Lexer(text)).parse())
+		baseline = timeit(lambda: parse(text))
+		report('  Parser', baseline)
+		report('  TableParser', timeit(lambda: TableParser(Lexer(text)).parse()), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  METRICS                                                                    #
+#                                                                             #
+###############################################################################
+
+@benchmark('metrics')
+def bench_metrics():
+	from metrics import InterpreterMetrics, Histogram
+
+	texts = [make_program(n) for n in (5, 20, 80)] * 100
+
+	def plain():
+		for text in texts:
+			Interpreter(Parser(Lexer(text)), scope={}).interpret()
+
+	def metered():
+		metrics = InterpreterMetrics()
+		for text in texts:
+			metrics.evaluate(text)
+		return metrics
+
+	histogram = Histogram('bench')
+	values = list(range(1, 100001))
+
+	def record():
+		for value in values:
+			histogram.record(value)
+
+	baseline = timeit(plain, repeat=3)
+	report('Interpreter.interpret', baseline)
+	report('InterpreterMetrics.evaluate', timeit(metered, repeat=3), baseline)
+	print('  Histogram.record {:.0f} ns per call'.format(timeit(record, repeat=3) / len(values) * 1e9))
+	snapshot = metered().registry.snapshot()['metrics']
+	print('  eval p50 {p50:.6f} s, p99 {p99:.6f} s'.format(**snapshot['c5_eval_seconds']))
+
+
+###############################################################################
+#                                                                             #
+#  COOP                                                                       #
+#                                                                             #
+###############################################################################
+
+@benchmark('coop')
+def bench_coop():
+	import asyncio
+	from coop import compile_code, Execution, Scheduler
+
+	tree = parse('BEGIN s := 0; FOR i := 1 TO 100000 DO BEGIN t := i * 3 - 1; s := s + t / 2 END END.')
+	code = compile_code(tree)
+
+	def interpreted():
+		Interpreter(None, scope={}).visit(tree)
+
+	def vm():
+		Execution(code).run()
+
+	def sliced():
+		execution = Execution(code)
+		while not execution.run(2000):
+			pass
+
+	baseline = timeit(interpreted, repeat=3)
+	report('Interpreter.visit', baseline)
+	report('Execution.run()', timeit(vm, repeat=3), baseline)
+	report('Execution.run(2000) slices', timeit(sliced, repeat=3), baseline)
+
+	#4个大程序先到，随后200个小程序，统计小程序从提交到完成的延迟
+	huge = parse('BEGIN s := 0; FOR i := 1 TO 300000 DO s := s + i END.')
+	tiny = parse(make_program(20))
+	arrivals = [huge] * 4 + [tiny] * 200
+
+	def percentiles(latencies):
+		latencies = sorted(latencies)
+		return latencies[len(latencies) // 2], latencies[len(latencies) * 99 // 100]
+
+	start = time.perf_counter()
+	fifo = []
+	for program in arrivals:
+		Execution(compile_code(program)).run()
+		if program is tiny:
+			fifo.append(time.perf_counter() - start)
+
+	async def scheduled():
+		scheduler = Scheduler(quantum=2000)
+		start = time.perf_counter()
+		tasks = [(program, scheduler.submit(program)) for program in arrivals]
+		latencies = []
+		for program, task in tasks:
+			await task
+			if program is tiny:
+				latencies.append(task.finished - task.submitted)
+		return latencies, time.perf_counter() - start
+
+	latencies, total = asyncio.run(scheduled())
+	print('  tiny program latency    p50 {:8.2f} ms   p99 {:8.2f} ms'.format(*(x * 1000 for x in percentiles(fifo))) + '   run to completion')
+	print('  tiny program latency    p50 {:8.2f} ms   p99 {:8.2f} ms'.format(*(x * 1000 for x in percentiles(latencies))) + '   Scheduler, total {:.2f} s'.format(total))
+
+
+###############################################################################
+#                                                                             #
+#  CANON                                                                      #
+#                                                                             #
+###############################################################################
+
+def make_corpus(count, programs=50, seed=0):
+	'''
+	生成count个源程序，来自programs个不同的程序，每次出现时变量名、空白、
+	多余的括号、+ 和 * 的操作数顺序以及开头常量赋值的顺序随机变化
+	'''
+	import random
+	rng = random.Random(seed)
+	bases = []
+	for _ in range(programs):
+		width = rng.randint(3, 5)
+		constants = [(i, ('num', rng.randint(1, 9))) for i in range(width)]
+		assignments = []
+		for i in range(width, width + 4):
+			a, b, c = rng.sample(range(i), 3)
+			expr = (rng.choice('+*-'), (rng.choice('+*-'), ('var', a), ('var', b)), ('var', c))
+			assignments.append((i, expr))
+		bases.append((width + 4, constants, assignments))
+
+	def render(expr, names):
+		if expr[0] == 'var':
+			return names[expr[1]]
+		if expr[0] == 'num':
+			return str(expr[1])
+		op, left, right = expr
+		left, right = render(left, names), render(right, names)
+		if op in '+*' and rng.random() < 0.5:
+			left, right = right, left
+		text = '({}{}{}{}{})'.format(left, ' ' * rng.randint(0, 2), op, ' ' * rng.randint(0, 2), right)
+		return '(' + text + ')' if rng.random() < 0.2 else text
+
+	pool = [a + b for a in 'abcdefghxyz' for b in ('', 'x', 'tmp')]
+	texts = []
+	for _ in range(count):
+		size, constants, assignments = rng.choice(bases)
+		names = rng.sample(pool, size + 2)
+		total, index = names[-2:]
+		constants = constants[:]
+		rng.shuffle(constants)
+		statements = ['{} := {}'.format(names[i], render(expr, names)) for i, expr in constants]
+		statements.append('{} := 0'.format(total))
+		statements += ['{} := {}'.format(names[i], render(expr, names)) for i, expr in assignments]
+		statements.append('FOR {0} := 1 TO 300 DO {1} := {1} + {0} * {2}'.format(index, total, names[size - 1]))
+		texts.append('BEGIN ' + (';' + ' ' * rng.randint(1, 2)).join(statements) + ' END.')
+	return texts
+
+@benchmark('canon')
+def bench_canon():
+	from canon import canonicalize, CanonicalEvaluator, hit_rates
+	from memo import MemoCache, MemoInterpreter
+	from pool import TreeCache
+
+	texts = make_corpus(2000)
+	for kind, stats in hit_rates(texts).items():
+		print('  {:<10} keys {:>5}   hit rate {:6.1%}'.format(kind, stats['distinct'], stats['hit_rate']))
+
+	trees = [parse(text) for text in texts[:500]]
+	parsing = timeit(lambda: [parse(text) for text in texts[:500]], repeat=3)
+	report('parse (500 programs)', parsing)
+	report('canonicalize (500 programs)', timeit(lambda: [canonicalize(tree) for tree in trees], repeat=3), parsing)
+
+	def plain():
+		for text in texts:
+			Interpreter(Parser(Lexer(text)), scope={}).interpret()
+
+	def memoized():
+		trees = TreeCache(4096)
+		cache = MemoCache(4096)
+		for text in texts:
+			MemoInterpreter(None, scope={}, cache=cache).evaluate(trees.get(text))
+		return cache
+
+	def canonical():
+		evaluator = CanonicalEvaluator()
+		for text in texts:
+			evaluator.evaluate(text)
+		return evaluator
+
+	for text in texts[:50]:
+		expected = {}
+		Interpreter(Parser(Lexer(text)), scope=expected).interpret()
+		assert list(CanonicalEvaluator().evaluate(text).items()) == list(expected.items())
+	#循环体中第一次赋值的变量，第二次命中缓存时顺序也要与Interpreter相同
+	text = 'BEGIN w := 1; WHILE w DO BEGIN t := 5; w := w - 1 END; c := 2 END.'
+	expected = {}
+	Interpreter(Parser(Lexer(text)), scope=expected).interpret()
+	evaluator = CanonicalEvaluator()
+	for _ in range(2):
+		assert list(evaluator.evaluate(text, {}).items()) == list(expected.items())
+
+	baseline = timeit(plain, repeat=3)
+	report('Interpreter.interpret', baseline)
+	report('TreeCache + MemoInterpreter', timeit(memoized, repeat=3), baseline)
+	report('CanonicalEvaluator', timeit(canonical, repeat=3), baseline)
+	print('  result hit rate {:.1%} by text, {:.1%} canonical'.format(
+		memoized().stats()['hit_rate'], canonical().stats()['hit_rate']
+	))
+
+
+###############################################################################
+#                                                                             #
+#  PARTIAL                                                                    #
+#                                                                             #
+###############################################################################
+
+@benchmark('partial')
+def bench_partial():
+	from partial import specialize
+	from serialize import dumps
+
+	#按租户固定的配置: rate、limit、tiers、base；每个请求的输入: amount、count
+	tree = parse('''BEGIN
+		tax := rate * 3 + 7;
+		threshold := limit * 2 - tax;
+		discount := 0;
+		FOR i := 1 TO tiers DO discount := discount + i * tax / (i + rate);
+		fee := (amount * tax + base) / 100 - discount / tiers;
+		total := 0;
+		FOR j := 1 TO count DO BEGIN
+			total := total + fee * j;
+			WHILE total - threshold * j DO total := threshold * j
+		END
+	END.''')
+	tenant = {'rate': 3, 'limit': 500, 'tiers': 2000, 'base': 250}
+	requests = [{'amount': i * 7 % 1000, 'count': i % 5} for i in range(300)]
+
+	residual = specialize(tree, tenant)
+	for request in requests[:20]:
+		expected = dict(request)
+		expected.update(tenant)
+		Interpreter(None, scope=expected).visit(tree)
+		scope = dict(request)
+		Interpreter(None, scope=scope).visit(residual)
+		assert scope == expected
+
+	def interpreted():
+		for request in requests:
+			scope = dict(request)
+			scope.update(tenant)
+			Interpreter(None, scope=scope).visit(tree)
+
+	def specialized():
+		for request in requests:
+			Interpreter(None, scope=dict(request)).visit(residual)
+
+	print('  program {} bytes serialized, residual {} bytes'.format(len(dumps(tree)), len(dumps(residual))))
+	report('specialize (once per tenant)', timeit(lambda: specialize(tree, tenant), repeat=3))
+	baseline = timeit(interpreted, repeat=3)
+	report('Interpreter, full program', baseline)
+	report('Interpreter, residual program', timeit(specialized, repeat=3), baseline)
+
+
+###############################################################################
+#                                                                             #
+#  SHAPES                                                                     #
+#                                                                             #
+###############################################################################
+
+@benchmark('shapes')
+def bench_shapes():
+	import random
+	from shapes import BatchEvaluator, NUMBER
+
+	#50种结构，每个表达式重新随机生成字面量
+	rng = random.Random(0)
+	templates = make_expressions(50, seed=1)
+	expressions = [
+		NUMBER.sub(lambda match: str(rng.randint(1, 999)), rng.choice(templates))
+		for _ in range(50000)
+	]
+
+	def same(first, second):
+		if isinstance(first, Exception):
+			return type(first) is type(second) and str(first) == str(second)
+		return type(first) is type(second) and (first == second or first != first and second != second)
+
+	def each(evaluate):
+		results = []
+		for text in expressions:
+			try:
+				results.append(evaluate(text))
+			except Exception as e:
+				results.append(e)
+		return results
+
+	def scalar():
+		return each(evaluate_tree)
+
+	expected = scalar()
+	evaluator = BatchEvaluator()
+	assert all(map(same, expected, evaluator.evaluate(expressions)))
+	assert all(map(same, expected, BatchEvaluator(vectorize=False).evaluate(expressions)))
+	print('  {} expressions, {} shapes, {} scalar fallbacks'.format(
+		len(expressions), len(evaluator.shapes), evaluator.fallbacks
+	))
+
+	baseline = timeit(scalar, repeat=3)
+	report('parse + tree walk', baseline)
+	report('single-pass evaluator', timeit(
+		lambda: each(lambda text: Evaluator(Lexer(text)).evaluate()), repeat=3
+	), baseline)
+	report('BatchEvaluator (closures)', timeit(
+		lambda: BatchEvaluator(vectorize=False).evaluate(expressions), repeat=3
+	), baseline)
+	try:
+		import numpy
+	except ImportError:
+		print('  numpy not installed')
+		return
+	report('BatchEvaluator (numpy)', timeit(lambda: BatchEvaluator().evaluate(expressions), repeat=3), baseline)
+
+
+def main(argv):
+	names = argv or list(BENCHMARKS)
+	for name in names:
+		if name not in BENCHMARKS:
+			raise SystemExit('Unknown benchmark: {}'.format(name))
+		print(name)
+		BENCHMARKS[name]()
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
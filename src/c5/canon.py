@@ -0,0 +1,454 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+程序规范化
+
+canonicalize把Parser输出的语法树改写为规范形式。只在空白、多余的括号、
+变量命名或无关赋值的顺序上不同的程序得到相同的规范树和结构哈希，
+可以作为解析、编译和结果缓存的键:
+
+	空操作       展开嵌套的复合语句并去掉NoOp，循环体统一为复合语句
+	一元运算     去掉正号和双重负号
+	交换律       + 和 * 的两个操作数按结构排序
+	结合律       整数的 + 或 * 链展开后按结构排序
+	无关赋值     相邻、互不读写对方变量的赋值按结构排序
+	变量改名     变量按在规范树中第一次出现的顺序改名为v0、v1...
+
+改写只在结果、异常以及出错时已生效的赋值都不变时进行。为此按执行顺序推断
+每个变量是否一定已赋值以及是整数还是浮点数(循环取各条路径的交):
+
+	交换两个操作数时至多一个可能出错，出错的总是同一个子表达式
+	重排结合链时每一项都是一定已赋值的整数运算，结果与分组无关且不会出错
+	重排的赋值都不会出错，执行到哪一条出错的问题不存在
+
+浮点数的加法和乘法满足交换律但不满足结合律，所以只交换不重组；
+- 和 / 保持原样。规范树中的变量名与原程序不同，执行时用Canonical.bind和
+unbind转换作用域，CanonicalEvaluator把三种缓存组合在一起:
+
+	evaluator = CanonicalEvaluator()
+	scope = evaluator.evaluate(text, scope)
+	print(hit_rates(corpus))
+'''
+
+import hashlib
+from collections import OrderedDict
+from operator import itemgetter
+from weakref import WeakValueDictionary
+
+from inter import (
+	PLUS, MINUS, MUL, DIV, ID, Token, BinOp, UnaryOp, Num, Var, Assign, Compound,
+	While, For, Lexer, Parser
+)
+from loops import statements
+from memo import MemoCache, MemoInterpreter
+from analysis import usage
+from serialize import BINOP_KINDS, UNARY_KINDS, K_VAR, K_NUM, K_ASSIGN, dumps
+
+###############################################################################
+#                                                                             #
+#  CANONICALIZER                                                              #
+#                                                                             #
+###############################################################################
+
+def meet(first, second):
+	'''
+	两个变量状态的交: 都已赋值的变量，类型不同时记为未知(None)
+	'''
+	return {
+		name: kind if second[name] is kind else None
+		for name, kind in first.items() if name in second
+	}
+
+def kind_of(node, env):
+	'''
+	表达式的值的类型: int、float或None(未知)
+	'''
+	if isinstance(node, Num):
+		return type(node.value)
+	if isinstance(node, Var):
+		return env.get(node.value)
+	if isinstance(node, UnaryOp):
+		return kind_of(node.expr, env)
+	if node.op.type == DIV:
+		return float
+	left = kind_of(node.left, env)
+	right = kind_of(node.right, env)
+	if left is int and right is int:
+		return int
+	return float if left is not None and right is not None else None
+
+class Canonicalizer(object):
+	'''
+	按执行顺序改写一棵语法树，一个Canonicalizer只用一次
+	env记录一定已赋值的变量(原名)及其类型
+	'''
+	def __init__(self):
+		self.env = {}
+		self.index = {}		#原名 -> 规范编号
+		self.tokens = []	#规范编号 -> Token
+		self.names = []		#规范编号 -> 原名
+		self.chains = {}	#id(整数结合链) -> (节点, [(键, 项)])
+		self.before = set()		#执行到当前位置之前可能已赋值的变量
+		self.enclosing = set()	#直接外层循环体中赋值的变量
+		self.runs = []		#排序后改变了新变量顺序的赋值段: 原顺序的规范编号
+
+	def token(self, name):
+		index = self.index.get(name)
+		if index is None:
+			index = self.index[name] = len(self.names)
+			self.names.append(name)
+			self.tokens.append(Token(ID, 'v{}'.format(index)))
+		return self.tokens[index]
+
+	def rename(self, node):
+		'''
+		按求值顺序给表达式或赋值中的变量编号，返回改名后的副本
+		'''
+		if isinstance(node, Num):
+			return node
+		if isinstance(node, Var):
+			return Var(self.token(node.value))
+		if isinstance(node, BinOp):
+			left = self.rename(node.left)
+			return BinOp(left, node.op, self.rename(node.right))
+		if isinstance(node, UnaryOp):
+			return UnaryOp(node.op, self.rename(node.expr))
+		right = self.rename(node.right)
+		return Assign(Var(self.token(node.left.value)), node.op, right)
+
+	def expression(self, node):
+		'''
+		规范化表达式，返回(节点, 排序键, 类型, 是否一定不出错)
+		排序键与变量名无关: 已编号的变量用编号，其余的记为-1
+		'''
+		if isinstance(node, Num):
+			return node, (K_NUM, node.value), type(node.value), True
+		if isinstance(node, Var):
+			name = node.value
+			return node, (K_VAR, self.index.get(name, -1)), self.env.get(name), name in self.env
+		if isinstance(node, UnaryOp):
+			expr, key, kind, safe = self.expression(node.expr)
+			if node.op.type == PLUS:
+				return expr, key, kind, safe
+			if key[0] == UNARY_KINDS[MINUS]:
+				return expr.expr, key[1], kind, safe
+			return UnaryOp(node.op, expr), (UNARY_KINDS[MINUS], key), kind, safe
+
+		op = node.op.type
+		tag = BINOP_KINDS[op]
+		left, lkey, lkind, lsafe = self.expression(node.left)
+		right, rkey, rkind, rsafe = self.expression(node.right)
+		if op == DIV:
+			return BinOp(left, node.op, right), (tag, lkey, rkey), float, False
+		if lkind is int and rkind is int:
+			kind = int
+		else:
+			kind = float if lkind is not None and rkind is not None else None
+		#整数之间、浮点数之间的运算不会出错，整数转换为浮点数时可能溢出
+		safe = lsafe and rsafe and lkind is rkind and kind is not None
+		if op == MINUS:
+			return BinOp(left, node.op, right), (tag, lkey, rkey), kind, safe
+
+		if safe and kind is int:
+			terms = self.terms(left, lkey, op) + self.terms(right, rkey, op)
+			terms.sort(key=itemgetter(0))
+			key, result = terms[0]
+			for term_key, term in terms[1:]:
+				result = BinOp(result, node.op, term)
+				key = (tag, key, term_key)
+			self.chains[id(result)] = (result, terms)
+			return result, key, kind, safe
+		if (lsafe or rsafe) and rkey < lkey:
+			left, lkey, right, rkey = right, rkey, left, lkey
+		return BinOp(left, node.op, right), (tag, lkey, rkey), kind, safe
+
+	def terms(self, node, key, op):
+		'''
+		整数结合链的各项，node不是op的结合链时只有它自己
+		'''
+		entry = self.chains.get(id(node))
+		if entry is not None and entry[0] is node and node.op.type == op:
+			return list(entry[1])
+		return [(key, node)]
+
+	def fixpoint(self, body, env, var=None):
+		'''
+		循环头处的变量状态: 进入循环前与每次执行循环体后的状态的交
+		'''
+		head = dict(env)
+		while True:
+			state = dict(head)
+			if var is not None:
+				state[var] = int
+			self.flow(body, state)
+			merged = meet(env, state)
+			if merged == head:
+				return head
+			head = merged
+
+	def flow(self, node, env):
+		'''
+		执行语句后的变量状态，直接修改env
+		'''
+		for statement in statements(node):
+			if isinstance(statement, Assign):
+				env[statement.left.value] = kind_of(statement.right, env)
+			else:
+				var = statement.var.value if isinstance(statement, For) else None
+				head = self.fixpoint(statement.body, env, var)
+				env.clear()
+				env.update(head)
+
+	def block(self, node):
+		'''
+		规范化语句序列，返回语句列表
+		'''
+		result = []
+		run = []	#待排序的无关赋值: (键, 赋值, 读集合, 是否第一次赋值)
+		written = set()
+
+		def flush():
+			first = [statement.left.value for _, statement, _, new in run if new]
+			run.sort(key=itemgetter(0))
+			for _, statement, _, _ in run:
+				result.append(self.rename(statement))
+			if first != [statement.left.value for _, statement, _, new in run if new]:
+				self.runs.append(tuple(self.index[name] for name in first))
+			del run[:]
+			written.clear()
+
+		for statement in statements(node):
+			if not isinstance(statement, Assign):
+				flush()
+				result.append(self.loop(statement))
+				continue
+			name = statement.left.value
+			#变量可能已由之前执行的语句第一次赋值时，无法确定它在作用域中的位置，不参与排序
+			fixed = name not in self.env and name in self.before
+			right, key, kind, safe = self.expression(statement.right)
+			reads = usage(right)[0]
+			if run and (fixed or not (safe and name not in written and not reads & written
+					and all(name not in other for _, _, other, _ in run))):
+				#与前面的赋值有关，排序键要按新的编号重新计算
+				flush()
+				right, key, kind, safe = self.expression(statement.right)
+			key = (K_ASSIGN, (K_VAR, self.index.get(name, -1)), key)
+			run.append((key, Assign(statement.left, statement.op, right), reads, name not in self.env))
+			written.add(name)
+			self.before.add(name)
+			self.env[name] = kind
+			if not safe or fixed:
+				flush()
+		flush()
+		return result
+
+	def body(self, node, env):
+		self.env = env
+		body = Compound()
+		body.children = self.block(node)
+		return body
+
+	def loop(self, node):
+		'''
+		规范化循环，循环体第一次执行到某条语句之前，外层循环体中的任何语句都可能已执行过
+		'''
+		before, enclosing = self.before, self.enclosing
+		self.before = before | enclosing
+		self.enclosing = usage(node.body)[1]
+		try:
+			return self.loop_body(node)
+		finally:
+			self.before = before | usage(node)[1]
+			self.enclosing = enclosing
+
+	def loop_body(self, node):
+		if isinstance(node, While):
+			head = self.fixpoint(node.body, self.env)
+			self.env = dict(head)
+			cond = self.rename(self.expression(node.cond)[0])
+			body = self.body(node.body, dict(head))
+			self.env = head
+			return While(node.token, cond, body)
+
+		start = self.rename(self.expression(node.start)[0])
+		end = self.rename(self.expression(node.end)[0])
+		name = node.var.value
+		var = Var(self.token(name))
+		self.before.add(name)
+		head = self.fixpoint(node.body, self.env, name)
+		env = dict(head)
+		env[name] = int
+		body = self.body(node.body, env)
+		self.env = head
+		return For(node.token, var, start, end, body)
+
+	def canonicalize(self, tree):
+		'''
+		返回规范树，语句(序列)的规范树总是复合语句
+		'''
+		if isinstance(tree, (Num, Var, UnaryOp, BinOp)):
+			return self.rename(self.expression(tree)[0])
+		root = Compound()
+		root.children = self.block(tree)
+		return root
+
+class Canonical(object):
+	'''
+	程序的规范形式
+	tree: 规范树，变量名为v0、v1...
+	names: names[i]是vi对应的原变量名
+	runs: 排序后改变了新变量顺序的赋值段，每段是其中第一次赋值的变量在原程序中
+	      按顺序的规范编号；这些变量只会由该段第一次赋值
+	key: 规范树的结构哈希
+	'''
+	def __init__(self, tree, names, runs=()):
+		self.tree = tree
+		self.names = tuple(names)
+		self.runs = tuple(runs)
+		self.key = hashlib.blake2b(dumps(tree), digest_size=16).digest()
+
+	def bind(self, scope):
+		'''
+		原变量名的作用域 -> 执行规范树用的作用域
+		'''
+		local = {}
+		for index, name in enumerate(self.names):
+			value = scope.get(name)
+			if value is not None:
+				local['v{}'.format(index)] = value
+		return local
+
+	def unbind(self, local, scope):
+		'''
+		把规范树执行后的变量写回原变量名的作用域
+		local中新变量的顺序是规范树执行时第一次赋值的顺序，与原程序只差在排序过的
+		赋值段内，把这些段中的新变量换回原来的顺序后，作用域中的顺序与Interpreter相同
+		'''
+		names = self.names
+		order = list(local)
+		position = {key: i for i, key in enumerate(order)}
+		for run in self.runs:
+			keys = [
+				'v{}'.format(index) for index in run
+				if 'v{}'.format(index) in position and names[index] not in scope
+			]
+			for slot, key in zip(sorted(position[key] for key in keys), keys):
+				order[slot] = key
+		for key in order:
+			value = local[key]
+			if value is not None:
+				scope[names[int(key[1:])]] = value
+		return scope
+
+	def original(self, name):
+		'''
+		规范变量名对应的原变量名
+		'''
+		if name[:1] == 'v' and name[1:].isdigit() and int(name[1:]) < len(self.names):
+			return self.names[int(name[1:])]
+		return name
+
+def canonicalize(tree):
+	'''
+	返回语法树的Canonical
+	'''
+	canonicalizer = Canonicalizer()
+	canonical = canonicalizer.canonicalize(tree)
+	return Canonical(canonical, canonicalizer.names, canonicalizer.runs)
+
+
+###############################################################################
+#                                                                             #
+#  CACHES                                                                     #
+#                                                                             #
+###############################################################################
+
+class CanonicalEvaluator(object):
+	'''
+	以规范形式为键的求值器
+	解析缓存: 源程序 -> Canonical(LRU)
+	编译缓存: 规范键 -> 共享的规范树，按树缓存的TreeInfo、编译结果等随之共享
+	结果缓存: MemoCache，键为(规范树指纹, 输入值)
+	'''
+	def __init__(self, maxsize=4096, cache=None):
+		self.maxsize = maxsize
+		self.cache = MemoCache(maxsize) if cache is None else cache
+		self.programs = OrderedDict()
+		self.trees = WeakValueDictionary()
+		self.parses = 0
+		self.shared = 0		#规范化后与已有程序相同的次数
+
+	def canonical(self, text):
+		canonical = self.programs.get(text)
+		if canonical is not None:
+			self.programs.move_to_end(text)
+			return canonical
+		self.parses += 1
+		canonical = canonicalize(Parser(Lexer(text)).parse())
+		tree = self.trees.get(canonical.key)
+		if tree is None:
+			self.trees[canonical.key] = canonical.tree
+		else:
+			canonical.tree = tree
+			self.shared += 1
+		self.programs[text] = canonical
+		if len(self.programs) > self.maxsize:
+			self.programs.popitem(last=False)
+		return canonical
+
+	def evaluate(self, text, scope=None):
+		'''
+		执行源程序，返回变量作用域，结果与Interpreter相同
+		'''
+		scope = {} if scope is None else scope
+		canonical = self.canonical(text)
+		local = canonical.bind(scope)
+		try:
+			MemoInterpreter(None, scope=local, cache=self.cache).evaluate(canonical.tree)
+		except NameError as e:
+			name = e.args[0][1:-1] if e.args and isinstance(e.args[0], str) else None
+			if name is None:
+				raise
+			raise NameError(repr(canonical.original(name))) from None
+		finally:
+			canonical.unbind(local, scope)
+		return scope
+
+	def stats(self):
+		stats = self.cache.stats()
+		stats['parses'] = self.parses
+		stats['shared'] = self.shared
+		return stats
+
+def hit_rates(texts, maxsize=None):
+	'''
+	在语料上模拟分别以源程序、语法树指纹和规范键为键的LRU缓存
+	返回 {键的种类: {'hits', 'misses', 'hit_rate', 'distinct'}}，maxsize为None时不限大小
+	'''
+	caches = OrderedDict((kind, OrderedDict()) for kind in ('text', 'tree', 'canonical'))
+	stats = {kind: {'hits': 0, 'misses': 0, 'distinct': set()} for kind in caches}
+	for text in texts:
+		tree = Parser(Lexer(text)).parse()
+		keys = {
+			'text': text,
+			'tree': hashlib.blake2b(dumps(tree), digest_size=16).digest(),
+			'canonical': canonicalize(tree).key,
+		}
+		for kind, cache in caches.items():
+			key = keys[kind]
+			entry = stats[kind]
+			entry['distinct'].add(key)
+			if key in cache:
+				cache.move_to_end(key)
+				entry['hits'] += 1
+				continue
+			entry['misses'] += 1
+			cache[key] = True
+			if maxsize is not None and len(cache) > maxsize:
+				cache.popitem(last=False)
+	for entry in stats.values():
+		lookups = entry['hits'] + entry['misses']
+		entry['hit_rate'] = entry['hits'] / lookups if lookups else 0.0
+		entry['distinct'] = len(entry['distinct'])
+	return stats
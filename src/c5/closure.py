@@ -0,0 +1,119 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+闭包编译
+
+把语法树的每个节点一次性转换为预先绑定好子节点的Python闭包，
+例如BinOp(PLUS)转换为 lambda scope: left(scope) + right(scope)。
+之后反复执行时不再按类型名分派，也不再比较op.type，
+结果和异常与Interpreter相同。
+
+	run = compile_tree(tree)
+	run(scope)
+'''
+
+from inter import PLUS, MINUS, MUL, DIV, Num, NoOp, NodeVisitor
+
+class ClosureCompiler(NodeVisitor):
+	'''
+	把节点编译为闭包 f(scope)
+	'''
+	def visit_Num(self, node):
+		value = node.value
+		return lambda scope: value
+
+	def visit_Var(self, node):
+		name = node.value
+
+		def var(scope):
+			val = scope.get(name)
+			if val is None:
+				raise NameError(repr(name))
+			return val
+		return var
+
+	def visit_UnaryOp(self, node):
+		expr = self.visit(node.expr)
+		if node.op.type == PLUS:
+			return lambda scope: +expr(scope)
+		elif node.op.type == MINUS:
+			return lambda scope: -expr(scope)
+
+	def visit_BinOp(self, node):
+		op = node.op.type
+		if isinstance(node.right, Num):
+			return self.binop_constant(op, self.visit(node.left), node.right.value)
+
+		left = self.visit(node.left)
+		right = self.visit(node.right)
+		if op == PLUS:
+			return lambda scope: left(scope) + right(scope)
+		elif op == MINUS:
+			return lambda scope: left(scope) - right(scope)
+		elif op == MUL:
+			return lambda scope: left(scope) * right(scope)
+		elif op == DIV:
+			return lambda scope: left(scope) / right(scope)
+
+	def binop_constant(self, op, left, value):
+		'''
+		右操作数为常量的二元运算，省去一次闭包调用
+		'''
+		if op == PLUS:
+			return lambda scope: left(scope) + value
+		elif op == MINUS:
+			return lambda scope: left(scope) - value
+		elif op == MUL:
+			return lambda scope: left(scope) * value
+		elif op == DIV:
+			return lambda scope: left(scope) / value
+
+	def visit_Assign(self, node):
+		name = node.left.value
+		expr = self.visit(node.right)
+
+		def assign(scope):
+			scope[name] = expr(scope)
+		return assign
+
+	def visit_Compound(self, node):
+		children = tuple(
+			self.visit(child) for child in node.children if not isinstance(child, NoOp)
+		)
+
+		def compound(scope):
+			for child in children:
+				child(scope)
+		return compound
+
+	def visit_NoOp(self, node):
+		return lambda scope: None
+
+	def visit_While(self, node):
+		cond = self.visit(node.cond)
+		body = self.visit(node.body)
+
+		def loop(scope):
+			while cond(scope):
+				body(scope)
+		return loop
+
+	def visit_For(self, node):
+		name = node.var.value
+		start = self.visit(node.start)
+		end = self.visit(node.end)
+		body = self.visit(node.body)
+
+		def loop(scope):
+			first = start(scope)
+			for value in range(first, end(scope) + 1):
+				scope[name] = value
+				body(scope)
+		return loop
+
+def compile_tree(tree):
+	'''
+	把语法树编译为闭包 f(scope)
+	'''
+	return ClosureCompiler().visit(tree)
@@ -0,0 +1,306 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+协作式分时执行
+
+语法树先编译为栈式虚拟机的指令序列，Execution保存程序计数器和操作数栈，
+每次run(budget)最多执行budget条指令后返回，下次从中断处继续。
+指令与节点基本一一对应(每个叶子、运算和赋值各一条，循环另有跳转指令)，
+空循环体也要执行跳转指令，所以死循环同样会让出控制权并受配额限制。
+结果、异常以及出错时已生效的赋值都与Interpreter相同。
+
+Scheduler在asyncio事件循环上交替执行多个程序，每个时间片quantum条指令，
+片与片之间让出事件循环。按虚拟时间公平调度: 任务每执行n条指令，
+虚拟时间增加n / 2**priority，总是运行虚拟时间最小的任务；新任务从当前
+虚拟时间开始，不会排在已经运行很久的大程序之后。quota限制一个程序
+最多执行的指令数，超出时抛出QuotaExceeded。
+
+	scheduler = Scheduler(quantum=2000)
+	scope = await scheduler.evaluate(text, priority=1, quota=10 ** 7)
+
+一个Scheduler只使用一个事件循环所在的线程，多核时每个进程各运行一个。
+源程序的解析在submit中一次完成，不分时间片。
+'''
+
+import asyncio
+import heapq
+import itertools
+import time
+
+from inter import PLUS, MINUS, MUL, DIV, NoOp, NodeVisitor, Lexer, Parser
+
+class QuotaExceeded(Exception):
+	'''
+	程序执行的指令数超出配额
+	'''
+	pass
+
+###############################################################################
+#                                                                             #
+#  VIRTUAL MACHINE                                                            #
+#                                                                             #
+###############################################################################
+
+# Opcodes 【虚拟机指令】
+(
+	CONST, LOAD, STORE, ADD, SUBTRACT, MULTIPLY, DIVIDE, POSITIVE, NEGATIVE,
+	JUMP, JUMP_UNLESS, FOR_START, FOR_NEXT, HALT
+) = range(14)
+
+BINARY = {PLUS: ADD, MINUS: SUBTRACT, MUL: MULTIPLY, DIV: DIVIDE}
+UNARY = {PLUS: POSITIVE, MINUS: NEGATIVE}
+
+class CodeCompiler(NodeVisitor):
+	'''
+	把语法树编译为指令列表，每条指令是(操作码, 参数...)
+	'''
+	def __init__(self):
+		self.code = []
+
+	def emit(self, *instruction):
+		self.code.append(instruction)
+		return len(self.code) - 1
+
+	def visit_Num(self, node):
+		self.emit(CONST, node.value)
+
+	def visit_Var(self, node):
+		self.emit(LOAD, node.value)
+
+	def visit_UnaryOp(self, node):
+		self.visit(node.expr)
+		self.emit(UNARY[node.op.type])
+
+	def visit_BinOp(self, node):
+		self.visit(node.left)
+		self.visit(node.right)
+		self.emit(BINARY[node.op.type])
+
+	def visit_Assign(self, node):
+		self.visit(node.right)
+		self.emit(STORE, node.left.value)
+
+	def visit_Compound(self, node):
+		for child in node.children:
+			if not isinstance(child, NoOp):
+				self.visit(child)
+
+	def visit_NoOp(self, node):
+		pass
+
+	def visit_While(self, node):
+		start = len(self.code)
+		self.visit(node.cond)
+		jump = self.emit(JUMP_UNLESS, None)
+		self.visit(node.body)
+		self.emit(JUMP, start)
+		self.code[jump] = (JUMP_UNLESS, len(self.code))
+
+	def visit_For(self, node):
+		#初值和终值只计算一次，栈上保存range的迭代器
+		self.visit(node.start)
+		self.visit(node.end)
+		self.emit(FOR_START)
+		start = self.emit(FOR_NEXT, node.var.value, None)
+		self.visit(node.body)
+		self.emit(JUMP, start)
+		self.code[start] = (FOR_NEXT, node.var.value, len(self.code))
+
+def compile_code(tree):
+	'''
+	把语法树编译为指令元组，最后一条是HALT
+	'''
+	compiler = CodeCompiler()
+	compiler.visit(tree)
+	compiler.emit(HALT)
+	return tuple(compiler.code)
+
+class Execution(object):
+	'''
+	一次可中断的执行: 指令、变量作用域、程序计数器和操作数栈
+	'''
+	def __init__(self, code, scope=None):
+		self.code = code
+		self.scope = {} if scope is None else scope
+		self.pc = 0
+		self.stack = []
+		self.executed = 0		#已执行的指令数
+		self.done = False
+
+	def run(self, budget=None):
+		'''
+		最多执行budget条指令(None表示执行到结束)，程序结束时返回True
+		'''
+		if self.done:
+			return True
+		code = self.code
+		scope = self.scope
+		stack = self.stack
+		push = stack.append
+		pop = stack.pop
+		pc = self.pc
+		count = 0
+		steps = itertools.count() if budget is None else range(budget)
+		try:
+			for count in steps:
+				op = code[pc]
+				pc += 1
+				kind = op[0]
+				if kind == LOAD:
+					value = scope.get(op[1])
+					if value is None:
+						raise NameError(repr(op[1]))
+					push(value)
+				elif kind == CONST:
+					push(op[1])
+				elif kind == STORE:
+					scope[op[1]] = pop()
+				elif kind == ADD:
+					right = pop()
+					stack[-1] = stack[-1] + right
+				elif kind == SUBTRACT:
+					right = pop()
+					stack[-1] = stack[-1] - right
+				elif kind == MULTIPLY:
+					right = pop()
+					stack[-1] = stack[-1] * right
+				elif kind == DIVIDE:
+					right = pop()
+					stack[-1] = stack[-1] / right
+				elif kind == FOR_NEXT:
+					value = next(stack[-1], None)
+					if value is None:
+						pop()
+						pc = op[2]
+					else:
+						scope[op[1]] = value
+				elif kind == JUMP:
+					pc = op[1]
+				elif kind == JUMP_UNLESS:
+					if not pop():
+						pc = op[1]
+				elif kind == NEGATIVE:
+					stack[-1] = -stack[-1]
+				elif kind == POSITIVE:
+					stack[-1] = +stack[-1]
+				elif kind == FOR_START:
+					end = pop()
+					stack[-1] = iter(range(stack[-1], end + 1))
+				else:
+					#HALT不计入执行的指令数
+					pc -= 1
+					self.done = True
+					break
+			else:
+				count = budget
+				if code[pc][0] == HALT:
+					self.done = True
+		except BaseException:
+			#出错的指令已经执行
+			self.executed += count + 1
+			self.done = True
+			raise
+		finally:
+			self.pc = pc
+		self.executed += count
+		return self.done
+
+
+###############################################################################
+#                                                                             #
+#  SCHEDULER                                                                  #
+#                                                                             #
+###############################################################################
+
+class Task(object):
+	'''
+	调度器中的一个程序
+	'''
+	def __init__(self, execution, priority, quota, future):
+		self.execution = execution
+		self.priority = priority
+		self.weight = 2.0 ** priority
+		self.quota = quota
+		self.future = future
+		self.vtime = 0.0		#虚拟时间
+		self.slices = 0			#运行过的时间片数
+		self.submitted = time.monotonic()
+		self.started = None
+		self.finished = None
+
+	@property
+	def executed(self):
+		return self.execution.executed
+
+	def __await__(self):
+		return self.future.__await__()
+
+class Scheduler(object):
+	'''
+	asyncio上的时间片调度器
+	quantum: 每个时间片执行的指令数
+	'''
+	def __init__(self, quantum=2000):
+		self.quantum = quantum
+		self.ready = []			#(虚拟时间, 提交序号, Task)的堆
+		self.sequence = itertools.count()
+		self.vtime = 0.0		#最近运行的任务的虚拟时间
+		self.runner = None
+
+	def submit(self, program, scope=None, priority=0, quota=None):
+		'''
+		提交源程序或语法树，返回Task，await得到执行后的变量作用域
+		priority每高1，分到的指令数加倍；quota为最多执行的指令数，None表示不限
+		必须在事件循环中调用
+		'''
+		if isinstance(program, str):
+			program = Parser(Lexer(program)).parse()
+		loop = asyncio.get_running_loop()
+		task = Task(Execution(compile_code(program), scope), priority, quota, loop.create_future())
+		task.vtime = self.vtime
+		heapq.heappush(self.ready, (task.vtime, next(self.sequence), task))
+		if self.runner is None or self.runner.done():
+			self.runner = loop.create_task(self.run())
+		return task
+
+	async def evaluate(self, program, scope=None, priority=0, quota=None):
+		return await self.submit(program, scope, priority, quota)
+
+	def __len__(self):
+		return len(self.ready)
+
+	async def run(self):
+		'''
+		运行所有就绪的任务，每个时间片之后让出事件循环
+		'''
+		ready = self.ready
+		while ready:
+			vtime, _, task = heapq.heappop(ready)
+			if task.future.done():
+				#等待方已经取消
+				continue
+			self.vtime = vtime
+			execution = task.execution
+			budget = self.quantum
+			if task.quota is not None:
+				budget = min(budget, task.quota - execution.executed)
+			if task.started is None:
+				task.started = time.monotonic()
+			before = execution.executed
+			try:
+				if budget <= 0:
+					raise QuotaExceeded('Quota of {} instructions exceeded'.format(task.quota))
+				done = execution.run(budget)
+			except Exception as e:
+				task.finished = time.monotonic()
+				task.future.set_exception(e)
+			else:
+				task.slices += 1
+				if done:
+					task.finished = time.monotonic()
+					task.future.set_result(execution.scope)
+				else:
+					task.vtime = vtime + (execution.executed - before) / task.weight
+					heapq.heappush(ready, (task.vtime, next(self.sequence), task))
+			await asyncio.sleep(0)
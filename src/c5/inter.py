@@ -17,10 +17,16 @@
 
     statement : compound_statement
               | assignment_statement
+              | while_statement
+              | for_statement
               | empty
 
     assignment_statement : variable ASSIGN expr
 
+    while_statement : WHILE expr DO statement
+
+    for_statement : FOR variable ASSIGN expr TO expr DO statement
+
     empty :
 
     expr: term ((PLUS | MINUS) term)*
@@ -36,6 +42,16 @@
     variable: ID
 '''
 
+import operator
+import sys
+
+# collections.abc会导入整个collections包，CPython启动时已加载_collections_abc，
+# 优先直接使用；其他实现中没有这个模块时退回公开的collections.abc
+try:
+	from _collections_abc import MutableMapping
+except ImportError:
+	from collections.abc import MutableMapping
+
 ###############################################################################
 #                                                                             #
 #  LEXER                                                                      #
@@ -47,21 +63,70 @@
 	INTEGER, PLUS, MINUS, MUL,
 	DIV, LPAREN, RPAREN, ID, 
 	BEGIN, END, ASSIGN, SEMI,
-	DOT, EOF
+	DOT, WHILE, DO, FOR,
+	TO, EOF
 ) = (
 	'INTEGER', 'PLUS', 'MINUS', 'MUL', 
 	'DIV', 'LPAREN', 'RPAREN', 'ID', 
 	'BEGIN', 'END', 'ASSIGN', 'SEMI',
-	'DOT', 'EOF'
+	'DOT', 'WHILE', 'DO', 'FOR',
+	'TO', 'EOF'
 )
 
+class Error(Exception):
+	'''
+	带源码位置的错误
+	只记录字符偏移，行列号在格式化错误时才由词法分析器计算
+	'''
+	def __init__(self, message, pos=None, lexer=None):
+		super().__init__(message)
+		self.message = message
+		self.pos = pos
+		self.lexer = lexer
+		self._location = None
+
+	def location(self):
+		'''
+		返回(行, 列)，位置未知时为(None, None)
+		'''
+		if self._location is None:
+			if self.pos is None or self.lexer is None:
+				self._location = (None, None)
+			else:
+				self._location = self.lexer.locate(self.pos)
+		return self._location
+
+	@property
+	def line(self):
+		return self.location()[0]
+
+	@property
+	def column(self):
+		return self.location()[1]
+
+	def __str__(self):
+		line, column = self.location()
+		if line is None:
+			return self.message
+		return '{} at line {}, column {}'.format(self.message, line, column)
+
+	def __reduce__(self):
+		return (self.__class__, (self.message, self.pos), {'_location': self.location()})
+
+class LexerError(Error):
+	pass
+
+class ParserError(Error):
+	pass
+
 class Token(object):
 	'''
 	单词或令牌
 	'''
-	def __init__(self, type, value):
+	def __init__(self, type, value, pos=None):
 		self.type = type     #单词类型
 		self.value = value   #单词的值
+		self.pos = pos       #单词在输入中的字符偏移
 
 	def __str__(self):
 		return 'Token({type}, {value})'.format(
@@ -72,22 +137,72 @@ class Token(object):
 	def __repr__(self):
 		return self.__str__()
 
+class SymbolTable(object):
+	'''
+	标识符表
+	每个不同的标识符只保存一份字符串并分配一个整数编号，
+	同一个表可以在同一类程序的多次词法分析之间共享
+	'''
+	def __init__(self):
+		self.ids = {}      #标识符 -> 编号
+		self.names = []    #编号 -> 标识符
+
+	def intern(self, name):
+		'''
+		返回标识符的编号，新标识符登记到表中
+		'''
+		sym = self.ids.get(name)
+		if sym is None:
+			sym = self.ids[name] = len(self.names)
+			self.names.append(name)
+		return sym
+
+	def name(self, sym):
+		return self.names[sym]
+
+	def __len__(self):
+		return len(self.names)
+
 RESERVED_KEYWORDS = {
 	'BEGIN' : Token('BEGIN', 'BEGIN'),
-	'END' : Token('END', 'END')
+	'END' : Token('END', 'END'),
+	'WHILE' : Token('WHILE', 'WHILE'),
+	'DO' : Token('DO', 'DO'),
+	'FOR' : Token('FOR', 'FOR'),
+	'TO' : Token('TO', 'TO')
 }
 
 class Lexer(object):
 	'''
 	词法分析器
 	'''
-	def __init__(self, text):
+	def __init__(self, text, symbols=None):
 		self.text = text
 		self.pos = 0
+		self.offset = 0      #text在整个输入中的偏移
+		self.lines = None    #换行符的偏移，第一次定位时才建立
+		self.symbols = SymbolTable() if symbols is None else symbols
 		self.current_char = self.text[self.pos]
 
 	def error(self):
-		raise Exception('Invalid character')
+		raise LexerError('Invalid character', self.offset + self.pos, self)
+
+	def locate(self, pos):
+		'''
+		把字符偏移转换为(行, 列)，在换行符索引上二分查找
+		'''
+		from bisect import bisect_left
+
+		if self.lines is None:
+			lines = []
+			i = self.text.find('\n')
+			while i >= 0:
+				lines.append(i)
+				i = self.text.find('\n', i + 1)
+			self.lines = lines
+		line = bisect_left(self.lines, pos)
+		start = self.lines[line - 1] + 1 if line else 0
+		return line + 1, pos - start + 1
 
 	def advance(self):
 		'''
@@ -131,12 +246,16 @@ class Lexer(object):
 		'''
 		从字符序列中获取标识符
 		'''
+		pos = self.offset + self.pos
 		result = ''
 		while self.current_char is not None and self.current_char.isalnum():
 			result += self.current_char
 			self.advance()
-		token = RESERVED_KEYWORDS.get(result, Token(ID, result))
-		return token
+		keyword = RESERVED_KEYWORDS.get(result)
+		if keyword is not None:
+			return Token(keyword.type, keyword.value, pos)
+		sym = self.symbols.intern(result)
+		return Token(ID, self.symbols.names[sym], pos)
 
 	def get_next_token(self):
 		'''
@@ -149,32 +268,34 @@ class Lexer(object):
 				self.skip_whitespace()
 				continue
 
+			pos = self.offset + self.pos
+
 			if self.current_char.isdigit():
-				return Token(INTEGER, self.integer())
+				return Token(INTEGER, self.integer(), pos)
 
 			if self.current_char == '+':
 				self.advance()
-				return Token(PLUS, '+')
+				return Token(PLUS, '+', pos)
 
 			if self.current_char == '-':
 				self.advance()
-				return Token(MINUS, '-')
+				return Token(MINUS, '-', pos)
 
 			if self.current_char == '*':
 				self.advance()
-				return Token(MUL, '*')
+				return Token(MUL, '*', pos)
 
 			if self.current_char == '/':
 				self.advance()
-				return Token(DIV, '/')
+				return Token(DIV, '/', pos)
 
 			if self.current_char == '(':
 				self.advance()
-				return Token(LPAREN, '(')
+				return Token(LPAREN, '(', pos)
 
 			if self.current_char == ')':
 				self.advance()
-				return Token(RPAREN, ')')
+				return Token(RPAREN, ')', pos)
 
 			if self.current_char.isalpha():
 				return self._id()
@@ -182,19 +303,93 @@ class Lexer(object):
 			if self.current_char == ':' and self.peek() == '=':
 				self.advance()
 				self.advance()
-				return Token(ASSIGN, ':=')
+				return Token(ASSIGN, ':=', pos)
 
 			if self.current_char == ';':
 				self.advance()
-				return Token(SEMI, ';')
+				return Token(SEMI, ';', pos)
 
 			if self.current_char == '.':
 				self.advance()
-				return Token(DOT, '.')
+				return Token(DOT, '.', pos)
 			
 			self.error()
 
-		return Token(EOF, None)
+		return Token(EOF, None, self.offset + self.pos)
+
+class StreamLexer(Lexer):
+	'''
+	流式词法分析器
+	从文件对象中按块读取字符序列，内存占用与程序长度无关。
+	只保留当前块和上一块，用于出错时定位
+	'''
+	def __init__(self, stream, chunk_size=1 << 16, symbols=None):
+		self.stream = stream
+		self.chunk_size = chunk_size
+		self.text = stream.read(chunk_size)
+		self.pos = 0
+		self.offset = 0
+		self.previous = ''     #上一块中已丢弃的字符
+		self.newlines = 0      #previous之前的换行符个数
+		self.line_start = 0    #previous开头所在行的起始偏移
+		self.symbols = SymbolTable() if symbols is None else symbols
+		self.current_char = self.text[0] if self.text else None
+
+	def discard(self, count):
+		'''
+		丢弃当前块的前count个字符
+		'''
+		window = self.offset - len(self.previous)
+		newlines = self.previous.count('\n')
+		if newlines:
+			self.newlines += newlines
+			self.line_start = window + self.previous.rfind('\n') + 1
+		self.previous = self.text[:count]
+		self.offset += count
+
+	def advance(self):
+		'''
+		从字符序列中获取下一个字符，当前块读完时读入下一块
+		'''
+		self.pos += 1
+		if self.pos > len(self.text) - 1:
+			self.discard(len(self.text))
+			self.text = self.stream.read(self.chunk_size)
+			self.pos = 0
+		if self.text:
+			self.current_char = self.text[self.pos]
+		else:
+			self.current_char = None
+
+	def peek(self):
+		'''
+		从字符序列中获取下一个字符，但不移动pos指针
+		'''
+		peek_pos = self.pos + 1
+		if peek_pos > len(self.text) - 1:
+			self.discard(self.pos)
+			self.text = self.text[self.pos:] + self.stream.read(self.chunk_size)
+			self.pos = 0
+			peek_pos = 1
+			if peek_pos > len(self.text) - 1:
+				return None
+		return self.text[peek_pos]
+
+	def locate(self, pos):
+		'''
+		把字符偏移转换为(行, 列)，偏移已不在保留的两块中时返回(None, None)
+		'''
+		window = self.offset - len(self.previous)
+		if pos < window:
+			return None, None
+		text = self.previous + self.text
+		index = pos - window
+		newlines = text.count('\n', 0, index)
+		if newlines:
+			start = window + text.rfind('\n', 0, index) + 1
+		else:
+			start = self.line_start
+		return self.newlines + newlines + 1, pos - start + 1
 
 
 ###############################################################################
@@ -264,6 +459,26 @@ class NoOp(AST):
 	'''
 	pass
 
+class While(AST):
+	'''
+	WHILE循环，条件的值不为0时执行循环体
+	'''
+	def __init__(self, token, cond, body):
+		self.token = token
+		self.cond = cond			#循环条件
+		self.body = body			#循环体
+
+class For(AST):
+	'''
+	FOR循环，循环变量依次取start到end(含)的整数
+	'''
+	def __init__(self, token, var, start, end, body):
+		self.token = token
+		self.var = var				#循环变量
+		self.start = start			#初值
+		self.end = end				#终值
+		self.body = body			#循环体
+
 class Parser(object):
 	'''
 	语法解析器
@@ -273,7 +488,7 @@ class Parser(object):
 		self.current_token = self.lexer.get_next_token()
 
 	def error(self):
-		raise Exception('Invalid syntax')
+		raise ParserError('Invalid syntax', self.current_token.pos, self.lexer)
 
 	def eat(self, token_type):
 		'''
@@ -360,6 +575,10 @@ class Parser(object):
 			node = self.compound_statement()
 		elif self.current_token.type == ID:
 			node = self.assignment_statement()
+		elif self.current_token.type == WHILE:
+			node = self.while_statement()
+		elif self.current_token.type == FOR:
+			node = self.for_statement()
 		else:
 			node = self.empty()
 		return node
@@ -375,6 +594,30 @@ class Parser(object):
 		node = Assign(left, token, right)
 		return node
 
+	def while_statement(self):
+		'''
+		WHILE循环语句
+		'''
+		token = self.current_token
+		self.eat(WHILE)
+		cond = self.expr()
+		self.eat(DO)
+		return While(token, cond, self.statement())
+
+	def for_statement(self):
+		'''
+		FOR循环语句
+		'''
+		token = self.current_token
+		self.eat(FOR)
+		var = self.variable()
+		self.eat(ASSIGN)
+		start = self.expr()
+		self.eat(TO)
+		end = self.expr()
+		self.eat(DO)
+		return For(token, var, start, end, self.statement())
+
 	def variable(self):
 		'''
 		变量
@@ -420,6 +663,26 @@ class Parser(object):
 
 		return root
 
+	def iter_statements(self):
+		'''
+		流式解析程序，逐条产生顶层语句，不构建整个Compound节点
+		语法与program相同
+		'''
+		self.eat(BEGIN)
+		yield self.statement()
+
+		while self.current_token.type == SEMI:
+			self.eat(SEMI)
+			yield self.statement()
+
+		if self.current_token.type == ID:
+			self.error()
+
+		self.eat(END)
+		self.eat(DOT)
+		if self.current_token.type != EOF:
+			self.error()
+
 	def program(self):
 		'''
 		程序解析入口
@@ -437,6 +700,123 @@ class Parser(object):
 			self.error()
 		return node
 
+class RecoveringParser(Parser):
+	'''
+	可恢复错误的语法解析器
+	遇到错误时记录到errors中，跳到同层的SEMI或END继续解析，
+	一遍收集所有语法错误，并返回由合法语句组成的语法树
+	'''
+	def __init__(self, lexer):
+		self.lexer = lexer
+		self.errors = []
+		self.current_token = self.next_token()
+
+	def record(self, error):
+		'''
+		记录错误，同一位置只保留第一个
+		'''
+		if not self.errors or self.errors[-1].pos != error.pos:
+			self.errors.append(error)
+
+	def next_token(self):
+		'''
+		获取下一个单词，跳过非法字符
+		'''
+		while True:
+			try:
+				return self.lexer.get_next_token()
+			except LexerError as e:
+				self.record(e)
+				self.lexer.advance()
+
+	def eat(self, token_type):
+		if self.current_token.type == token_type:
+			self.current_token = self.next_token()
+		else:
+			self.error()
+
+	def expect(self, token_type):
+		'''
+		同eat，但只记录错误不抛出
+		'''
+		try:
+			self.eat(token_type)
+		except ParserError as e:
+			self.record(e)
+
+	def synchronize(self):
+		'''
+		跳过单词直到同层的SEMI或END，嵌套的BEGIN ... END整体跳过
+		'''
+		depth = 0
+		while True:
+			token_type = self.current_token.type
+			if token_type in (DOT, EOF):
+				return
+			if depth == 0 and token_type in (SEMI, END):
+				return
+			if token_type == BEGIN:
+				depth += 1
+			elif token_type == END:
+				depth -= 1
+			self.current_token = self.next_token()
+
+	def statement_list(self):
+		'''
+		多条语句，出错(包括含非法字符)的语句被丢弃
+		'''
+		results = []
+		while True:
+			errors = len(self.errors)
+			try:
+				node = self.statement()
+			except ParserError as e:
+				self.record(e)
+				self.synchronize()
+			else:
+				if len(self.errors) == errors or isinstance(node, Compound):
+					results.append(node)
+
+			if self.current_token.type == SEMI:
+				self.eat(SEMI)
+				continue
+			if self.current_token.type in (END, DOT, EOF):
+				return results
+
+			try:
+				self.error()
+			except ParserError as e:
+				self.record(e)
+			self.synchronize()
+			if self.current_token.type != SEMI:
+				return results
+			self.eat(SEMI)
+
+	def compound_statement(self):
+		self.expect(BEGIN)
+		nodes = self.statement_list()
+		self.expect(END)
+
+		root = Compound()
+		for node in nodes:
+			root.children.append(node)
+
+		return root
+
+	def program(self):
+		node = self.compound_statement()
+		self.expect(DOT)
+		return node
+
+	def parse(self):
+		node = self.program()
+		if self.current_token.type != EOF:
+			try:
+				self.error()
+			except ParserError as e:
+				self.record(e)
+		return node
+
 
 ###############################################################################
 #                                                                             #
@@ -444,24 +824,168 @@ class Parser(object):
 #                                                                             #
 ###############################################################################
 
+class _DispatchTable(dict):
+	'''
+	节点类型 -> 访问函数 的分派表
+	首次遇到某个节点类型时解析出访问函数并缓存，之后直接查表
+	'''
+	def __init__(self, visitor_class):
+		super().__init__()
+		self.visitor_class = visitor_class
+
+	def __missing__(self, node_type):
+		func = self.visitor_class.resolve(node_type)
+		self[node_type] = func
+		return func
+
 class NodeVisitor(object):
 	'''
 	节点访问器
+	每个访问器类拥有一张分派表，按节点类型直接分派到visit_<节点类名>方法
+	或通过register注册的访问函数
 	'''
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		cls._registry = {}
+		cls._dispatch = _DispatchTable(cls)
+
+	@classmethod
+	def register(cls, node_type, func=None):
+		'''
+		为节点类型注册访问函数，无需派生子类，可作为装饰器使用:
+
+			@Interpreter.register(MyNode)
+			def visit_mynode(interpreter, node):
+				...
+
+		注册对该访问器类及其所有子类生效
+		'''
+		if func is None:
+			def decorator(func):
+				cls.register(node_type, func)
+				return func
+			return decorator
+		cls._registry[node_type] = func
+		cls.invalidate()
+		return func
+
+	@classmethod
+	def invalidate(cls):
+		'''
+		清空该访问器类及其子类的分派表
+		'''
+		cls._dispatch.clear()
+		for subclass in cls.__subclasses__():
+			subclass.invalidate()
+
+	@classmethod
+	def resolve(cls, node_type):
+		'''
+		按节点类型的继承顺序查找访问函数:
+		先查注册表，再查visit_<节点类名>方法，都没有时返回generic_visit
+		'''
+		for klass in node_type.__mro__:
+			for visitor_class in cls.__mro__:
+				registry = visitor_class.__dict__.get('_registry')
+				if registry and klass in registry:
+					return registry[klass]
+			func = getattr(cls, 'visit_' + klass.__name__, None)
+			if func is not None:
+				return func
+		return cls.generic_visit
+
 	def visit(self, node):
 		'''
 		访问节点，如果子类没有提供访问方法，将调用默认访问方法
-
 		'''
-		method_name = 'visit_' + type(node).__name__
-		visitor = getattr(self, method_name, self.generic_visit)
-		return visitor(node)
+		return self._dispatch[node.__class__](self, node)
 
 	def generic_visit(self, node):
 		'''
 		节点默认访问方法
 		'''
-		raise Exception("No visit_{} method".format(node.__name__))
+		raise Exception("No visit_{} method".format(type(node).__name__))
+
+NodeVisitor._registry = {}
+NodeVisitor._dispatch = _DispatchTable(NodeVisitor)
+
+_DELETED = object()
+
+class Scope(MutableMapping):
+	'''
+	分层的变量作用域(写时复制)
+	写入只落在本层，读取时沿parent链向上查找，
+	派生子作用域不复制父作用域中的变量
+	'''
+	MAX_DEPTH = 8
+
+	def __init__(self, vars=None, parent=None):
+		self.vars = {} if vars is None else vars
+		self.parent = parent
+		self.depth = 0 if parent is None else parent.depth + 1
+
+	def get(self, name, default=None):
+		scope = self
+		while scope is not None:
+			vars = scope.vars
+			if name in vars:
+				value = vars[name]
+				return default if value is _DELETED else value
+			scope = scope.parent
+		return default
+
+	def __getitem__(self, name):
+		value = self.get(name, _DELETED)
+		if value is _DELETED:
+			raise KeyError(name)
+		return value
+
+	def __setitem__(self, name, value):
+		self.vars[name] = value
+
+	def __delitem__(self, name):
+		if name not in self:
+			raise KeyError(name)
+		if self.parent is None:
+			del self.vars[name]
+		else:
+			self.vars[name] = _DELETED
+
+	def __contains__(self, name):
+		return self.get(name, _DELETED) is not _DELETED
+
+	def __iter__(self):
+		return iter(self.flatten())
+
+	def __len__(self):
+		return len(self.flatten())
+
+	def __repr__(self):
+		return repr(self.flatten())
+
+	def flatten(self):
+		'''
+		合并各层，返回普通字典
+		'''
+		if self.parent is None:
+			result = {}
+		else:
+			result = self.parent.flatten()
+		for name, value in self.vars.items():
+			if value is _DELETED:
+				result.pop(name, None)
+			else:
+				result[name] = value
+		return result
+
+	def child(self):
+		'''
+		派生子作用域，子作用域的写入对本作用域不可见
+		层数超过MAX_DEPTH时先压平，保证查找代价有界
+		'''
+		if self.depth >= self.MAX_DEPTH:
+			return Scope(parent=Scope(self.flatten()))
+		return Scope(parent=self)
 
 class Interpreter(NodeVisitor):
 	'''
@@ -470,8 +994,23 @@ class Interpreter(NodeVisitor):
 
 	GLOBAL_SCOPE = {}
 
-	def __init__(self, parser):
+	def __init__(self, parser, scope=None):
 		self.parser = parser
+		if scope is not None:
+			self.GLOBAL_SCOPE = scope
+
+	def snapshot(self):
+		'''
+		冻结当前变量状态并返回快照，之后的写入落在快照之上的新层
+		通过snapshot.child()可以派生出共享快照的写时复制作用域
+		'''
+		scope = self.GLOBAL_SCOPE
+		if not isinstance(scope, Scope):
+			scope = Scope(dict(scope))
+		elif not scope.vars and scope.parent is not None:
+			scope = scope.parent
+		self.GLOBAL_SCOPE = scope.child()
+		return scope
 	
 	def visit_BinOp(self, node):
 		'''
@@ -527,6 +1066,25 @@ class Interpreter(NodeVisitor):
 		else:
 			return val
 
+	def visit_While(self, node):
+		'''
+		WHILE循环，每次迭代前重新计算条件
+		'''
+		while self.visit(node.cond):
+			self.visit(node.body)
+
+	def visit_For(self, node):
+		'''
+		FOR循环，初值和终值只在进入循环时计算一次，必须是整数；
+		循环体对循环变量的赋值不影响迭代次数
+		'''
+		var_name = node.var.value
+		start = self.visit(node.start)
+		end = self.visit(node.end)
+		for value in range(start, end + 1):
+			self.GLOBAL_SCOPE[var_name] = value
+			self.visit(node.body)
+
 	def interpret(self):
 		'''
 		解释语法树
@@ -536,8 +1094,140 @@ class Interpreter(NodeVisitor):
 			return ''
 		return self.visit(tree)
 
+	def interpret_stream(self):
+		'''
+		流式解释: 顶层语句解析一条执行一条，执行后即丢弃
+		合法程序的最终变量状态与interpret相同，
+		但语法错误之前的语句已经执行
+		'''
+		for node in self.parser.iter_statements():
+			self.visit(node)
 
-def main():
+
+###############################################################################
+#                                                                             #
+#  EVALUATOR                                                                  #
+#                                                                             #
+###############################################################################
+
+class EvalError(object):
+	'''
+	求值过程中产生的异常，推迟到解析完成后再抛出
+	'''
+	def __init__(self, exc):
+		self.exc = exc
+
+class Evaluator(Parser):
+	'''
+	单遍表达式求值器
+	在算符优先解析的同时直接计算结果，不构建语法树，适用于只求值一次的表达式。
+	语法错误立即抛出，运算错误和未定义变量推迟到解析结束，
+	因此结果和异常都与Parser.expr + Interpreter的路径一致
+	'''
+	BINARY = {
+		PLUS: (1, operator.add),
+		MINUS: (1, operator.sub),
+		MUL: (2, operator.mul),
+		DIV: (2, operator.truediv),
+	}
+
+	UNARY = {
+		PLUS: operator.pos,
+		MINUS: operator.neg,
+	}
+
+	def __init__(self, lexer, scope=None):
+		super().__init__(lexer)
+		self.scope = Interpreter.GLOBAL_SCOPE if scope is None else scope
+
+	def apply(self, op, *args):
+		'''
+		计算一次运算，操作数中已有错误时按求值顺序传递第一个错误
+		'''
+		for arg in args:
+			if arg.__class__ is EvalError:
+				return arg
+		try:
+			return op(*args)
+		except Exception as e:
+			return EvalError(e)
+
+	def factor(self):
+		'''
+		因子求值
+		'''
+		token = self.current_token
+		if token.type == INTEGER:
+			self.eat(INTEGER)
+			return token.value
+		elif token.type == ID:
+			self.eat(ID)
+			val = self.scope.get(token.value)
+			if val is None:
+				return EvalError(NameError(repr(token.value)))
+			return val
+		elif token.type in self.UNARY:
+			self.eat(token.type)
+			return self.apply(self.UNARY[token.type], self.factor())
+		elif token.type == LPAREN:
+			self.eat(LPAREN)
+			value = self.expr()
+			self.eat(RPAREN)
+			return value
+		else:
+			self.error()
+
+	def expr(self, min_prec=1):
+		'''
+		算符优先求值，同级运算左结合
+		'''
+		value = self.factor()
+		while True:
+			token = self.current_token
+			binary = self.BINARY.get(token.type)
+			if binary is None or binary[0] < min_prec:
+				return value
+			prec, op = binary
+			self.eat(token.type)
+			value = self.apply(op, value, self.expr(prec + 1))
+
+	def evaluate(self):
+		'''
+		解析并计算整个输入表达式
+		'''
+		value = self.expr()
+		if self.current_token.type != EOF:
+			self.error()
+		if value.__class__ is EvalError:
+			raise value.exc
+		return value
+
+
+USAGE = '''usage: python inter.py [mode] [file ...]
+
+modes:
+  (none)            交互模式，每行一个程序或一个表达式
+  -s, --stream      流式执行文件或标准输入中的一个程序
+  -p, --parallel    并行执行文件或标准输入中的一个程序
+  -b, --batch       批量执行文件或标准输入中以END.分隔的多个程序，输出JSON行
+  -c, --check       检查文件或标准输入中的程序，一次列出所有语法错误
+  -m, --memory      按阶段剖析文件或标准输入中一个程序的内存分配
+'''
+
+def read_source(args):
+	'''
+	读取命令行指定的文件，未指定或为-时读取标准输入
+	'''
+	if not args or args[0] == '-':
+		return sys.stdin
+	return open(args[0])
+
+def run_repl(args):
+	'''
+	交互模式
+	不以BEGIN开头的一行是表达式，用Evaluator单遍求值并输出结果，
+	表达式中的变量取自之前各行程序的赋值
+	'''
 	while True:
 		try:
 			text = input('>> ')
@@ -547,12 +1237,98 @@ def main():
 		if not text:
 			continue
 
+		evaluator = Evaluator(Lexer(text))
+		if evaluator.current_token.type != BEGIN:
+			print(evaluator.evaluate())
+			continue
+
 		lexer = Lexer(text)
 		parser = Parser(lexer)
 		interpreter = Interpreter(parser)
 		interpreter.interpret()
 		print(interpreter.GLOBAL_SCOPE)
 
+def run_stream(args):
+	'''
+	流式模式，只依赖本模块
+	'''
+	with read_source(args) as source:
+		interpreter = Interpreter(Parser(StreamLexer(source)))
+		interpreter.interpret_stream()
+	print(interpreter.GLOBAL_SCOPE)
+
+def run_parallel(args):
+	'''
+	并行模式，进程池和线程池在此时才导入
+	'''
+	from parallel import ParallelInterpreter
+
+	with read_source(args) as source:
+		text = source.read()
+	interpreter = ParallelInterpreter(Parser(Lexer(text)))
+	with interpreter.scheduler:
+		interpreter.interpret()
+	print(interpreter.GLOBAL_SCOPE)
+
+def run_batch(args):
+	'''
+	批处理模式，有程序出错时以状态码1退出
+	'''
+	from batch import run_batch
+	if run_batch(args):
+		sys.exit(1)
+
+def run_check(args):
+	'''
+	语法检查模式，有错误时以状态码1退出
+	'''
+	with read_source(args) as source:
+		text = source.read()
+	parser = RecoveringParser(Lexer(text))
+	parser.parse()
+	name = args[0] if args else '-'
+	for error in parser.errors:
+		print('{}:{}:{}: {}: {}'.format(
+			name, error.line, error.column, type(error).__name__, error.message
+		))
+	if parser.errors:
+		sys.exit(1)
+
+def run_memory(args):
+	'''
+	内存剖析模式
+	'''
+	from memprof import run_memory
+	run_memory(args)
+
+MODES = {
+	'-s': run_stream,
+	'--stream': run_stream,
+	'-p': run_parallel,
+	'--parallel': run_parallel,
+	'-b': run_batch,
+	'--batch': run_batch,
+	'-c': run_check,
+	'--check': run_check,
+	'-m': run_memory,
+	'--memory': run_memory,
+}
+
+def main(argv=None):
+	'''
+	命令行入口，按模式只导入所需的模块
+	'''
+	args = sys.argv[1:] if argv is None else argv
+	if not args:
+		return run_repl(args)
+	if args[0] in ('-h', '--help'):
+		print(USAGE, end='')
+		return
+	mode = MODES.get(args[0])
+	if mode is None:
+		sys.exit(USAGE)
+	return mode(args[1:])
+
 
 if __name__ == '__main__':
 	main()
@@ -0,0 +1,232 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+分层执行
+
+TieredInterpreter统计每个Compound块的执行次数，冷块仍由树遍历解释执行；
+执行次数达到阈值后，块被编译为一个Python函数:
+变量放在局部变量槽中，常量子表达式在编译时折叠，嵌套的块直接内联。
+编译后的函数与树遍历的结果、异常以及出错时已生效的赋值都相同。
+
+	jit = JIT(threshold=10)
+	for _ in range(100):
+		TieredInterpreter(None, scope={}, jit=jit).visit(tree)
+	print(jit.stats())
+'''
+
+import operator
+import time
+from weakref import WeakKeyDictionary
+
+from inter import PLUS, MINUS, MUL, DIV, NodeVisitor, Interpreter
+
+###############################################################################
+#                                                                             #
+#  COMPILER                                                                   #
+#                                                                             #
+###############################################################################
+
+class Uncompilable(Exception):
+	'''
+	块中含有编译器不支持的节点
+	'''
+	pass
+
+BINARY_OPERATORS = {
+	PLUS: ('+', operator.add),
+	MINUS: ('-', operator.sub),
+	MUL: ('*', operator.mul),
+	DIV: ('/', operator.truediv),
+}
+UNARY_OPERATORS = {
+	PLUS: ('+', operator.pos),
+	MINUS: ('-', operator.neg),
+}
+
+def load(scope, name):
+	'''
+	读取变量，与Interpreter.visit_Var相同
+	'''
+	val = scope.get(name)
+	if val is None:
+		raise NameError(repr(name))
+	return val
+
+class BlockCompiler(NodeVisitor):
+	'''
+	把Compound块编译为Python源码
+	表达式的visit返回(源码, 常量值)，不是常量时常量值为NOT_CONSTANT
+	'''
+	NOT_CONSTANT = object()
+
+	def __init__(self):
+		self.lines = []
+		self.slots = {}			#变量名 -> 局部变量槽
+		self.loaded = set()		#已经读入或写入过的槽
+		self.constants = []		#不能写成字面量的常量
+
+	def slot(self, name):
+		slot = self.slots.get(name)
+		if slot is None:
+			slot = self.slots[name] = 's{}'.format(len(self.slots))
+		return slot
+
+	def constant(self, value):
+		'''
+		常量的源码表示，小整数直接写成字面量
+		'''
+		if type(value) is int and -(1 << 64) < value < (1 << 64):
+			return repr(value)
+		self.constants.append(value)
+		return 'c{}'.format(len(self.constants) - 1)
+
+	def fold(self, func, *args):
+		'''
+		折叠常量运算，运算出错时保留到运行时再抛出
+		'''
+		try:
+			value = func(*args)
+		except Exception:
+			return self.NOT_CONSTANT
+		return value
+
+	def visit_Num(self, node):
+		return self.constant(node.value), node.value
+
+	def visit_Var(self, node):
+		slot = self.slot(node.value)
+		if slot in self.loaded:
+			return slot, self.NOT_CONSTANT
+		self.loaded.add(slot)
+		return '({} := load(scope, {!r}))'.format(slot, node.value), self.NOT_CONSTANT
+
+	def visit_UnaryOp(self, node):
+		code, value = self.visit(node.expr)
+		symbol, func = UNARY_OPERATORS[node.op.type]
+		if value is not self.NOT_CONSTANT:
+			folded = self.fold(func, value)
+			if folded is not self.NOT_CONSTANT:
+				return self.constant(folded), folded
+		return '({}{})'.format(symbol, code), self.NOT_CONSTANT
+
+	def visit_BinOp(self, node):
+		left, left_value = self.visit(node.left)
+		right, right_value = self.visit(node.right)
+		symbol, func = BINARY_OPERATORS[node.op.type]
+		if left_value is not self.NOT_CONSTANT and right_value is not self.NOT_CONSTANT:
+			folded = self.fold(func, left_value, right_value)
+			if folded is not self.NOT_CONSTANT:
+				return self.constant(folded), folded
+		return '({} {} {})'.format(left, symbol, right), self.NOT_CONSTANT
+
+	def visit_Assign(self, node):
+		code, _ = self.visit(node.right)
+		slot = self.slot(node.left.value)
+		self.loaded.add(slot)
+		self.lines.append('scope[{!r}] = {} = {}'.format(node.left.value, slot, code))
+
+	def visit_Compound(self, node):
+		for child in node.children:
+			self.visit(child)
+
+	def visit_NoOp(self, node):
+		pass
+
+	def generic_visit(self, node):
+		raise Uncompilable(type(node).__name__)
+
+	def compile(self, node):
+		'''
+		编译块，返回函数 f(scope)
+		'''
+		self.visit(node)
+		params = ''.join(', c{}=c{}'.format(i, i) for i in range(len(self.constants)))
+		source = 'def block(scope, load=load{}):\n\t{}\n'.format(
+			params, '\n\t'.join(self.lines) or 'pass'
+		)
+		namespace = {'load': load}
+		namespace.update(('c{}'.format(i), value) for i, value in enumerate(self.constants))
+		exec(compile(source, '<jit>', 'exec'), namespace)
+		return namespace['block']
+
+
+###############################################################################
+#                                                                             #
+#  TIERED EXECUTION                                                           #
+#                                                                             #
+###############################################################################
+
+class JIT(object):
+	'''
+	块的执行计数和编译缓存，可以在多个解释器之间共享
+	threshold: 块执行多少次后编译
+	'''
+	UNCOMPILABLE = object()
+
+	def __init__(self, threshold=10):
+		self.threshold = threshold
+		self.counts = WeakKeyDictionary()
+		self.compiled = WeakKeyDictionary()
+		self.interpreted_runs = 0
+		self.compiled_runs = 0
+		self.tier_ups = 0
+		self.failures = 0
+		self.compile_time = 0.0
+
+	def lookup(self, node):
+		'''
+		返回块的编译结果，块还是冷的时返回None
+		'''
+		code = self.compiled.get(node)
+		if code is not None:
+			if code is self.UNCOMPILABLE:
+				self.interpreted_runs += 1
+				return None
+			self.compiled_runs += 1
+			return code
+
+		count = self.counts.get(node, 0) + 1
+		if count < self.threshold:
+			self.counts[node] = count
+			self.interpreted_runs += 1
+			return None
+
+		self.counts.pop(node, None)
+		start = time.perf_counter()
+		try:
+			code = BlockCompiler().compile(node)
+		except (Uncompilable, RecursionError, MemoryError, SyntaxError):
+			code = self.UNCOMPILABLE
+			self.failures += 1
+		else:
+			self.tier_ups += 1
+		self.compile_time += time.perf_counter() - start
+		self.compiled[node] = code
+		return self.lookup(node)
+
+	def stats(self):
+		runs = self.interpreted_runs + self.compiled_runs
+		return {
+			'runs': runs,
+			'interpreted_runs': self.interpreted_runs,
+			'compiled_runs': self.compiled_runs,
+			'hit_rate': self.compiled_runs / runs if runs else 0.0,
+			'tier_ups': self.tier_ups,
+			'failures': self.failures,
+			'compile_time': self.compile_time,
+		}
+
+class TieredInterpreter(Interpreter):
+	'''
+	分层解释器，热的Compound块交给编译后的函数执行
+	'''
+	def __init__(self, parser, scope=None, jit=None):
+		super().__init__(parser, scope)
+		self.jit = JIT() if jit is None else jit
+
+	def visit_Compound(self, node):
+		code = self.jit.lookup(node)
+		if code is None:
+			return super().visit_Compound(node)
+		code(self.GLOBAL_SCOPE)
@@ -0,0 +1,310 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+循环执行引擎
+
+LoopInterpreter在ClosureCompiler的基础上把WHILE/FOR循环编译为闭包执行，
+结果、异常以及出错时已生效的赋值都与Interpreter相同:
+
+	不变量外提   不依赖循环内赋值变量的子表达式，每次进入循环后第一次用到时计算，
+	             之后的迭代直接复用
+	循环变量槽   FOR的循环变量在循环内保存在局部槽中，进入循环时写入初值，
+	             离开循环时写回最终值
+	闭式求值     循环体只由 x := x + e、x := x - e、x := x * c 组成，
+	             e是循环变量的一次式、c与循环无关，且取值都是整数时，
+	             直接用求和公式和乘方算出结果，不再逐次迭代
+
+	interpreter = LoopInterpreter(Parser(Lexer(text)))
+	interpreter.interpret()
+'''
+
+from weakref import WeakKeyDictionary
+
+from inter import PLUS, MINUS, MUL, BinOp, UnaryOp, Num, Var, Assign, Compound, NoOp, Interpreter
+from closure import ClosureCompiler
+from analysis import usage
+
+UNSET = object()
+
+class Loop(object):
+	'''
+	编译中的循环: 循环体内赋值的变量，以及外提到该循环的不变量
+	'''
+	def __init__(self, written):
+		self.written = written
+		self.cells = []
+
+	def hoist(self, code):
+		'''
+		把不变量表达式包装为第一次求值后保存结果的闭包
+		'''
+		cell = [UNSET]
+		self.cells.append(cell)
+
+		def hoisted(scope):
+			value = cell[0]
+			if value is UNSET:
+				value = cell[0] = code(scope)
+			return value
+		return hoisted
+
+def reset(cells):
+	for cell in cells:
+		cell[0] = UNSET
+
+def degree(node, name):
+	'''
+	表达式关于变量name的次数，含除法时返回None
+	'''
+	if isinstance(node, Num):
+		return 0
+	if isinstance(node, Var):
+		return 1 if node.value == name else 0
+	if isinstance(node, UnaryOp):
+		return degree(node.expr, name)
+	if isinstance(node, BinOp):
+		left = degree(node.left, name)
+		right = degree(node.right, name)
+		if left is None or right is None:
+			return None
+		if node.op.type in (PLUS, MINUS):
+			return max(left, right)
+		if node.op.type == MUL:
+			return left + right
+	return None
+
+def statements(node):
+	'''
+	展开嵌套的复合语句并去掉空操作
+	'''
+	if isinstance(node, Compound):
+		result = []
+		for child in node.children:
+			result.extend(statements(child))
+		return result
+	if isinstance(node, NoOp):
+		return []
+	return [node]
+
+class LoopCompiler(ClosureCompiler):
+	'''
+	带循环优化的闭包编译器
+	'''
+	def __init__(self):
+		self.loops = []		#从外到内正在编译的循环
+		self.slots = {}		#FOR循环变量 -> 槽
+
+	def target(self, node):
+		'''
+		表达式可以外提到的最外层循环，不是不变量时返回None
+		'''
+		names = usage(node)[0]
+		target = None
+		for loop in reversed(self.loops):
+			if names & loop.written:
+				break
+			target = loop
+		return target
+
+	def hoisted(self, node, compile):
+		loop = self.target(node) if self.loops else None
+		if loop is None:
+			return compile(node)
+		loops, self.loops = self.loops, []
+		try:
+			code = compile(node)
+		finally:
+			self.loops = loops
+		return loop.hoist(code)
+
+	def visit_BinOp(self, node):
+		return self.hoisted(node, super().visit_BinOp)
+
+	def visit_UnaryOp(self, node):
+		return self.hoisted(node, super().visit_UnaryOp)
+
+	def visit_Var(self, node):
+		slot = self.slots.get(node.value)
+		if slot is None:
+			return super().visit_Var(node)
+		return lambda scope: slot[0]
+
+	def visit_Assign(self, node):
+		slot = self.slots.get(node.left.value)
+		if slot is None:
+			return super().visit_Assign(node)
+		expr = self.visit(node.right)
+
+		def assign(scope):
+			slot[0] = expr(scope)
+		return assign
+
+	def visit_While(self, node):
+		loop = Loop(usage(node.body)[1])
+		self.loops.append(loop)
+		cond = self.visit(node.cond)
+		body = self.visit(node.body)
+		self.loops.pop()
+		cells = loop.cells
+
+		def run(scope):
+			reset(cells)
+			try:
+				while cond(scope):
+					body(scope)
+			finally:
+				reset(cells)
+		return run
+
+	def visit_For(self, node):
+		name = node.var.value
+		start = self.visit(node.start)
+		end = self.visit(node.end)
+
+		#与外层FOR同名的循环变量共用外层的槽，由外层负责写回
+		slot = self.slots.get(name)
+		owner = slot is None
+		if owner:
+			slot = self.slots[name] = [None]
+		loop = Loop(usage(node.body)[1] | {name})
+		self.loops.append(loop)
+		body = self.visit(node.body)
+		closed = self.closed_form(node, name, slot)
+		self.loops.pop()
+		if owner:
+			del self.slots[name]
+		cells = loop.cells
+
+		def run(scope):
+			first = start(scope)
+			values = range(first, end(scope) + 1)
+			if not values:
+				return
+			reset(cells)
+			if owner:
+				#与Interpreter一样进入循环时就在作用域中建立循环变量，保持插入顺序
+				scope[name] = first
+			try:
+				if closed is not None and closed(scope, first, len(values)):
+					slot[0] = values[-1]
+					return
+				for value in values:
+					slot[0] = value
+					body(scope)
+			finally:
+				reset(cells)
+				if owner:
+					scope[name] = slot[0]
+		return run
+
+	def closed_form(self, node, name, slot):
+		'''
+		识别累加循环，返回 f(scope, 初值, 迭代次数)，成功算出结果时返回True；
+		不是累加循环时返回None
+		'''
+		targets = set()
+		updates = []
+		for statement in statements(node.body):
+			if not isinstance(statement, Assign):
+				return None
+			target = statement.left.value
+			if target in self.slots or target in targets:
+				return None
+			targets.add(target)
+			update = self.accumulation(statement.right, target, name)
+			if update is None:
+				return None
+			updates.append((target,) + update)
+
+		if not updates:
+			return None
+		compiled = []
+		for target, op, terms in updates:
+			for _, term in terms:
+				if usage(term)[0] & targets:
+					return None
+			compiled.append((target, op, [(sign, self.visit(term)) for sign, term in terms]))
+
+		def increment(scope, terms):
+			total = 0
+			for sign, term in terms:
+				total = total + term(scope) if sign > 0 else total - term(scope)
+			return total
+
+		def closed(scope, first, count):
+			results = []
+			try:
+				for target, op, terms in compiled:
+					value = scope.get(target)
+					slot[0] = first
+					head = increment(scope, terms)
+					step = 0
+					if op != MUL and count > 1:
+						slot[0] = first + 1
+						step = increment(scope, terms) - head
+					if type(value) is not int or type(head) is not int or type(step) is not int:
+						return False
+					if op == MUL:
+						results.append((target, value * head ** count))
+					else:
+						results.append((target, value + count * head + step * (count * (count - 1) // 2)))
+			except Exception:
+				#出错时改为逐次迭代，在与Interpreter相同的位置抛出异常
+				return False
+			for target, value in results:
+				scope[target] = value
+			return True
+		return closed
+
+	def accumulation(self, expr, target, name):
+		'''
+		识别 target := target (+|-) e1 (+|-) e2 ...、target := e + target 和
+		target := target * c (或 c * target)，返回(运算, [(符号, 项)])
+		e是循环变量的一次式，c与循环无关
+		'''
+		if not isinstance(expr, BinOp):
+			return None
+		if expr.op.type == MUL:
+			if isinstance(expr.left, Var) and expr.left.value == target:
+				term = expr.right
+			elif isinstance(expr.right, Var) and expr.right.value == target:
+				term = expr.left
+			else:
+				return None
+			if degree(term, name) != 0:
+				return None
+			return MUL, [(1, term)]
+
+		if expr.op.type == PLUS and isinstance(expr.right, Var) and expr.right.value == target:
+			terms = [(1, expr.left)]
+		else:
+			terms = []
+			while isinstance(expr, BinOp) and expr.op.type in (PLUS, MINUS):
+				terms.append((1 if expr.op.type == PLUS else -1, expr.right))
+				expr = expr.left
+			if not (isinstance(expr, Var) and expr.value == target):
+				return None
+			terms.reverse()
+		for _, term in terms:
+			if degree(term, name) not in (0, 1):
+				return None
+		return PLUS, terms
+
+class LoopInterpreter(Interpreter):
+	'''
+	用LoopCompiler执行循环的解释器，编译结果按循环节点缓存
+	同一个解释器不能在多个线程中同时使用
+	'''
+	def __init__(self, parser, scope=None):
+		super().__init__(parser, scope)
+		self.compiled = WeakKeyDictionary()
+
+	def run_loop(self, node):
+		code = self.compiled.get(node)
+		if code is None:
+			code = self.compiled[node] = LoopCompiler().visit(node)
+		code(self.GLOBAL_SCOPE)
+
+	visit_While = run_loop
+	visit_For = run_loop
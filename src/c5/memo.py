@@ -0,0 +1,249 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+求值结果缓存
+
+MemoInterpreter用(语法树指纹, 树读取的变量的当前值)作为键缓存求值结果:
+表达式缓存其值，语句缓存执行后写入的变量。命中时直接返回结果并写回变量。
+键在每次求值时按GLOBAL_SCOPE的当前值计算，变量被修改后自然落到新的键上，
+不会取到过期的结果。出错的求值不缓存。
+
+	cache = MemoCache(maxsize=4096, ttl=60)
+	for text in requests:
+		MemoInterpreter(Parser(Lexer(text)), scope=scope, cache=cache).interpret()
+	print(cache.stats())
+'''
+
+import hashlib
+import time
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+
+from inter import NodeVisitor, Interpreter
+from serialize import dumps
+
+###############################################################################
+#                                                                             #
+#  ANALYSIS                                                                   #
+#                                                                             #
+###############################################################################
+
+class FreeVariables(NodeVisitor):
+	'''
+	按执行顺序收集树读取的外部变量(在树中被赋值之前读取的变量)和写入的变量
+	循环体可能一次也不执行，其中赋值的变量记入maybe
+	'''
+	def __init__(self):
+		self.reads = []
+		self.writes = []
+		self.maybe = []
+		self.read = set()
+		self.written = set()
+
+	def visit_BinOp(self, node):
+		self.visit(node.left)
+		self.visit(node.right)
+
+	def visit_UnaryOp(self, node):
+		self.visit(node.expr)
+
+	def visit_Num(self, node):
+		pass
+
+	def visit_Compound(self, node):
+		for child in node.children:
+			self.visit(child)
+
+	def visit_NoOp(self, node):
+		pass
+
+	def visit_Assign(self, node):
+		self.visit(node.right)
+		name = node.left.value
+		if name not in self.written:
+			self.written.add(name)
+			self.writes.append(name)
+
+	def visit_Var(self, node):
+		name = node.value
+		if name not in self.written and name not in self.read:
+			self.read.add(name)
+			self.reads.append(name)
+
+	def visit_While(self, node):
+		self.visit(node.cond)
+		self.loop(node.body)
+
+	def visit_For(self, node):
+		self.visit(node.start)
+		self.visit(node.end)
+		self.loop(node.body, node.var.value)
+
+	def loop(self, body, var=None):
+		written = set(self.written)
+		count = len(self.writes)
+		if var is not None and var not in self.written:
+			self.written.add(var)
+			self.writes.append(var)
+		self.visit(body)
+		for name in self.writes[count:]:
+			if name not in self.maybe:
+				self.maybe.append(name)
+		del self.writes[count:]
+		self.written = written
+
+class TreeInfo(object):
+	'''
+	语法树的指纹、外部变量、写入的变量和可能写入的变量
+	'''
+	def __init__(self, tree):
+		collector = FreeVariables()
+		collector.visit(tree)
+		self.fingerprint = hashlib.blake2b(dumps(tree), digest_size=16).digest()
+		self.reads = tuple(collector.reads)
+		self.writes = tuple(collector.writes)
+		self.maybe = tuple(name for name in collector.maybe if name not in collector.written)
+		self.written = frozenset(self.writes + self.maybe)
+
+def input_key(value):
+	'''
+	变量值在键中的表示
+	整数和浮点数分开，浮点数按十六进制表示区分0.0和-0.0
+	'''
+	if type(value) is float:
+		return value.hex()
+	return value
+
+
+###############################################################################
+#                                                                             #
+#  CACHE                                                                      #
+#                                                                             #
+###############################################################################
+
+class MemoCache(object):
+	'''
+	有界的LRU缓存，可选TTL
+	maxsize: 最多缓存的结果数
+	ttl: 结果的有效期(秒)，None表示不过期
+	'''
+	def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+		self.maxsize = maxsize
+		self.ttl = ttl
+		self.clock = clock
+		self.entries = OrderedDict()	#键 -> (过期时间, 结果)
+		self.trees = WeakKeyDictionary()	#语法树 -> TreeInfo
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.expirations = 0
+		self.uncacheable = 0
+
+	def info(self, tree):
+		info = self.trees.get(tree)
+		if info is None:
+			info = self.trees[tree] = TreeInfo(tree)
+		return info
+
+	def get(self, key):
+		'''
+		返回缓存的结果，没有或已过期时返回None
+		'''
+		entry = self.entries.get(key)
+		if entry is None:
+			self.misses += 1
+			return None
+		expires, result = entry
+		if expires is not None and self.clock() >= expires:
+			del self.entries[key]
+			self.expirations += 1
+			self.misses += 1
+			return None
+		self.entries.move_to_end(key)
+		self.hits += 1
+		return result
+
+	def put(self, key, result):
+		expires = None if self.ttl is None else self.clock() + self.ttl
+		self.entries[key] = (expires, result)
+		self.entries.move_to_end(key)
+		if len(self.entries) > self.maxsize:
+			self.entries.popitem(last=False)
+			self.evictions += 1
+
+	def clear(self):
+		self.entries.clear()
+
+	def stats(self):
+		lookups = self.hits + self.misses
+		return {
+			'size': len(self.entries),
+			'maxsize': self.maxsize,
+			'hits': self.hits,
+			'misses': self.misses,
+			'hit_rate': self.hits / lookups if lookups else 0.0,
+			'evictions': self.evictions,
+			'expirations': self.expirations,
+			'uncacheable': self.uncacheable,
+		}
+
+class MemoInterpreter(Interpreter):
+	'''
+	带结果缓存的解释器，多个解释器可以共享同一个MemoCache
+	'''
+	def __init__(self, parser, scope=None, cache=None):
+		super().__init__(parser, scope)
+		self.cache = MemoCache() if cache is None else cache
+
+	def evaluate(self, tree):
+		'''
+		求值语法树，结果与visit(tree)相同
+		未命中时在只含键中变量的作用域上执行，其余写入的变量按执行时第一次赋值的
+		顺序插入；这一顺序只取决于键，命中时按同样的顺序写回，
+		所以作用域中新变量的顺序也与visit(tree)相同
+		'''
+		info = self.cache.info(tree)
+		scope = self.GLOBAL_SCOPE
+		inputs = []
+		local = {}
+		for name in info.reads:
+			value = scope.get(name)
+			if value is None:
+				#未定义的变量会在求值时抛出NameError
+				self.cache.uncacheable += 1
+				return self.visit(tree)
+			local[name] = value
+			inputs.append(input_key(value))
+		for name in info.maybe:
+			value = scope.get(name)
+			if value is not None:
+				local[name] = value
+			inputs.append(input_key(value))
+		key = (info.fingerprint, tuple(inputs))
+
+		cached = self.cache.get(key)
+		if cached is not None:
+			value, writes = cached
+			scope.update(writes)
+			return value
+
+		self.GLOBAL_SCOPE = local
+		try:
+			value = self.visit(tree)
+		finally:
+			#出错时已生效的赋值同样写回
+			self.GLOBAL_SCOPE = scope
+			writes = tuple(item for item in local.items() if item[0] in info.written)
+			scope.update(writes)
+		self.cache.put(key, (value, writes))
+		return value
+
+	def interpret(self):
+		'''
+		解释语法树
+		'''
+		tree = self.parser.parse()
+		if tree is None:
+			return ''
+		return self.evaluate(tree)
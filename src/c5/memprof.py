@@ -0,0 +1,193 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+按阶段的内存剖析
+
+用tracemalloc依次剖析三个阶段，每个阶段前后各取一次快照:
+
+	lex     词法分析，得到全部令牌
+	parse   语法分析，得到语法树(节点、Compound.children列表、令牌)
+	eval    解释执行，GLOBAL_SCOPE的增长和大整数临时对象
+
+每个阶段报告峰值字节(阶段内tracemalloc的峰值减去阶段开始时的占用)、
+阶段结束后仍被持有的字节以及分配最多的代码行；阶段的产物按类型统计对象
+个数和字节(sys.getsizeof，含实例__dict__)。最后给出每个源字符对应的字节数。
+
+	python inter.py -m program.pas
+'''
+
+import sys
+import tracemalloc
+
+from inter import EOF, Lexer, Parser, Interpreter, AST, Compound, Token, read_source
+
+class Phase(object):
+	'''
+	一个阶段的剖析结果
+	'''
+	def __init__(self, name):
+		self.name = name
+		self.peak = 0			#阶段内的峰值字节
+		self.retained = 0		#阶段结束后仍持有的字节
+		self.sites = []			#(代码位置, 字节)，分配最多的代码行
+		self.types = {}			#类型 -> [个数, 字节]
+
+	def count(self, kind, size):
+		entry = self.types.get(kind)
+		if entry is None:
+			entry = self.types[kind] = [0, 0]
+		entry[0] += 1
+		entry[1] += size
+
+class Profiler(object):
+	'''
+	tracemalloc阶段剖析器
+	top: 每个阶段列出的分配代码行数
+	'''
+	def __init__(self, top=5):
+		self.top = top
+		self.phases = []
+		self.chars = 0			#源程序字符数
+
+	def run(self, name, func):
+		'''
+		执行func并剖析为一个阶段，返回(func的结果, Phase)
+		'''
+		phase = Phase(name)
+		before = tracemalloc.take_snapshot()
+		start, _ = tracemalloc.get_traced_memory()
+		tracemalloc.reset_peak()
+		result = func()
+		current, peak = tracemalloc.get_traced_memory()
+		after = tracemalloc.take_snapshot()
+
+		phase.peak = peak - start
+		phase.retained = current - start
+		ignore = tracemalloc.Filter(False, tracemalloc.__file__)
+		diff = after.filter_traces([ignore]).compare_to(before.filter_traces([ignore]), 'lineno')
+		for stat in diff[:self.top]:
+			if stat.size_diff <= 0:
+				break
+			frame = stat.traceback[0]
+			phase.sites.append(('{}:{}'.format(frame.filename, frame.lineno), stat.size_diff))
+		self.phases.append(phase)
+		return result, phase
+
+def sizeof(obj):
+	'''
+	对象自身的字节数，包括实例的__dict__
+	'''
+	size = sys.getsizeof(obj)
+	attrs = getattr(obj, '__dict__', None)
+	if attrs is not None:
+		size += sys.getsizeof(attrs)
+	return size
+
+def count_tokens(phase, tokens):
+	for token in tokens:
+		phase.count('Token[{}]'.format(token.type), sizeof(token))
+		if isinstance(token.value, int):
+			phase.count('int literals', sys.getsizeof(token.value))
+
+def count_tree(phase, tree):
+	'''
+	按节点类型统计语法树，令牌等共享对象只统计一次
+	'''
+	seen = set()
+	stack = [tree]
+	while stack:
+		node = stack.pop()
+		if id(node) in seen:
+			continue
+		seen.add(id(node))
+		if isinstance(node, Token):
+			phase.count('Token', sizeof(node))
+			continue
+		phase.count(type(node).__name__, sizeof(node))
+		if type(node.__dict__.get('value')) is int:
+			phase.count('int literals', sys.getsizeof(node.value))
+		if isinstance(node, Compound):
+			phase.count('Compound.children', sys.getsizeof(node.children))
+			stack.extend(node.children)
+			continue
+		for value in vars(node).values():
+			if isinstance(value, (AST, Token)):
+				stack.append(value)
+
+def count_scope(phase, scope):
+	phase.count('GLOBAL_SCOPE', sys.getsizeof(scope))
+	for value in scope.values():
+		if type(value) is int and value.bit_length() > 64:
+			phase.count('big ints', sys.getsizeof(value))
+		else:
+			phase.count(type(value).__name__ + ' values', sys.getsizeof(value))
+
+def tokenize(text):
+	lexer = Lexer(text)
+	tokens = []
+	token = lexer.get_next_token()
+	while token.type != EOF:
+		tokens.append(token)
+		token = lexer.get_next_token()
+	return tokens
+
+def profile(text, top=5):
+	'''
+	剖析一个程序，返回Profiler
+	'''
+	started = tracemalloc.is_tracing()
+	if not started:
+		tracemalloc.start()
+	try:
+		profiler = Profiler(top)
+		profiler.chars = len(text)
+		tokens, phase = profiler.run('lex', lambda: tokenize(text))
+		count_tokens(phase, tokens)
+		del tokens
+
+		tree, phase = profiler.run('parse', lambda: Parser(Lexer(text)).parse())
+		count_tree(phase, tree)
+
+		interpreter = Interpreter(None, scope={})
+		_, phase = profiler.run('eval', lambda: interpreter.visit(tree))
+		count_scope(phase, interpreter.GLOBAL_SCOPE)
+	finally:
+		if not started:
+			tracemalloc.stop()
+	return profiler
+
+def report(profiler, out=None):
+	'''
+	打印剖析报告
+	'''
+	out = out or sys.stdout
+	chars = max(profiler.chars, 1)
+	out.write('{:<8} {:>14} {:>14} {:>10} {:>10}\n'.format(
+		'phase', 'peak bytes', 'retained', 'peak/char', 'kept/char'
+	))
+	for phase in profiler.phases:
+		out.write('{:<8} {:>14,} {:>14,} {:>10.1f} {:>10.1f}\n'.format(
+			phase.name, phase.peak, phase.retained, phase.peak / chars, phase.retained / chars
+		))
+	out.write('source: {:,} chars\n'.format(profiler.chars))
+
+	for phase in profiler.phases:
+		out.write('\n[{}]\n'.format(phase.name))
+		if phase.name == 'eval':
+			out.write('  {:<24} {:>14,} bytes\n'.format(
+				'temporaries', phase.peak - phase.retained
+			))
+		types = sorted(phase.types.items(), key=lambda item: -item[1][1])
+		for kind, (count, size) in types:
+			out.write('  {:<24} {:>14,} bytes {:>10,} objects\n'.format(kind, size, count))
+		for site, size in phase.sites:
+			out.write('  {:<24} {:>14,} bytes  {}\n'.format('allocated at', size, site))
+
+def run_memory(args):
+	'''
+	内存剖析模式
+	'''
+	with read_source(args) as source:
+		text = source.read()
+	report(profile(text))
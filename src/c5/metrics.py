@@ -0,0 +1,426 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+运行指标
+
+对数分桶直方图(HDR风格): 每个2的幂区间再等分为2**precision个子桶，
+桶的相对宽度不超过1/2**precision，记录只需几次整数运算和一次列表写入。
+每个线程写自己的分片，记录时不加锁，也不会让并发的求值互相等待；
+导出时合并所有分片。线程退出后它的分片保留，数据不会丢失。
+
+InterpreterMetrics按阶段记录lex/parse/eval耗时、程序字符数、单词数和
+语法树节点数；统计节点数要遍历整棵树，默认每8个程序抽样一次。
+缓存的命中率在导出时从cache.stats()读取，不增加求值开销。
+
+	metrics = InterpreterMetrics()
+	metrics.watch_cache('c5_memo', cache)
+	scope = metrics.evaluate(text)
+	print(metrics.registry.prometheus())      Prometheus文本格式
+	print(metrics.registry.to_json())         JSON快照
+'''
+
+import itertools
+import json
+import threading
+import time
+from time import perf_counter_ns
+
+from inter import EOF, AST, Compound, Lexer, Parser, Interpreter
+
+###############################################################################
+#                                                                             #
+#  BUCKETS                                                                    #
+#                                                                             #
+###############################################################################
+
+def bucket_index(value, precision):
+	'''
+	非负整数所在桶的编号
+	小于2**(precision+1)的值各占一个桶，之后每个2的幂区间分为2**precision个桶
+	'''
+	if value < 2 << precision:
+		return value
+	shift = value.bit_length() - precision - 1
+	return (shift << precision) + (value >> shift)
+
+def bucket_bounds(index, precision):
+	'''
+	桶的取值范围[low, high)
+	'''
+	if index < 2 << precision:
+		return index, index + 1
+	shift = (index >> precision) - 1
+	mantissa = index - (shift << precision)
+	return mantissa << shift, (mantissa + 1) << shift
+
+
+###############################################################################
+#                                                                             #
+#  METRICS                                                                    #
+#                                                                             #
+###############################################################################
+
+class Shard(object):
+	'''
+	直方图在一个线程中的分片
+	'''
+	def __init__(self):
+		self.counts = []		#桶编号 -> 次数
+		self.total = 0
+		self.min = None
+		self.max = 0
+
+class Histogram(object):
+	'''
+	按线程分片的对数分桶直方图，记录非负整数
+	scale: 导出时乘到取值上的单位，例如纳秒记录、秒导出时为1e-9
+	'''
+	kind = 'histogram'
+
+	def __init__(self, name, help='', scale=1, precision=3):
+		self.name = name
+		self.help = help
+		self.scale = scale
+		self.precision = precision
+		self.limit = 2 << precision
+		self.local = threading.local()
+		self.shards = []
+		self.lock = threading.Lock()	#只在登记新分片时使用
+
+	def shard(self):
+		shard = self.local.shard = Shard()
+		with self.lock:
+			self.shards.append(shard)
+		return shard
+
+	def record(self, value):
+		try:
+			shard = self.local.shard
+		except AttributeError:
+			shard = self.shard()
+		value = int(value)
+		if value < 0:
+			value = 0
+		if value < self.limit:
+			index = value
+		else:
+			shift = value.bit_length() - self.precision - 1
+			index = (shift << self.precision) + (value >> shift)
+		counts = shard.counts
+		if index >= len(counts):
+			counts.extend([0] * (index + 1 - len(counts)))
+		counts[index] += 1
+		shard.total += value
+		if value > shard.max:
+			shard.max = value
+		if shard.min is None or value < shard.min:
+			shard.min = value
+
+	def merged(self):
+		'''
+		合并所有分片，返回(各桶次数, 总和, 最小值, 最大值)
+		'''
+		with self.lock:
+			shards = list(self.shards)
+		counts = []
+		total = 0
+		low = None
+		high = 0
+		for shard in shards:
+			#list()在持有GIL时一次复制完，不会与记录线程交错
+			for index, count in enumerate(list(shard.counts)):
+				if index >= len(counts):
+					counts.append(0)
+				counts[index] += count
+			total += shard.total
+			high = max(high, shard.max)
+			if shard.min is not None and (low is None or shard.min < low):
+				low = shard.min
+		return counts, total, low, high
+
+	def quantile(self, q, merged=None):
+		'''
+		q分位数的估计值(所在桶的上界，不超过最大值)，按导出单位
+		'''
+		counts, _, _, high = merged or self.merged()
+		count = sum(counts)
+		if not count:
+			return 0.0
+		rank = q * count
+		seen = 0
+		for index, n in enumerate(counts):
+			seen += n
+			if n and seen >= rank:
+				return min(bucket_bounds(index, self.precision)[1] - 1, high) * self.scale
+		return high * self.scale
+
+	def samples(self):
+		'''
+		Prometheus样本: 只输出非空的桶，上界是累计的
+		'''
+		merged = self.merged()
+		counts, total, _, _ = merged
+		cumulative = 0
+		lines = []
+		for index, count in enumerate(counts):
+			if count:
+				cumulative += count
+				high = bucket_bounds(index, self.precision)[1] - 1
+				lines.append(('_bucket', '{{le="{}"}}'.format(format_value(high * self.scale)), cumulative))
+		lines.append(('_bucket', '{le="+Inf"}', cumulative))
+		lines.append(('_sum', '', total * self.scale))
+		lines.append(('_count', '', cumulative))
+		return lines
+
+	def snapshot(self):
+		merged = self.merged()
+		counts, total, low, high = merged
+		count = sum(counts)
+		scale = self.scale
+		return {
+			'type': self.kind,
+			'count': count,
+			'sum': total * scale,
+			'min': (low or 0) * scale,
+			'max': high * scale,
+			'mean': total * scale / count if count else 0.0,
+			'p50': self.quantile(0.5, merged),
+			'p90': self.quantile(0.9, merged),
+			'p99': self.quantile(0.99, merged),
+			'p999': self.quantile(0.999, merged),
+			'buckets': [
+				[(bucket_bounds(index, self.precision)[1] - 1) * scale, n]
+				for index, n in enumerate(counts) if n
+			],
+		}
+
+class Counter(object):
+	'''
+	按线程分片的计数器
+	'''
+	kind = 'counter'
+
+	def __init__(self, name, help=''):
+		self.name = name
+		self.help = help
+		self.local = threading.local()
+		self.cells = []
+		self.lock = threading.Lock()
+
+	def add(self, amount=1):
+		try:
+			cell = self.local.cell
+		except AttributeError:
+			cell = self.local.cell = [0]
+			with self.lock:
+				self.cells.append(cell)
+		cell[0] += amount
+
+	def value(self):
+		with self.lock:
+			cells = list(self.cells)
+		return sum(cell[0] for cell in cells)
+
+	def samples(self):
+		return [('', '', self.value())]
+
+	def snapshot(self):
+		return {'type': self.kind, 'value': self.value()}
+
+class Gauge(object):
+	'''
+	导出时调用func取值的指标，kind为counter时表示func返回累计值
+	'''
+	def __init__(self, name, help, func, kind='gauge'):
+		self.name = name
+		self.help = help
+		self.func = func
+		self.kind = kind
+
+	def samples(self):
+		return [('', '', self.func())]
+
+	def snapshot(self):
+		return {'type': self.kind, 'value': self.func()}
+
+def format_value(value):
+	if isinstance(value, float):
+		return '{:.10g}'.format(value)
+	return str(value)
+
+class Registry(object):
+	'''
+	指标表，按登记顺序导出
+	'''
+	def __init__(self):
+		self.metrics = {}
+		self.lock = threading.Lock()
+
+	def register(self, metric):
+		with self.lock:
+			if metric.name in self.metrics:
+				raise ValueError('Duplicate metric {!r}'.format(metric.name))
+			self.metrics[metric.name] = metric
+		return metric
+
+	def histogram(self, name, help='', scale=1, precision=3):
+		return self.register(Histogram(name, help, scale, precision))
+
+	def counter(self, name, help=''):
+		return self.register(Counter(name, help))
+
+	def gauge(self, name, help, func, kind='gauge'):
+		return self.register(Gauge(name, help, func, kind))
+
+	def prometheus(self):
+		'''
+		Prometheus文本格式
+		'''
+		lines = []
+		for metric in list(self.metrics.values()):
+			if metric.help:
+				lines.append('# HELP {} {}'.format(metric.name, metric.help))
+			lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+			for suffix, labels, value in metric.samples():
+				lines.append('{}{}{} {}'.format(metric.name, suffix, labels, format_value(value)))
+		return '\n'.join(lines) + '\n'
+
+	def snapshot(self):
+		'''
+		JSON快照
+		'''
+		return {
+			'timestamp': time.time(),
+			'metrics': {name: metric.snapshot() for name, metric in list(self.metrics.items())},
+		}
+
+	def to_json(self, **kwargs):
+		return json.dumps(self.snapshot(), **kwargs)
+
+
+###############################################################################
+#                                                                             #
+#  INTERPRETER                                                                #
+#                                                                             #
+###############################################################################
+
+class Replay(object):
+	'''
+	按顺序重放已经得到的单词，词法错误在重放到出错位置时才抛出
+	行列定位交给原来的词法分析器
+	'''
+	def __init__(self, lexer, tokens, error=None):
+		self.lexer = lexer
+		self.tokens = iter(tokens)
+		self.error = error
+
+	def get_next_token(self):
+		token = next(self.tokens, None)
+		if token is None:
+			raise self.error
+		return token
+
+	def locate(self, pos):
+		return self.lexer.locate(pos)
+
+def tokenize(lexer):
+	'''
+	取出全部单词，返回(单词列表, 遇到的LexerError或None)
+	'''
+	tokens = []
+	next_token = lexer.get_next_token
+	try:
+		token = next_token()
+		tokens.append(token)
+		while token.type != EOF:
+			token = next_token()
+			tokens.append(token)
+	except Exception as e:
+		return tokens, e
+	return tokens, None
+
+CHILDREN = {}		#节点类型 -> 保存子节点的属性名
+
+def count_nodes(tree):
+	'''
+	语法树的节点数
+	'''
+	count = 0
+	stack = [tree]
+	pop = stack.pop
+	push = stack.append
+	while stack:
+		node = pop()
+		count += 1
+		if isinstance(node, Compound):
+			stack.extend(node.children)
+			continue
+		names = CHILDREN.get(node.__class__)
+		if names is None:
+			names = CHILDREN[node.__class__] = tuple(
+				name for name, value in vars(node).items() if isinstance(value, AST)
+			)
+		for name in names:
+			push(getattr(node, name))
+	return count
+
+class InterpreterMetrics(object):
+	'''
+	解释器的指标，同一个对象可以在多个线程中同时使用
+	node_sample: 每node_sample个程序统计一次语法树节点数
+	'''
+	def __init__(self, registry=None, prefix='c5', node_sample=8):
+		self.registry = Registry() if registry is None else registry
+		self.prefix = prefix
+		self.node_sample = node_sample
+		self.sequence = itertools.count()	#next()在CPython中是原子的
+		histogram = self.registry.histogram
+		counter = self.registry.counter
+		self.lex_seconds = histogram(prefix + '_lex_seconds', 'Lexing time', scale=1e-9)
+		self.parse_seconds = histogram(prefix + '_parse_seconds', 'Parsing time', scale=1e-9)
+		self.eval_seconds = histogram(prefix + '_eval_seconds', 'Evaluation time', scale=1e-9)
+		self.program_chars = histogram(prefix + '_program_chars', 'Program size in characters')
+		self.program_tokens = histogram(prefix + '_program_tokens', 'Tokens per program')
+		self.program_nodes = histogram(prefix + '_program_nodes', 'AST nodes per program')
+		self.programs = counter(prefix + '_programs_total', 'Programs evaluated')
+		self.errors = counter(prefix + '_errors_total', 'Programs that raised an error')
+
+	def watch_cache(self, name, cache):
+		'''
+		导出cache.stats()中的命中、未命中次数和命中率
+		'''
+		self.registry.gauge(name + '_hits_total', 'Cache hits', lambda: cache.stats()['hits'], 'counter')
+		self.registry.gauge(name + '_misses_total', 'Cache misses', lambda: cache.stats()['misses'], 'counter')
+		self.registry.gauge(name + '_hit_ratio', 'Cache hit ratio', lambda: cache.stats()['hit_rate'])
+
+	def evaluate(self, text, scope=None, interpreter_class=Interpreter):
+		'''
+		分阶段解析并执行程序，记录各阶段的指标，返回GLOBAL_SCOPE
+		结果和抛出的异常都与Interpreter(Parser(Lexer(text))).interpret()相同
+		'''
+		self.programs.add()
+		try:
+			start = perf_counter_ns()
+			lexer = Lexer(text)
+			tokens, error = tokenize(lexer)
+			lexed = perf_counter_ns()
+			self.lex_seconds.record(lexed - start)
+			self.program_chars.record(len(text))
+			self.program_tokens.record(len(tokens))
+
+			tree = Parser(Replay(lexer, tokens, error)).parse()
+			parsed = perf_counter_ns()
+			self.parse_seconds.record(parsed - lexed)
+			if next(self.sequence) % self.node_sample == 0:
+				self.program_nodes.record(count_nodes(tree))
+
+			interpreter = interpreter_class(None, scope={} if scope is None else scope)
+			try:
+				interpreter.visit(tree)
+			finally:
+				self.eval_seconds.record(perf_counter_ns() - parsed)
+			return interpreter.GLOBAL_SCOPE
+		except Exception:
+			self.errors.add()
+			raise
@@ -0,0 +1,489 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+顶层语句的并行执行
+
+分析复合语句中各顶层语句读写的变量，建立依赖图(DAG)，
+按层次把互不依赖的语句分组并发执行:
+估算为大整数密集计算的语句交给进程池，其余交给线程池。
+结果与顺序执行visit_Compound完全相同；第一条可能出错的语句之后的循环
+不与其他语句并发执行，以免出错后等待一个不终止的循环。
+进程池和线程池在第一次需要时才导入和创建。
+
+ChunkedParser在顶层分号处切分大程序，在进程池中并行解析各段后按顺序拼接。
+'''
+
+import os
+import re
+
+from inter import (
+	PLUS, MINUS, MUL, DIV, EOF,
+	Lexer, Parser, Num, Assign, Compound, NodeVisitor, Interpreter
+)
+from analysis import VariableUsage, usage
+
+###############################################################################
+#                                                                             #
+#  ANALYSIS                                                                   #
+#                                                                             #
+###############################################################################
+
+class DependencyGraph(object):
+	'''
+	顶层语句的读写依赖图
+	语句j依赖于在它之前的语句i，当且仅当二者存在写后读、读后写或写后写冲突
+	'''
+	def __init__(self, statements):
+		self.statements = statements
+		self.reads = []
+		self.writes = []
+		self.preds = []		#每条语句直接依赖的语句下标
+
+		last_write = {}		#变量 -> 最后写入它的语句
+		readers = {}		#变量 -> 最后一次写入之后读取它的语句
+		for j, statement in enumerate(statements):
+			reads, writes = usage(statement)
+			preds = set()
+			for name in reads:
+				if name in last_write:
+					preds.add(last_write[name])
+			for name in writes:
+				if name in last_write:
+					preds.add(last_write[name])
+				preds.update(readers.get(name, ()))
+			for name in reads:
+				readers.setdefault(name, []).append(j)
+			for name in writes:
+				last_write[name] = j
+				readers[name] = []
+			preds.discard(j)
+			self.reads.append(reads)
+			self.writes.append(writes)
+			self.preds.append(sorted(preds))
+
+	def levels(self, skip=()):
+		'''
+		按拓扑层次分组，同一层的语句互不依赖，可以并发执行
+		skip中的语句不参与分组，其中语句的后继也必须在skip中
+		'''
+		depth = {}
+		groups = []
+		for j, preds in enumerate(self.preds):
+			if j in skip:
+				continue
+			level = max((depth[i] + 1 for i in preds), default=0)
+			depth[j] = level
+			if level == len(groups):
+				groups.append([])
+			groups[level].append(j)
+		return groups
+
+class Hazards(NodeVisitor):
+	'''
+	判断语句是否含循环、执行时是否可能出错
+	ints: 确定为整数的变量，不含除法、只读取这些变量的表达式不会出错
+	'''
+	def __init__(self, ints):
+		self.ints = ints
+		self.loops = False
+		self.raises = False
+
+	def visit_BinOp(self, node):
+		if node.op.type == DIV:
+			self.raises = True
+		self.visit(node.left)
+		self.visit(node.right)
+
+	def visit_UnaryOp(self, node):
+		self.visit(node.expr)
+
+	def visit_Num(self, node):
+		pass
+
+	def visit_Compound(self, node):
+		for child in node.children:
+			self.visit(child)
+
+	def visit_NoOp(self, node):
+		pass
+
+	def visit_Assign(self, node):
+		self.visit(node.right)
+
+	def visit_Var(self, node):
+		if node.value not in self.ints:
+			self.raises = True
+
+	def visit_While(self, node):
+		self.loops = True
+		self.visit(node.cond)
+		self.visit(node.body)
+
+	def visit_For(self, node):
+		self.loops = True
+		self.visit(node.start)
+		self.visit(node.end)
+		ints = self.ints
+		if node.var.value not in usage(node.body)[1]:
+			self.ints = ints | {node.var.value}
+		self.visit(node.body)
+		self.ints = ints
+
+def hazards(statements, scope):
+	'''
+	返回各顶层语句的(是否含循环, 是否可能出错)
+	按顺序跟踪确定为整数的变量: 作用域中的整数，以及之前不会出错的赋值语句写入的变量
+	'''
+	ints = {name for name, value in scope.items() if type(value) is int}
+	result = []
+	for statement in statements:
+		writes = usage(statement)[1]
+		#赋值语句先求值再写入，其他语句中的变量可能在读取前被改写为非整数
+		checker = Hazards(ints if isinstance(statement, Assign) else ints - writes)
+		checker.visit(statement)
+		result.append((checker.loops, checker.raises))
+		ints = ints - writes
+		if isinstance(statement, Assign) and not checker.raises:
+			ints.add(statement.left.value)
+	return result
+
+def analyze(compound):
+	'''
+	建立复合语句顶层语句的依赖图
+	'''
+	return DependencyGraph(compound.children)
+
+
+###############################################################################
+#                                                                             #
+#  COST ESTIMATION                                                            #
+#                                                                             #
+###############################################################################
+
+class CostEstimator(NodeVisitor):
+	'''
+	根据当前变量取值估算语句的计算量
+	visit返回结果的位数，累计的乘除法代价保存在cost中
+	'''
+	def __init__(self, scope):
+		self.scope = dict(scope)
+		self.cost = 0
+
+	def visit_BinOp(self, node):
+		left = self.visit(node.left)
+		right = self.visit(node.right)
+		if node.op.type in (PLUS, MINUS):
+			return max(left, right) + 1
+		elif node.op.type == MUL:
+			self.cost += left * right
+			return left + right
+		elif node.op.type == DIV:
+			self.cost += left * right
+			return 64
+
+	def visit_UnaryOp(self, node):
+		return self.visit(node.expr)
+
+	def visit_Num(self, node):
+		return bit_length(node.value)
+
+	def visit_Compound(self, node):
+		for child in node.children:
+			self.visit(child)
+		return 0
+
+	def visit_NoOp(self, node):
+		return 0
+
+	def visit_Assign(self, node):
+		bits = self.visit(node.right)
+		self.scope[node.left.value] = 1 << min(bits, 1 << 20)
+		return bits
+
+	def visit_Var(self, node):
+		return bit_length(self.scope.get(node.value, 0))
+
+	def visit_While(self, node):
+		self.visit(node.cond)
+		self.loop(node.body, LOOP_ITERATIONS)
+		return 0
+
+	def visit_For(self, node):
+		if isinstance(node.start, Num) and isinstance(node.end, Num):
+			iterations = max(node.end.value - node.start.value + 1, 0)
+		else:
+			self.visit(node.start)
+			self.visit(node.end)
+			iterations = LOOP_ITERATIONS
+		self.scope[node.var.value] = 1 << 31
+		self.loop(node.body, iterations)
+		return 0
+
+	def loop(self, body, iterations):
+		'''
+		循环体的代价按一次迭代估算后乘以迭代次数
+		'''
+		cost = self.cost
+		self.visit(body)
+		self.cost = cost + (self.cost - cost) * iterations
+
+LOOP_ITERATIONS = 1 << 10	#迭代次数未知时的估计值
+
+def bit_length(value):
+	if isinstance(value, int):
+		return max(value.bit_length(), 1)
+	return 64
+
+def estimate_cost(node, scope):
+	'''
+	估算语句在给定变量取值下的乘除法代价(位数乘积之和)
+	'''
+	estimator = CostEstimator(scope)
+	estimator.visit(node)
+	return estimator.cost
+
+
+###############################################################################
+#                                                                             #
+#  SCHEDULER                                                                  #
+#                                                                             #
+###############################################################################
+
+def execute(node, scope, writes):
+	'''
+	在独立的变量作用域中执行一条语句，返回它写入的变量
+	按作用域中的顺序返回，新变量的顺序与第一次赋值的顺序相同
+	'''
+	interpreter = Interpreter(None)
+	interpreter.GLOBAL_SCOPE = scope
+	interpreter.visit(node)
+	return {name: value for name, value in scope.items() if name in writes}
+
+class ParallelScheduler(object):
+	'''
+	并行调度器
+	heavy_cost: 估算代价超过该值的语句交给进程池
+	'''
+	def __init__(self, max_workers=None, heavy_cost=1 << 24):
+		self.max_workers = max_workers
+		self.heavy_cost = heavy_cost
+		self._processes = None
+		self._threads = None
+
+	def processes(self):
+		if self._processes is None:
+			from concurrent.futures import ProcessPoolExecutor
+			self._processes = ProcessPoolExecutor(self.max_workers)
+		return self._processes
+
+	def threads(self):
+		if self._threads is None:
+			from concurrent.futures import ThreadPoolExecutor
+			self._threads = ThreadPoolExecutor(self.max_workers)
+		return self._threads
+
+	def close(self):
+		for pool in (self._processes, self._threads):
+			if pool is not None:
+				pool.shutdown()
+		self._processes = self._threads = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def run(self, compound, scope):
+		'''
+		并行执行复合语句的顶层语句，结果写回scope
+		执行出错时丢弃并行结果，在原scope上顺序重新执行，
+		使得异常和已生效的赋值都与顺序执行一致；
+		各语句的写入按语句顺序合并到scope，变量的插入顺序也与顺序执行相同
+		'''
+		graph = analyze(compound)
+		deferred = self.deferred(graph, scope)
+		local = dict(scope)
+		results = {}		#语句下标 -> 写入的变量
+		try:
+			for group in graph.levels(deferred):
+				self.run_group(graph, group, local, results)
+			for i in sorted(deferred):
+				results[i] = execute(graph.statements[i], self.inputs(graph, i, local), graph.writes[i])
+				local.update(results[i])
+		except Exception:
+			interpreter = Interpreter(None)
+			interpreter.GLOBAL_SCOPE = scope
+			interpreter.visit(compound)
+			return
+		for i in range(len(graph.statements)):
+			scope.update(results[i])
+
+	def deferred(self, graph, scope):
+		'''
+		第一条可能出错的语句之后的循环语句，以及依赖它们的语句，在并发执行的
+		语句之后按顺序执行。顺序执行时出错的语句之后的循环不会执行，
+		与之并发执行的循环如果不终止，出错后会一直等待它
+		'''
+		deferred = set()
+		raises = False
+		for i, (loops, may_raise) in enumerate(hazards(graph.statements, scope)):
+			if (loops and raises) or any(j in deferred for j in graph.preds[i]):
+				deferred.add(i)
+			raises = raises or may_raise
+		return deferred
+
+	def run_group(self, graph, group, scope, results):
+		'''
+		并发执行同一层的语句，写入结果按语句下标记入results并合并到scope
+		'''
+		if len(group) == 1:
+			i = group[0]
+			results[i] = execute(graph.statements[i], self.inputs(graph, i, scope), graph.writes[i])
+			scope.update(results[i])
+			return
+
+		futures = []
+		for i in group:
+			statement = graph.statements[i]
+			inputs = self.inputs(graph, i, scope)
+			if estimate_cost(statement, inputs) > self.heavy_cost:
+				pool = self.processes()
+			else:
+				pool = self.threads()
+			futures.append(pool.submit(execute, statement, inputs, graph.writes[i]))
+		for i, future in zip(group, futures):
+			results[i] = future.result()
+			scope.update(results[i])
+
+	def inputs(self, graph, i, scope):
+		'''
+		语句执行所需的变量
+		'''
+		return {name: scope[name] for name in graph.reads[i] if name in scope}
+
+class ParallelInterpreter(Interpreter):
+	'''
+	并行解释器，顶层复合语句交给ParallelScheduler执行
+	'''
+	def __init__(self, parser, scheduler=None):
+		super().__init__(parser)
+		self.scheduler = scheduler or ParallelScheduler()
+
+	def interpret(self):
+		tree = self.parser.parse()
+		if tree is None:
+			return ''
+		self.scheduler.run(tree, self.GLOBAL_SCOPE)
+
+
+###############################################################################
+#                                                                             #
+#  CHUNKED PARSING                                                            #
+#                                                                             #
+###############################################################################
+
+SCAN = re.compile(r'(?<![^\W_])(BEGIN|END)(?![^\W_])|;')
+PROGRAM_END = re.compile(r'\s*\.\s*$')
+
+def split_statements(text):
+	'''
+	不经过词法分析，直接在字符序列上找出顶层语句的分隔位置
+	返回(语句列表的起止偏移, 顶层分号的偏移列表)，
+	不是BEGIN ... END.形式的程序时返回None
+	'''
+	depth = 0
+	start = None
+	separators = []
+	for match in SCAN.finditer(text):
+		word = match.group(1)
+		if word == 'BEGIN':
+			if start is None:
+				if text[:match.start()].strip():
+					return None
+				start = match.end()
+			depth += 1
+		elif word == 'END':
+			depth -= 1
+			if depth == 0:
+				if not PROGRAM_END.match(text, match.end()):
+					return None
+				return (start, match.start()), separators
+			if depth < 0:
+				return None
+		elif depth == 1:
+			separators.append(match.start())
+		elif depth == 0:
+			return None
+	return None
+
+def parse_chunk(text, offset):
+	'''
+	解析一段顶层语句(statement_list)，返回其二进制编码
+	'''
+	import serialize
+
+	lexer = Lexer(text)
+	lexer.offset = offset
+	parser = Parser(lexer)
+	root = Compound()
+	root.children = parser.statement_list()
+	if parser.current_token.type != EOF:
+		parser.error()
+	return serialize.dumps(root)
+
+class ChunkedParser(object):
+	'''
+	分段并行解析器
+	chunks: 切分的段数，默认为进程数的4倍
+	min_statements: 顶层语句少于该值时直接顺序解析
+	合法程序得到的语法树与Parser.parse相同(子进程返回的节点不带源码位置)，
+	任何一段出错时改为顺序解析，抛出的错误与Parser.parse相同
+	'''
+	def __init__(self, max_workers=None, chunks=None, min_statements=1000):
+		self.max_workers = max_workers
+		self.chunks = chunks
+		self.min_statements = min_statements
+		self._pool = None
+
+	def pool(self):
+		if self._pool is None:
+			from concurrent.futures import ProcessPoolExecutor
+			self._pool = ProcessPoolExecutor(self.max_workers)
+		return self._pool
+
+	def close(self):
+		if self._pool is not None:
+			self._pool.shutdown()
+			self._pool = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def parse(self, text):
+		split = split_statements(text)
+		if split is None or len(split[1]) + 1 < self.min_statements:
+			return Parser(Lexer(text)).parse()
+
+		import serialize
+
+		(start, end), separators = split
+		pool = self.pool()
+		chunks = self.chunks or 4 * (self.max_workers or os.cpu_count() or 1)
+		step = -(-(len(separators) + 1) // chunks)
+		bounds = [start] + [separators[i] + 1 for i in range(step - 1, len(separators), step)]
+		ends = [b - 1 for b in bounds[1:]] + [end]
+		futures = [
+			pool.submit(parse_chunk, text[a:b], a) for a, b in zip(bounds, ends)
+		]
+		try:
+			root = Compound()
+			for future in futures:
+				root.children.extend(serialize.loads(future.result()).children)
+		except Exception:
+			return Parser(Lexer(text)).parse()
+		return root
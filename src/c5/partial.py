@@ -0,0 +1,247 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+部分求值
+
+给定程序和一部分变量的已知值(如按租户固定的配置)，specialize生成剩余程序:
+只依赖已知值的表达式折叠为常量，已知变量的值沿语句传播，只依赖已知值的
+循环在特化时直接执行，条件为假的WHILE和范围为空的FOR整个删除。
+每个请求只需执行剩余程序，作用域中不必再放入已知变量:
+
+	residual = specialize(tree, {'rate': 3, 'limit': 100})
+	scope = {'amount': 42}
+	Interpreter(None, scope=scope).visit(residual)
+
+剩余程序在任意输入上的结果、异常以及出错时已生效的赋值，都与原程序在
+加入已知值的作用域上执行时相同(已知值优先):
+
+	已知变量的当前值在可能出错的剩余语句之前、进入剩余循环之前以及程序
+	结束时写回作用域，所以最终的作用域中仍有它们
+	已知的整数直接替换为字面量；浮点数没有字面量，运算得到的浮点常量写成
+	分子/分母(int的真除法正确舍入，结果与原值完全相同)，已知的浮点变量
+	写回作用域后照常读取；inf和nan无法表示，不折叠
+	求值出错的表达式不折叠，留到执行时在原来的位置抛出异常
+	剩余循环中赋值的变量在循环内外都视为未知，其余已知变量在循环体内继续传播
+	静态执行的循环最多执行budget条虚拟机指令，超出或出错时保留为剩余循环
+'''
+
+import math
+import operator
+
+from inter import (
+	PLUS, MINUS, MUL, DIV, INTEGER, ID, ASSIGN, Token,
+	BinOp, UnaryOp, Num, Var, Assign, Compound, While, For
+)
+from coop import compile_code, Execution
+from loops import statements
+from memo import FreeVariables
+from analysis import usage
+
+UNKNOWN = object()
+
+BINARY = {PLUS: operator.add, MINUS: operator.sub, MUL: operator.mul, DIV: operator.truediv}
+UNARY = {PLUS: operator.pos, MINUS: operator.neg}
+
+ASSIGN_TOKEN = Token(ASSIGN, ':=')
+DIV_TOKEN = Token(DIV, '/')
+MINUS_TOKEN = Token(MINUS, '-')
+
+def literal(value):
+	'''
+	值为value的常量表达式，无法表示时返回None
+	'''
+	if type(value) is int:
+		return Num(Token(INTEGER, value))
+	if type(value) is not float or not math.isfinite(value):
+		return None
+	numerator, denominator = value.as_integer_ratio()
+	node = BinOp(Num(Token(INTEGER, abs(numerator))), DIV_TOKEN, Num(Token(INTEGER, denominator)))
+	if math.copysign(1.0, value) < 0:
+		node = UnaryOp(MINUS_TOKEN, node)
+	return node
+
+def same(first, second):
+	'''
+	两个值类型相同且相等，区分0.0和-0.0
+	'''
+	if type(first) is not type(second) or first != second:
+		return False
+	return type(first) is not float or math.copysign(1.0, first) == math.copysign(1.0, second)
+
+class PartialEvaluator(object):
+	'''
+	对已知变量特化语法树
+	bindings: 变量名 -> 已知值(整数或有限的浮点数)
+	budget: 静态执行一个循环最多使用的虚拟机指令数
+	'''
+	def __init__(self, bindings, budget=100000):
+		self.budget = budget
+		self.env = {}		#当前已知的变量 -> 值
+		self.dirty = {}		#已知但还未写回作用域的变量(有序)
+		self.output = []	#当前语句序列的剩余语句
+		self.inline = False	#单独的表达式没有写回的机会，浮点变量也替换为常量
+		for name, value in bindings.items():
+			if value is None:
+				continue
+			if literal(value) is None:
+				raise ValueError('Unsupported value {!r} for {}'.format(value, name))
+			self.env[name] = value
+			self.dirty[name] = True
+
+	def constant(self, node, value):
+		if value is UNKNOWN:
+			return node, UNKNOWN
+		result = literal(value)
+		if result is None:
+			return node, UNKNOWN
+		return result, value
+
+	def expression(self, node):
+		'''
+		部分求值表达式，返回(剩余表达式, 值)，不是常量时值为UNKNOWN
+		'''
+		if isinstance(node, Num):
+			return node, node.value
+		if isinstance(node, Var):
+			value = self.env.get(node.value, UNKNOWN)
+			if type(value) is int or (value is not UNKNOWN and self.inline):
+				return literal(value), value
+			#浮点变量在剩余语句之前已写回作用域
+			return node, value
+		if isinstance(node, UnaryOp):
+			expr, value = self.expression(node.expr)
+			if value is not UNKNOWN:
+				value = UNARY[node.op.type](value)
+			return self.constant(UnaryOp(node.op, expr), value)
+
+		left, lvalue = self.expression(node.left)
+		right, rvalue = self.expression(node.right)
+		value = UNKNOWN
+		if lvalue is not UNKNOWN and rvalue is not UNKNOWN:
+			try:
+				value = BINARY[node.op.type](lvalue, rvalue)
+			except ArithmeticError:
+				#留到执行时抛出
+				pass
+		return self.constant(BinOp(left, node.op, right), value)
+
+	def flush(self):
+		'''
+		把未写回的已知变量写回作用域
+		'''
+		for name in self.dirty:
+			self.output.append(Assign(Var(Token(ID, name)), ASSIGN_TOKEN, literal(self.env[name])))
+		self.dirty.clear()
+
+	def residual(self, statement):
+		self.flush()
+		self.output.append(statement)
+
+	def block(self, node):
+		for statement in statements(node):
+			if isinstance(statement, Assign):
+				self.assign(statement)
+			else:
+				self.loop(statement)
+
+	def assign(self, statement):
+		name = statement.left.value
+		right, value = self.expression(statement.right)
+		if value is UNKNOWN:
+			self.residual(Assign(statement.left, statement.op, right))
+			self.env.pop(name, None)
+		elif name not in self.env or not same(self.env[name], value):
+			self.env[name] = value
+			self.dirty[name] = True
+
+	def run_static(self, node):
+		'''
+		循环只读取已知变量时直接执行，成功时更新已知变量并返回True
+		'''
+		collector = FreeVariables()
+		collector.visit(node)
+		if any(name not in self.env for name in collector.reads):
+			return False
+		scope = dict(self.env)
+		try:
+			if not Execution(compile_code(node), scope).run(self.budget):
+				return False
+		except Exception:
+			return False
+		changes = {
+			name: value for name, value in scope.items()
+			if name not in self.env or not same(self.env[name], value)
+		}
+		if any(literal(value) is None for value in changes.values()):
+			return False
+		self.env.update(changes)
+		self.dirty.update(dict.fromkeys(changes, True))
+		return True
+
+	def body(self, node):
+		'''
+		特化循环体，循环体结束时写回其中确定的已知变量
+		'''
+		saved = self.env, self.dirty, self.output
+		self.env = dict(self.env)
+		self.dirty = {}
+		self.output = []
+		try:
+			self.block(node)
+			self.flush()
+			body = Compound()
+			body.children = self.output
+		finally:
+			self.env, self.dirty, self.output = saved
+		return body
+
+	def loop(self, node):
+		if isinstance(node, While):
+			value = self.expression(node.cond)[1]
+			if value is not UNKNOWN and not value:
+				return
+		else:
+			start, first = self.expression(node.start)
+			end, last = self.expression(node.end)
+			if first is not UNKNOWN and last is not UNKNOWN:
+				try:
+					if not range(first, last + 1):
+						return
+				except TypeError:
+					#留到执行时抛出
+					pass
+		if self.run_static(node):
+			return
+
+		self.flush()
+		for name in usage(node)[1]:
+			self.env.pop(name, None)
+		if isinstance(node, While):
+			cond = self.expression(node.cond)[0]
+			self.output.append(While(node.token, cond, self.body(node.body)))
+		else:
+			self.output.append(For(node.token, node.var, start, end, self.body(node.body)))
+
+	def specialize(self, tree):
+		'''
+		返回剩余程序，语句(序列)的剩余程序总是复合语句
+		'''
+		if isinstance(tree, (Num, Var, UnaryOp, BinOp)):
+			self.inline = True
+			try:
+				return self.expression(tree)[0]
+			finally:
+				self.inline = False
+		self.block(tree)
+		self.flush()
+		root = Compound()
+		root.children = self.output
+		self.output = []
+		return root
+
+def specialize(tree, bindings, budget=100000):
+	'''
+	对已知变量bindings特化语法树，返回剩余程序
+	'''
+	return PartialEvaluator(bindings, budget).specialize(tree)
@@ -0,0 +1,625 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+语法分析器生成器
+
+读取inter模块开头的GRAMMAR说明(模块文档字符串)，生成LL(1)分析表，
+由非递归的表驱动分析器TableParser使用，产生与Parser相同的语法树。
+
+文法写法:
+
+	rule : item* ( | item* )*        大写名字为单词类型，小写名字为非终结符
+	item : NAME | ( alts ) | item*    括号分组，*表示重复零次或多次
+
+生成时做以下变换:
+
+	( A | B )            分组改写为辅助非终结符
+	( ... )*             重复改写为循环，循环项的值收集到一个列表中
+	A : a | a b A        尾递归改写为 A : a ( b a )*
+
+每条规则归约时把右部各符号的值按顺序作为参数调用ACTIONS中同名的动作，
+构造语法树节点；只有一个非终结符的产生式和没有动作的单符号规则直接传递
+该符号的值。A : B ( ... )* 形式的规则可以使用Fold动作，每执行一次循环体
+就把已有的值和循环项折叠为新的值，不必先收集列表再归约。
+文法改动后重新生成分析表即可，只有新的规则需要补充动作。
+
+分析普通Lexer的纯ASCII输入时，TableParser用一个正则表达式扫描器代替
+get_next_token，产生相同的单词和相同的LexerError。
+
+	python pgen.py        打印FIRST/FOLLOW集合和分析表
+'''
+
+import re
+
+from inter import (
+	INTEGER, PLUS, MINUS, MUL, DIV, LPAREN, RPAREN, ID, ASSIGN, SEMI, DOT, EOF,
+	RESERVED_KEYWORDS, Token, Lexer, BinOp, UnaryOp, Num, Compound, Assign, Var, NoOp,
+	While, For, LexerError, ParserError
+)
+
+class GrammarError(Exception):
+	'''
+	文法格式错误或不是LL(1)文法
+	'''
+	pass
+
+###############################################################################
+#                                                                             #
+#  GRAMMAR                                                                    #
+#                                                                             #
+###############################################################################
+
+class Repeat(object):
+	'''
+	产生式中的重复项，body为循环体的辅助非终结符
+	'''
+	def __init__(self, body):
+		self.body = body
+		self.follow = set()		#循环之后可能出现的单词
+
+	def __repr__(self):
+		return '{}*'.format(self.body)
+
+def is_terminal(symbol):
+	return isinstance(symbol, str) and symbol.isupper()
+
+class Grammar(object):
+	'''
+	改写后的文法: 非终结符 -> 产生式列表，产生式为符号列表
+	符号是单词类型(大写)、非终结符(小写)或Repeat
+	'''
+	def __init__(self, text):
+		self.rules = {}
+		self.helpers = set()	#改写时引入的辅助非终结符
+		self.start = None
+		for name, body in split_rules(text):
+			if self.start is None:
+				self.start = name
+			self.rules[name] = None
+			tokens = tokenize(body, name)
+			self.rules[name] = self.alternatives(name, tokens)
+			if tokens:
+				raise GrammarError('Unexpected {!r} in rule {!r}'.format(tokens[-1], name))
+		for name, productions in list(self.rules.items()):
+			self.rules[name] = self.tail_recursion(name, productions)
+		for productions in self.rules.values():
+			for production in productions:
+				for symbol in production:
+					if not is_terminal(symbol) and not isinstance(symbol, Repeat) and symbol not in self.rules:
+						raise GrammarError('Undefined rule {!r}'.format(symbol))
+
+	def helper(self, name, productions):
+		helper = '{}_{}'.format(name, len(self.helpers) + 1)
+		self.helpers.add(helper)
+		self.rules[helper] = productions
+		return helper
+
+	def alternatives(self, name, tokens):
+		'''
+		解析 alts : seq ('|' seq)*，tokens为倒序的单词列表
+		'''
+		productions = [self.sequence(name, tokens)]
+		while tokens and tokens[-1] == '|':
+			tokens.pop()
+			productions.append(self.sequence(name, tokens))
+		return productions
+
+	def sequence(self, name, tokens):
+		symbols = []
+		while tokens and tokens[-1] not in ('|', ')'):
+			token = tokens.pop()
+			if token == '(':
+				productions = self.alternatives(name, tokens)
+				if not tokens or tokens.pop() != ')':
+					raise GrammarError('Missing ) in rule {!r}'.format(name))
+				if len(productions) == 1 and len(productions[0]) == 1 and not (tokens and tokens[-1] == '*'):
+					symbol = productions[0][0]
+				else:
+					symbol = self.helper(name, productions)
+			elif token in ('*', ')'):
+				raise GrammarError('Unexpected {!r} in rule {!r}'.format(token, name))
+			else:
+				symbol = token
+			if tokens and tokens[-1] == '*':
+				tokens.pop()
+				if not (isinstance(symbol, str) and symbol in self.helpers):
+					symbol = self.helper(name, [[symbol]])
+				symbol = Repeat(symbol)
+			symbols.append(symbol)
+		return symbols
+
+	def tail_recursion(self, name, productions):
+		'''
+		A : a | a b A 改写为 A : a (b a)*
+		'''
+		if len(productions) != 2:
+			return productions
+		short, long = sorted(productions, key=len)
+		if short and long[:len(short)] == short and long[-1] == name and len(long) > len(short) + 1:
+			body = long[len(short):-1] + short
+			return [short + [Repeat(self.helper(name, [body]))]]
+		return productions
+
+def split_rules(text):
+	'''
+	把文法说明切分为(规则名, 右部文本)
+	'''
+	rules = []
+	for line in text.splitlines():
+		line = line.strip()
+		if not line:
+			continue
+		if line.startswith('|'):
+			if not rules:
+				raise GrammarError('Alternative without rule: {!r}'.format(line))
+			rules[-1][1] += ' ' + line
+			continue
+		name, colon, body = line.partition(':')
+		if not colon or not name.strip().isidentifier():
+			raise GrammarError('Bad rule: {!r}'.format(line))
+		rules.append([name.strip(), body])
+	return rules
+
+def tokenize(body, name):
+	tokens = re.findall(r'\w+|[()|*]|\S', body)
+	for token in tokens:
+		if not (token.isidentifier() or token in '()|*'):
+			raise GrammarError('Unexpected {!r} in rule {!r}'.format(token, name))
+	tokens.reverse()
+	return tokens
+
+
+###############################################################################
+#                                                                             #
+#  LL(1) TABLE                                                                #
+#                                                                             #
+###############################################################################
+
+class Analysis(object):
+	'''
+	FIRST/FOLLOW集合和LL(1)预测表
+	predict: 非终结符 -> {单词类型: 产生式}
+	'''
+	def __init__(self, grammar):
+		self.grammar = grammar
+		self.first = {name: set() for name in grammar.rules}
+		self.nullable = set()
+		self.follow = {name: set() for name in grammar.rules}
+		self.compute_first()
+		self.compute_follow()
+		self.predict = self.build()
+
+	def first_of(self, symbols):
+		'''
+		符号串的(FIRST集合, 是否可空)
+		'''
+		first = set()
+		for symbol in symbols:
+			if is_terminal(symbol):
+				first.add(symbol)
+				return first, False
+			if isinstance(symbol, Repeat):
+				first |= self.first[symbol.body]
+				continue
+			first |= self.first[symbol]
+			if symbol not in self.nullable:
+				return first, False
+		return first, True
+
+	def compute_first(self):
+		changed = True
+		while changed:
+			changed = False
+			for name, productions in self.grammar.rules.items():
+				for production in productions:
+					first, nullable = self.first_of(production)
+					if not first <= self.first[name]:
+						self.first[name] |= first
+						changed = True
+					if nullable and name not in self.nullable:
+						self.nullable.add(name)
+						changed = True
+
+	def compute_follow(self):
+		self.follow[self.grammar.start].add(EOF)
+		changed = True
+		while changed:
+			changed = False
+			for name, productions in self.grammar.rules.items():
+				for production in productions:
+					for i, symbol in enumerate(production):
+						if is_terminal(symbol):
+							continue
+						trailer, nullable = self.first_of(production[i + 1:])
+						if nullable:
+							trailer |= self.follow[name]
+						if isinstance(symbol, Repeat):
+							symbol.follow |= trailer
+							target = symbol.body
+							trailer = trailer | self.first[target]
+						else:
+							target = symbol
+						if not trailer <= self.follow[target]:
+							self.follow[target] |= trailer
+							changed = True
+
+	def build(self):
+		predict = {}
+		conflicts = []
+		for name, productions in self.grammar.rules.items():
+			row = predict[name] = {}
+			for production in productions:
+				first, nullable = self.first_of(production)
+				if nullable:
+					first |= self.follow[name]
+				for token_type in first:
+					if token_type in row and row[token_type] is not production:
+						conflicts.append('{} on {}'.format(name, token_type))
+					row[token_type] = production
+				for symbol in production:
+					if isinstance(symbol, Repeat):
+						if self.body_nullable(symbol) or self.first[symbol.body] & symbol.follow:
+							conflicts.append('{} in {}'.format(symbol, name))
+		if conflicts:
+			raise GrammarError('Not LL(1): ' + ', '.join(sorted(set(conflicts))))
+		return predict
+
+	def body_nullable(self, repeat):
+		return repeat.body in self.nullable
+
+
+###############################################################################
+#                                                                             #
+#  ACTIONS                                                                    #
+#                                                                             #
+###############################################################################
+
+class Fold(object):
+	'''
+	A : B ( C D ... )* 的左结合折叠动作
+	值从start(B的值)开始(没有start时就是B的值)，
+	每执行一次循环体 value = func(value, C的值, D的值, ...)
+	'''
+	def __init__(self, func, start=None):
+		self.func = func
+		self.start = start
+
+def group(*values):
+	'''
+	多个符号组成的分组的值
+	'''
+	return values
+
+def compound_statement(begin, children, end):
+	root = Compound()
+	root.children = children
+	return root
+
+def start_list(node):
+	return [node]
+
+def append_statement(nodes, semi, node):
+	nodes.append(node)
+	return nodes
+
+def factor(first, second=None, third=None):
+	if third is not None:
+		return second
+	if second is not None:
+		return UnaryOp(first, second)
+	return Num(first)
+
+ACTIONS = {
+	'program': lambda root, dot: root,
+	'compound_statement': compound_statement,
+	'statement_list': Fold(append_statement, start_list),
+	'assignment_statement': Assign,
+	'while_statement': lambda token, cond, do, body: While(token, cond, body),
+	'for_statement': lambda token, var, assign, start, to, end, do, body: For(token, var, start, end, body),
+	'empty': NoOp,
+	'expr': Fold(BinOp),
+	'term': Fold(BinOp),
+	'factor': factor,
+	'variable': Var,
+}
+
+
+###############################################################################
+#                                                                             #
+#  DRIVER                                                                     #
+#                                                                             #
+###############################################################################
+
+# Driver operations 【分析栈上的操作】
+SHIFT, RULE, ENTER, LOOP, FOLD, REDUCE, PUSH = range(7)
+
+class ParseTable(object):
+	'''
+	分析器使用的表
+	非终结符和循环都编译为 {单词类型: (倒序的压栈操作, 是否消耗当前单词, 消耗后立即执行的动作)}，
+	压栈操作中已经展开了不消耗单词的最左推导，分析器对每个单词只查一次表；
+	紧跟在被消耗单词之后的单符号归约直接作用在单词上，不再入栈
+	'''
+	def __init__(self, grammar, actions=None):
+		self.grammar = grammar
+		self.analysis = Analysis(grammar)
+		self.actions = ACTIONS if actions is None else actions
+		self.ops = {name: (RULE, {}) for name in grammar.rules}
+		self.names = {id(op): name for name, op in self.ops.items()}
+		self.loops = []			#(循环的预测行, 循环体的操作列表, 循环体非终结符)
+		self.forward = {}		#产生式 -> 按执行顺序的操作列表
+		for name, productions in grammar.rules.items():
+			for production in productions:
+				self.forward[id(production)] = self.compile(name, production)
+		for name, (_, row) in self.ops.items():
+			for token_type, production in self.analysis.predict[name].items():
+				row[token_type] = self.expand(self.forward[id(production)], token_type)
+		for row, forward, body in self.loops:
+			for token_type in self.analysis.first[body]:
+				row[token_type] = self.expand(forward, token_type)
+		self.start = self.ops[grammar.start]
+
+	def compile(self, name, production):
+		'''
+		产生式按执行顺序编译为操作列表，最后是归约操作
+		'''
+		action = self.actions.get(name)
+		if isinstance(action, Fold):
+			if len(production) != 2 or not isinstance(production[1], Repeat) or is_terminal(production[0]):
+				raise GrammarError('Rule {!r} cannot fold'.format(name))
+			return [self.ops[production[0]], self.loop(production[1], action)]
+		ops = []
+		for symbol in production:
+			if is_terminal(symbol):
+				ops.append((SHIFT, symbol))
+			elif isinstance(symbol, Repeat):
+				ops.append(self.loop(symbol))
+			else:
+				ops.append(self.ops[symbol])
+		if len(production) == 1 and production[0] in self.ops:
+			return ops
+		if action is None and name in self.grammar.helpers and len(production) > 1:
+			action = group
+		if action is None:
+			if len(production) != 1:
+				raise GrammarError('Rule {!r} needs an action'.format(name))
+		elif production:
+			ops.append((REDUCE, len(production), action))
+		else:
+			ops.append((PUSH, action))
+		return ops
+
+	def loop(self, repeat, fold=None):
+		'''
+		进入循环的操作，当前单词属于循环体的FIRST集合时执行循环体
+		ENTER压入收集循环项的列表，循环体之后的LOOP把循环项加入列表后继续循环；
+		折叠循环用FOLD进入，循环体之后的FOLD把循环项折叠到值中后继续循环
+		'''
+		row = {}
+		productions = self.grammar.rules[repeat.body]
+		if len(productions) == 1:
+			body = [(SHIFT, symbol) if is_terminal(symbol) else self.ops[symbol] for symbol in productions[0]]
+		else:
+			body = [self.ops[repeat.body]]
+		if fold is None:
+			self.loops.append((row, body + [(LOOP, row, len(body))], repeat.body))
+			return (ENTER, row)
+		self.loops.append((row, body + [(FOLD, row, len(body), fold.func, None)], repeat.body))
+		return (FOLD, row, 0, fold.func, fold.start)
+
+	def expand(self, forward, token_type):
+		'''
+		当前单词为token_type时展开最左的非终结符，
+		返回(倒序的压栈操作, 是否消耗当前单词, 消耗后立即执行的动作)
+		'''
+		forward = list(forward)
+		while forward and forward[0][0] == RULE:
+			name = self.names[id(forward.pop(0))]
+			production = self.analysis.predict[name][token_type]
+			forward = self.forward[id(production)] + forward
+		consume = bool(forward) and forward[0] == (SHIFT, token_type)
+		reduce = None
+		if consume:
+			forward.pop(0)
+			if forward and forward[0][0] == REDUCE and forward[0][1] == 1:
+				reduce = forward.pop(0)[2]
+		forward.reverse()
+		return tuple(forward), consume, reduce
+
+def build_table(text, actions=None):
+	'''
+	由文法说明生成分析表
+	'''
+	return ParseTable(Grammar(text), actions)
+
+_default_table = None
+
+def default_table():
+	'''
+	由inter模块的GRAMMAR生成的分析表，第一次使用时生成
+	'''
+	global _default_table
+	if _default_table is None:
+		import inter
+		_default_table = build_table(inter.__doc__)
+	return _default_table
+
+###############################################################################
+#                                                                             #
+#  SCANNER                                                                    #
+#                                                                             #
+###############################################################################
+
+# Punctuation tokens 【符号单词】
+PUNCTUATION = {
+	'+': PLUS, '-': MINUS, '*': MUL, '/': DIV, '(': LPAREN, ')': RPAREN,
+	':=': ASSIGN, ';': SEMI, '.': DOT,
+}
+
+# 分组: 1 整数, 2 标识符, 3 符号, 4 输入结束
+SCANNER = re.compile(r'\s*(?:([0-9]+)|([A-Za-z][A-Za-z0-9]*)|({})|()\Z)'.format(
+	'|'.join(re.escape(symbol) for symbol in sorted(PUNCTUATION, key=len, reverse=True))
+))
+WHITESPACE = re.compile(r'\s*')
+
+def scan(lexer):
+	'''
+	从lexer.pos开始逐个产生单词，结果与lexer.get_next_token()相同
+	只用于纯ASCII的输入，此时isdigit/isalpha/isalnum与上面的字符类一致
+	'''
+	text = lexer.text
+	offset = lexer.offset
+	symbols = lexer.symbols
+	words = {}		#标识符 -> (单词类型, 值, 编号)
+	keywords = RESERVED_KEYWORDS
+	punctuation = PUNCTUATION
+	match = SCANNER.scanner(text, lexer.pos).match
+	end = lexer.pos
+	while True:
+		found = match()
+		if found is None:
+			pos = WHITESPACE.match(text, end).end()
+			raise LexerError('Invalid character', offset + pos, lexer)
+		end = found.end()
+		kind = found.lastindex
+		value = found[kind]
+		pos = offset + found.start(kind)
+		if kind == 3:
+			yield Token(punctuation[value], value, pos)
+		elif kind == 2:
+			known = words.get(value)
+			if known is None:
+				keyword = keywords.get(value)
+				if keyword is not None:
+					known = (keyword.type, keyword.value)
+				else:
+					known = (ID, symbols.names[symbols.intern(value)])
+				words[value] = known
+			yield Token(known[0], known[1], pos)
+		elif kind == 1:
+			yield Token(INTEGER, int(value), pos)
+		else:
+			eof = Token(EOF, None, pos)
+			while True:
+				yield eof
+
+
+class TableParser(object):
+	'''
+	表驱动的非递归语法分析器，接口与Parser相同
+	'''
+	def __init__(self, lexer, table=None):
+		self.lexer = lexer
+		self.table = default_table() if table is None else table
+		self.current_token = self.lexer.get_next_token()
+
+	def error(self):
+		raise ParserError('Invalid syntax', self.current_token.pos, self.lexer)
+
+	def tokens(self):
+		'''
+		取下一个单词的函数
+		'''
+		lexer = self.lexer
+		if type(lexer) is Lexer and lexer.text.isascii():
+			return scan(lexer).__next__
+		return lexer.get_next_token
+
+	def parse(self):
+		next_token = self.tokens()
+		token = self.current_token
+		token_type = token.type
+		values = []
+		push = values.append
+		pop_value = values.pop
+		stack = [self.table.start]
+		pop = stack.pop
+		extend = stack.extend
+		failed = True
+		try:
+			while stack:
+				op = pop()
+				kind = op[0]
+				if kind == FOLD:
+					count = op[2]
+					if count == 2:
+						right = pop_value()
+						middle = pop_value()
+						values[-1] = op[3](values[-1], middle, right)
+					elif count:
+						args = values[-count - 1:]
+						del values[-count - 1:]
+						push(op[3](*args))
+					elif op[4] is not None:
+						values[-1] = op[4](values[-1])
+					entry = op[1].get(token_type)
+					if entry is None:
+						continue
+				elif kind == RULE:
+					entry = op[1].get(token_type)
+					if entry is None:
+						break
+				elif kind == REDUCE:
+					count = op[1]
+					args = values[-count:]
+					del values[-count:]
+					push(op[2](*args))
+					continue
+				elif kind == SHIFT:
+					if token_type != op[1]:
+						break
+					push(token)
+					token = next_token()
+					token_type = token.type
+					continue
+				elif kind == LOOP:
+					count = op[2]
+					if count == 1:
+						item = pop_value()
+					else:
+						item = tuple(values[-count:])
+						del values[-count:]
+					values[-1].append(item)
+					entry = op[1].get(token_type)
+					if entry is None:
+						continue
+				elif kind == ENTER:
+					push([])
+					entry = op[1].get(token_type)
+					if entry is None:
+						continue
+				else:
+					push(op[1]())
+					continue
+				ops, consume, reduce = entry
+				extend(ops)
+				if consume:
+					push(token if reduce is None else reduce(token))
+					token = next_token()
+					token_type = token.type
+			else:
+				#栈为空时正常结束；查表失败的break即使发生在最后一项上也要报错
+				failed = False
+		finally:
+			self.current_token = token
+		if failed or token.type != EOF:
+			self.error()
+		return values[0]
+
+
+def main():
+	table = default_table()
+	analysis = table.analysis
+	for name, productions in table.grammar.rules.items():
+		print('{} : {}'.format(name, '\n    | '.join(
+			' '.join(map(str, production)) or '<empty>' for production in productions
+		)))
+		print('    FIRST  {}'.format(' '.join(sorted(analysis.first[name]))))
+		print('    FOLLOW {}'.format(' '.join(sorted(analysis.follow[name]))))
+		for token_type, production in sorted(analysis.predict[name].items()):
+			print('    {:<8} -> {}'.format(token_type, ' '.join(map(str, production)) or '<empty>'))
+
+
+if __name__ == '__main__':
+	main()
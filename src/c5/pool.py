@@ -0,0 +1,322 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+预启动的解释器工作进程池
+
+工作进程常驻并预先导入解释器模块，按源程序缓存语法树，
+每个任务在独立的变量作用域中执行。工作进程完成max_jobs个任务
+或启动后内存峰值的增长超过max_memory后自动退出，由管理器补充新的进程；
+进程异常退出时，它正在执行的任务以BrokenProcessPool失败。
+
+	with WorkerPool(4) as pool:
+		future = pool.submit('BEGIN a := 1 END.')
+		scope = future.result()
+'''
+
+import itertools
+import multiprocessing
+import selectors
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from inter import Lexer, Parser, Interpreter
+
+PREFETCH = 2	#每个工作进程最多分到的任务数，其余的在管理器中排队
+
+###############################################################################
+#                                                                             #
+#  WORKER                                                                     #
+#                                                                             #
+###############################################################################
+
+def peak_memory():
+	'''
+	当前进程的内存峰值(字节)，不支持时返回0
+	ru_maxrss在macOS上以字节为单位，在Linux等系统上以KB为单位
+	'''
+	try:
+		import resource
+	except ImportError:
+		return 0
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak if sys.platform == 'darwin' else peak * 1024
+
+class TreeCache(object):
+	'''
+	按源程序缓存语法树(LRU)
+	'''
+	def __init__(self, size):
+		self.size = size
+		self.trees = OrderedDict()
+
+	def get(self, text):
+		tree = self.trees.get(text)
+		if tree is None:
+			tree = Parser(Lexer(text)).parse()
+			self.trees[text] = tree
+			if len(self.trees) > self.size:
+				self.trees.popitem(last=False)
+		else:
+			self.trees.move_to_end(text)
+		return tree
+
+def worker(jobs, results, max_jobs, max_memory, cache_size):
+	'''
+	工作进程主循环，jobs和results是与管理器之间的管道
+	fork出的进程继承父进程的内存峰值，所以内存按启动后的增长计算
+	'''
+	cache = TreeCache(cache_size)
+	base = peak_memory()
+	for done in itertools.count(1):
+		try:
+			job = jobs.recv()
+		except EOFError:
+			break
+		if job is None:
+			break
+		job_id, text = job
+		try:
+			interpreter = Interpreter(None, scope={})
+			interpreter.visit(cache.get(text))
+			result = (job_id, True, interpreter.GLOBAL_SCOPE)
+		except Exception as e:
+			result = (job_id, False, e)
+		last = done >= max_jobs or bool(max_memory and peak_memory() - base > max_memory)
+		results.send(result + (last,))
+		if last:
+			break
+
+
+###############################################################################
+#                                                                             #
+#  POOL                                                                       #
+#                                                                             #
+###############################################################################
+
+class Worker(object):
+	'''
+	管理器一侧的工作进程: 进程、任务管道和结果管道
+	进程按顺序执行分到的任务，最早分到的任务就是正在执行的任务
+	'''
+	def __init__(self, context, args):
+		jobs, self.jobs = context.Pipe(duplex=False)
+		self.results, results = context.Pipe(duplex=False)
+		self.process = context.Process(target=worker, args=(jobs, results) + args, daemon=True)
+		self.process.start()
+		jobs.close()
+		results.close()
+		self.queue = deque()	#已分到、还没有结果的任务(任务号, 程序)
+		self.last = False		#已执行完最后一个任务，即将退出
+
+	def close(self):
+		self.jobs.close()
+		self.results.close()
+
+class WorkerPool(object):
+	'''
+	工作进程池
+	size: 工作进程数
+	max_jobs: 单个进程最多执行的任务数，超过后回收
+	max_memory: 单个进程启动后内存峰值的增长上限(字节)，超过后回收
+	cache_size: 每个进程缓存的语法树数量
+	工作进程异常退出(段错误、被OOM终止等)时，它正在执行的任务以BrokenProcessPool失败，
+	并补充新的进程
+	'''
+	def __init__(self, size=None, max_jobs=10000, max_memory=None, cache_size=256):
+		if 'fork' in multiprocessing.get_all_start_methods():
+			self.context = multiprocessing.get_context('fork')
+		else:
+			self.context = multiprocessing.get_context()
+		self.size = size or self.context.cpu_count()
+		self.max_jobs = max_jobs
+		self.max_memory = max_memory
+		self.cache_size = cache_size
+
+		self.futures = {}
+		self.backlog = deque()		#等待空闲进程的任务(任务号, 程序)
+		self.ids = itertools.count()
+		self.lock = threading.Lock()
+		self.workers = []
+		self.recycled = 0
+		self.crashed = 0
+		self.closing = False
+		self.wakeup, self.waker = self.context.Pipe(duplex=False)
+		#只由收集线程使用(启动收集线程之前除外)
+		self.selector = selectors.DefaultSelector()
+		self.selector.register(self.wakeup, selectors.EVENT_READ)
+
+		for _ in range(self.size):
+			self.spawn()
+		self.collector = threading.Thread(target=self.collect, daemon=True)
+		self.collector.start()
+
+	def spawn(self):
+		worker = Worker(self.context, (self.max_jobs, self.max_memory, self.cache_size))
+		self.selector.register(worker.results, selectors.EVENT_READ, worker)
+		self.selector.register(worker.process.sentinel, selectors.EVENT_READ, worker)
+		self.workers.append(worker)
+		self.schedule()
+
+	def schedule(self):
+		'''
+		把等待的任务分给空闲的工作进程，调用时持有self.lock
+		'''
+		for worker in self.workers:
+			while self.backlog and len(worker.queue) < PREFETCH and not worker.last:
+				job = self.backlog.popleft()
+				worker.queue.append(job)
+				try:
+					worker.jobs.send(job)
+				except OSError:
+					#进程已退出，由收集线程处理
+					break
+			if not self.backlog:
+				break
+
+	def collect(self):
+		'''
+		收集线程: 把结果交给对应的Future，补充退出的工作进程
+		'''
+		while True:
+			exited = []
+			for key, _ in self.selector.select():
+				worker = key.data
+				if worker is None:
+					return
+				if worker in exited:
+					continue
+				if key.fileobj is worker.results:
+					if not self.drain(worker):
+						exited.append(worker)
+				else:
+					exited.append(worker)
+			for worker in exited:
+				self.reap(worker)
+
+	def receive(self, worker):
+		'''
+		接收一个结果，管道已关闭时返回False
+		'''
+		try:
+			job_id, ok, value, last = worker.results.recv()
+		except EOFError:
+			return False
+		with self.lock:
+			worker.queue.popleft()
+			worker.last = last
+			if last:
+				#进程不再读取任务，分到的其余任务重新排队
+				self.backlog.extendleft(reversed(worker.queue))
+				worker.queue.clear()
+			future = self.futures.pop(job_id)
+			self.schedule()
+		if ok:
+			future.set_result(value)
+		else:
+			future.set_exception(value)
+		return True
+
+	def drain(self, worker):
+		'''
+		接收管道中已有的全部结果，管道已关闭时返回False
+		'''
+		while self.receive(worker):
+			if not worker.results.poll():
+				return True
+		return False
+
+	def reap(self, worker):
+		'''
+		工作进程已退出: 取走管道中剩余的结果，正在执行的任务以异常结束，
+		还没有开始的任务重新排队，补充新的进程
+		'''
+		if worker.results.poll():
+			self.drain(worker)
+		self.selector.unregister(worker.results)
+		self.selector.unregister(worker.process.sentinel)
+		worker.process.join()
+		worker.close()
+		with self.lock:
+			self.workers.remove(worker)
+			future = None
+			if worker.queue:
+				future = self.futures.pop(worker.queue.popleft()[0])
+				self.backlog.extendleft(reversed(worker.queue))
+				worker.queue.clear()
+			if worker.last:
+				self.recycled += 1
+			elif not self.closing:
+				self.crashed += 1
+			if not self.closing:
+				self.spawn()
+		if future is not None:
+			future.set_exception(BrokenProcessPool(
+				'Worker process {} exited with code {}'.format(worker.process.pid, worker.process.exitcode)
+			))
+
+	def submit(self, text):
+		'''
+		提交一个程序，返回Future，结果为程序执行后的变量字典
+		'''
+		future = Future()
+		job_id = next(self.ids)
+		with self.lock:
+			self.futures[job_id] = future
+			self.backlog.append((job_id, text))
+			self.schedule()
+		return future
+
+	def run(self, text):
+		'''
+		执行一个程序并等待结果
+		'''
+		return self.submit(text).result()
+
+	def map(self, texts):
+		'''
+		批量执行程序，按输入顺序返回结果
+		'''
+		futures = [self.submit(text) for text in texts]
+		return [future.result() for future in futures]
+
+	async def evaluate(self, text):
+		'''
+		在asyncio中等待程序执行结果
+		'''
+		import asyncio
+		return await asyncio.wrap_future(self.submit(text))
+
+	def close(self):
+		'''
+		等待已提交的任务完成后关闭进程池
+		'''
+		with self.lock:
+			pending = list(self.futures.values())
+		wait(pending)
+		with self.lock:
+			self.closing = True
+			workers = list(self.workers)
+		for worker in workers:
+			try:
+				worker.jobs.send(None)
+			except OSError:
+				pass
+		for worker in workers:
+			worker.process.join()
+		self.waker.send(None)
+		self.collector.join()
+		for worker in workers:
+			worker.close()
+		self.selector.close()
+		self.wakeup.close()
+		self.waker.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
@@ -0,0 +1,242 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+语法树的二进制交换格式
+
+	header  : MAGIC VERSION
+	names   : varint(count) (varint(len) utf8)*
+	tree    : node
+
+	node    : COMPOUND varint(count) node*
+	        | ASSIGN varint(name) node
+	        | VAR varint(name)
+	        | NUM zigzag-varint(value)
+	        | (ADD | SUB | MUL | DIV) node node
+	        | (POS | NEG) node
+	        | NOOP
+	        | WHILE node node
+	        | FOR varint(name) node node node
+
+节点类型和整数都用varint编码，标识符统一放入名字表，节点中只保存下标。
+解码直接在memoryview上进行，不复制输入。
+'''
+
+from inter import (
+	PLUS, MINUS, MUL, DIV, INTEGER, ID, ASSIGN, WHILE, FOR,
+	Token, BinOp, UnaryOp, Num, Compound, Assign, Var, NoOp, While, For, NodeVisitor
+)
+
+MAGIC = b'C5T'
+VERSION = 1
+
+# Node kinds 【节点类型】
+(
+	K_COMPOUND, K_ASSIGN, K_VAR, K_NUM, K_ADD,
+	K_SUB, K_MUL, K_DIV, K_POS, K_NEG, K_NOOP,
+	K_WHILE, K_FOR
+) = range(13)
+
+BINOP_KINDS = {PLUS: K_ADD, MINUS: K_SUB, MUL: K_MUL, DIV: K_DIV}
+UNARY_KINDS = {PLUS: K_POS, MINUS: K_NEG}
+
+class FormatError(Exception):
+	'''
+	数据格式错误
+	'''
+	pass
+
+###############################################################################
+#                                                                             #
+#  ENCODER                                                                    #
+#                                                                             #
+###############################################################################
+
+def write_varint(out, value):
+	'''
+	写入无符号varint(LEB128)
+	'''
+	while value > 0x7f:
+		out.append((value & 0x7f) | 0x80)
+		value >>= 7
+	out.append(value)
+
+class Encoder(NodeVisitor):
+	'''
+	把语法树编码为字节序列
+	'''
+	def __init__(self):
+		self.out = bytearray()
+		self.names = {}
+
+	def name(self, name):
+		index = self.names.get(name)
+		if index is None:
+			index = self.names[name] = len(self.names)
+		return index
+
+	def visit_Compound(self, node):
+		self.out.append(K_COMPOUND)
+		write_varint(self.out, len(node.children))
+		for child in node.children:
+			self.visit(child)
+
+	def visit_Assign(self, node):
+		self.out.append(K_ASSIGN)
+		write_varint(self.out, self.name(node.left.value))
+		self.visit(node.right)
+
+	def visit_Var(self, node):
+		self.out.append(K_VAR)
+		write_varint(self.out, self.name(node.value))
+
+	def visit_Num(self, node):
+		value = node.value
+		if not isinstance(value, int):
+			raise FormatError('Unsupported literal {!r}'.format(value))
+		self.out.append(K_NUM)
+		write_varint(self.out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+
+	def visit_BinOp(self, node):
+		self.out.append(BINOP_KINDS[node.op.type])
+		self.visit(node.left)
+		self.visit(node.right)
+
+	def visit_UnaryOp(self, node):
+		self.out.append(UNARY_KINDS[node.op.type])
+		self.visit(node.expr)
+
+	def visit_NoOp(self, node):
+		self.out.append(K_NOOP)
+
+	def visit_While(self, node):
+		self.out.append(K_WHILE)
+		self.visit(node.cond)
+		self.visit(node.body)
+
+	def visit_For(self, node):
+		self.out.append(K_FOR)
+		write_varint(self.out, self.name(node.var.value))
+		self.visit(node.start)
+		self.visit(node.end)
+		self.visit(node.body)
+
+	def encode(self, tree):
+		self.visit(tree)
+
+		header = bytearray(MAGIC)
+		write_varint(header, VERSION)
+		write_varint(header, len(self.names))
+		for name in self.names:
+			data = name.encode('utf-8')
+			write_varint(header, len(data))
+			header += data
+		return bytes(header + self.out)
+
+def dumps(tree):
+	'''
+	把语法树编码为字节序列
+	'''
+	return Encoder().encode(tree)
+
+
+###############################################################################
+#                                                                             #
+#  DECODER                                                                    #
+#                                                                             #
+###############################################################################
+
+OPERATORS = {
+	K_ADD: Token(PLUS, '+'),
+	K_SUB: Token(MINUS, '-'),
+	K_MUL: Token(MUL, '*'),
+	K_DIV: Token(DIV, '/'),
+	K_POS: Token(PLUS, '+'),
+	K_NEG: Token(MINUS, '-'),
+}
+ASSIGN_TOKEN = Token(ASSIGN, ':=')
+WHILE_TOKEN = Token(WHILE, 'WHILE')
+FOR_TOKEN = Token(FOR, 'FOR')
+
+def loads(data, symbols=None):
+	'''
+	从字节序列(bytes/bytearray/memoryview)解码出语法树
+	运算符和同名变量的Token在节点间共享；
+	给出symbols(SymbolTable)时，标识符登记到该表中并使用表中的字符串
+	'''
+	buf = memoryview(data)
+	if buf[:len(MAGIC)] != MAGIC:
+		raise FormatError('Bad magic')
+	pos = len(MAGIC)
+
+	def varint():
+		nonlocal pos
+		byte = buf[pos]
+		pos += 1
+		if byte < 0x80:
+			return byte
+		result = byte & 0x7f
+		shift = 7
+		while True:
+			byte = buf[pos]
+			pos += 1
+			result |= (byte & 0x7f) << shift
+			if byte < 0x80:
+				return result
+			shift += 7
+
+	version = varint()
+	if version != VERSION:
+		raise FormatError('Unsupported version {}'.format(version))
+
+	names = []
+	for _ in range(varint()):
+		size = varint()
+		names.append(str(buf[pos:pos + size], 'utf-8'))
+		pos += size
+	if symbols is None:
+		tokens = [Token(ID, name) for name in names]
+	else:
+		tokens = [Token(ID, symbols.names[symbols.intern(name)]) for name in names]
+
+	def node():
+		nonlocal pos
+		kind = buf[pos]
+		pos += 1
+		if kind == K_NUM:
+			value = varint()
+			value = -((value + 1) >> 1) if value & 1 else value >> 1
+			return Num(Token(INTEGER, value))
+		if kind == K_VAR:
+			return Var(tokens[varint()])
+		if K_ADD <= kind <= K_DIV:
+			left = node()
+			return BinOp(left, OPERATORS[kind], node())
+		if kind == K_ASSIGN:
+			left = Var(tokens[varint()])
+			return Assign(left, ASSIGN_TOKEN, node())
+		if kind == K_COMPOUND:
+			root = Compound()
+			root.children = [node() for _ in range(varint())]
+			return root
+		if kind == K_POS or kind == K_NEG:
+			return UnaryOp(OPERATORS[kind], node())
+		if kind == K_NOOP:
+			return NoOp()
+		if kind == K_WHILE:
+			cond = node()
+			return While(WHILE_TOKEN, cond, node())
+		if kind == K_FOR:
+			var = Var(tokens[varint()])
+			start = node()
+			end = node()
+			return For(FOR_TOKEN, var, start, end, node())
+		raise FormatError('Unknown node kind {}'.format(kind))
+
+	try:
+		tree = node()
+	except IndexError:
+		raise FormatError('Truncated data')
+	if pos != len(buf):
+		raise FormatError('Trailing data')
+	return tree
@@ -0,0 +1,297 @@
+# __author__: newtorn
+# __date__: 2026-10-19
+
+'''
+按形状分组的批量表达式求值
+
+大量单行表达式往往只有少数几种结构，区别只在整数字面量。BatchEvaluator把
+每个表达式中的字面量替换为0得到模板，每种模板只解析一次；语法树相同的模板
+属于同一形状，形状中的字面量按出现顺序编号为列:
+
+	3 + 4 * (2 - 1)   ->   模板 0 + 0 * (0 - 0)，列 [3, 4, 2, 1]
+
+每个形状的一组表达式用NumPy按列一次算完，没有NumPy或组太小时用编译好的
+闭包逐行计算，结果按输入顺序返回。结果与Parser.expr + Interpreter逐个求值相同:
+
+	整数列用int64计算并检查溢出；浮点运算与Python的float相同(IEEE双精度)
+	整数真除法在操作数不超过2**53时等于两者转换为浮点数后相除
+	超出int64、可能溢出、除数为0等NumPy无法给出相同结果的行，
+	以及含非ASCII字符的表达式，交给标量Interpreter
+
+	results = BatchEvaluator().evaluate(['3 + 4 * (2 - 1)', '1 / 0', '7 - 2'])
+	# [7, ZeroDivisionError('division by zero'), 5]
+
+求值出错的表达式在结果中对应异常对象。
+'''
+
+import operator
+import re
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from inter import PLUS, MINUS, MUL, DIV, EOF, BinOp, UnaryOp, Num, Var, Lexer, Parser, Interpreter
+
+#不属于标识符的整数字面量(仅用于ASCII文本)，split后奇数位置是字面量
+NUMBER = re.compile(r'(?<![A-Za-z0-9])([0-9]+)')
+
+INT64_MIN = -2 ** 63
+PRODUCT_LIMIT = 2.0 ** 62	#浮点估计的积小于此值时int64乘法不会溢出
+EXACT_LIMIT = 2 ** 53		#不超过此值的整数可以精确转换为浮点数
+
+BINARY = {PLUS: operator.add, MINUS: operator.sub, MUL: operator.mul, DIV: operator.truediv}
+UNARY = {PLUS: operator.pos, MINUS: operator.neg}
+
+def parse_expression(text):
+	'''
+	与Parser.expr + EOF检查相同的表达式解析
+	'''
+	parser = Parser(Lexer(text))
+	tree = parser.expr()
+	if parser.current_token.type != EOF:
+		parser.error()
+	return tree
+
+def evaluate_scalar(text, scope=None):
+	'''
+	标量路径: Parser.expr + Interpreter，出错时返回异常对象
+	'''
+	try:
+		return Interpreter(None, scope).visit(parse_expression(text))
+	except Exception as e:
+		return e
+
+class Shape(object):
+	'''
+	表达式的形状: 字面量换为列号的语法树
+	'''
+	def __init__(self, tree):
+		self.tree = tree
+		self.width = 0
+		self.key = self.number(tree)
+		self.scalar = self.compile(tree)
+
+	def number(self, node):
+		'''
+		按出现顺序给字面量编号(写入Num.value)，返回与字面量无关的结构键
+		'''
+		if isinstance(node, Num):
+			node.value = self.width
+			self.width += 1
+			return 0
+		if isinstance(node, Var):
+			return node.value
+		if isinstance(node, UnaryOp):
+			return (node.op.type, self.number(node.expr))
+		left = self.number(node.left)
+		return (node.op.type, left, self.number(node.right))
+
+	def compile(self, node):
+		'''
+		编译为 f(row, scope)，row是该行的字面量
+		'''
+		if isinstance(node, Num):
+			index = node.value
+			return lambda row, scope: row[index]
+		if isinstance(node, Var):
+			name = node.value
+
+			def load(row, scope):
+				value = scope.get(name)
+				if value is None:
+					raise NameError(repr(name))
+				return value
+			return load
+		if isinstance(node, UnaryOp):
+			op = UNARY[node.op.type]
+			expr = self.compile(node.expr)
+			return lambda row, scope: op(expr(row, scope))
+		op = BINARY[node.op.type]
+		left = self.compile(node.left)
+		right = self.compile(node.right)
+		return lambda row, scope: op(left(row, scope), right(row, scope))
+
+	def columns(self, node, matrix, scope, bad):
+		'''
+		按列计算node，返回(数组, 是否为浮点)；bad标记结果与Python不同的行
+		变量取值不是int64或float时返回None
+		'''
+		if isinstance(node, Num):
+			return matrix[:, node.value], False
+		if isinstance(node, Var):
+			value = scope.get(node.value)
+			if type(value) is float:
+				return numpy.full(len(matrix), value), True
+			if type(value) is int and INT64_MIN <= value < -INT64_MIN:
+				return numpy.full(len(matrix), value, numpy.int64), False
+			return None
+		if isinstance(node, UnaryOp):
+			result = self.columns(node.expr, matrix, scope, bad)
+			if result is None or node.op.type == PLUS:
+				return result
+			values, floating = result
+			if not floating:
+				bad |= values == INT64_MIN
+			return -values, floating
+
+		left = self.columns(node.left, matrix, scope, bad)
+		right = self.columns(node.right, matrix, scope, bad)
+		if left is None or right is None:
+			return None
+		(a, afloat), (b, bfloat) = left, right
+		op = node.op.type
+		if op == DIV:
+			bad |= b == 0
+			if not afloat:
+				bad |= (a > EXACT_LIMIT) | (a < -EXACT_LIMIT)
+				a = a.astype(numpy.float64)
+			if not bfloat:
+				bad |= (b > EXACT_LIMIT) | (b < -EXACT_LIMIT)
+				b = b.astype(numpy.float64)
+			#除数为0的行已标记，先换为1避免警告
+			return a / numpy.where(b == 0, 1.0, b), True
+		if afloat or bfloat:
+			return BINARY[op](a.astype(numpy.float64), b.astype(numpy.float64)), True
+		if op == MUL:
+			estimate = a.astype(numpy.float64) * b.astype(numpy.float64)
+			bad |= numpy.abs(estimate) >= PRODUCT_LIMIT
+			return a * b, False
+		result = BINARY[op](a, b)
+		if op == PLUS:
+			bad |= ((a ^ result) & (b ^ result)) < 0
+		else:
+			bad |= ((a ^ b) & (a ^ result)) < 0
+		return result, False
+
+	def vectorized(self, flat, count, scope):
+		'''
+		按列计算count行字面量(按行展开为flat)，返回(结果列表, 需要标量求值的行号)，
+		无法按列计算时返回None
+		'''
+		width = self.width
+		big = []
+		try:
+			matrix = numpy.array(flat, numpy.int64)
+		except OverflowError:
+			big = sorted({i // width for i, value in enumerate(flat) if not INT64_MIN <= value < -INT64_MIN})
+			flat = list(flat)
+			for i in big:
+				flat[i * width:(i + 1) * width] = [0] * width
+			matrix = numpy.array(flat, numpy.int64)
+		matrix = matrix.reshape(count, width)
+		bad = numpy.zeros(count, bool)
+		bad[big] = True
+		with numpy.errstate(all='ignore'):
+			result = self.columns(self.tree, matrix, scope, bad)
+		if result is None:
+			return None
+		return result[0].tolist(), numpy.flatnonzero(bad).tolist()
+
+class BatchEvaluator(object):
+	'''
+	批量求值单行表达式
+	scope: 表达式中变量的作用域，默认为Interpreter.GLOBAL_SCOPE
+	vectorize: 是否使用NumPy(未安装时总是逐行计算)
+	min_group: 使用NumPy的最小组大小
+	max_templates: 缓存的模板数，超过后清空
+	'''
+	def __init__(self, scope=None, vectorize=True, min_group=16, max_templates=4096):
+		self.scope = Interpreter.GLOBAL_SCOPE if scope is None else scope
+		self.vectorize = vectorize and numpy is not None
+		self.min_group = min_group
+		self.max_templates = max_templates
+		self.templates = {}		#模板 -> Shape，无法解析的模板 -> None
+		self.shapes = {}		#结构键 -> Shape
+		self.fallbacks = 0		#交给标量Interpreter的表达式数
+
+	def shape(self, template):
+		try:
+			shape = Shape(parse_expression(template))
+		except Exception:
+			#语法错误按原文逐个报告
+			return None
+		return self.shapes.setdefault(shape.key, shape)
+
+	def convert(self, indices, literals, width, scalar):
+		'''
+		逐行转换字面量，转换失败的行加入scalar，返回(其余行的下标, 字面量)
+		'''
+		kept = []
+		flat = []
+		for row, index in enumerate(indices):
+			try:
+				values = [int(literal) for literal in literals[row * width:(row + 1) * width]]
+			except ValueError:
+				scalar.append(index)
+				continue
+			kept.append(index)
+			flat.extend(values)
+		return kept, flat
+
+	def evaluate(self, texts):
+		'''
+		返回各表达式的值，出错的表达式对应异常对象
+		'''
+		if len(self.templates) > self.max_templates:
+			self.templates.clear()
+			self.shapes.clear()
+		templates = self.templates
+		split = NUMBER.split
+		groups = {}		#Shape -> (下标, 按行展开的字面量文本)
+		scalar = []
+		for index, text in enumerate(texts):
+			if not text.isascii():
+				scalar.append(index)
+				continue
+			parts = split(text)
+			template = '0'.join(parts[0::2])
+			shape = templates.get(template, False)
+			if shape is False:
+				shape = templates[template] = self.shape(template)
+			if shape is None:
+				scalar.append(index)
+				continue
+			group = groups.get(shape)
+			if group is None:
+				group = groups[shape] = ([], [])
+			group[0].append(index)
+			group[1].extend(parts[1::2])
+
+		results = [None] * len(texts)
+		scope = self.scope
+		for shape, (indices, literals) in groups.items():
+			try:
+				flat = list(map(int, literals))
+			except ValueError:
+				#超过int的位数限制的字面量，该行交给标量路径报告异常
+				indices, flat = self.convert(indices, literals, shape.width, scalar)
+				if not indices:
+					continue
+			if self.vectorize and len(indices) >= self.min_group:
+				vectorized = shape.vectorized(flat, len(indices), scope)
+				if vectorized is not None:
+					values, bad = vectorized
+					for index, value in zip(indices, values):
+						results[index] = value
+					scalar.extend(indices[i] for i in bad)
+					continue
+			function = shape.scalar
+			width = shape.width
+			for row, index in enumerate(indices):
+				try:
+					results[index] = function(flat[row * width:(row + 1) * width], scope)
+				except Exception:
+					scalar.append(index)
+
+		self.fallbacks += len(scalar)
+		for index in scalar:
+			results[index] = evaluate_scalar(texts[index], scope)
+		return results
+
+def evaluate_batch(texts, scope=None):
+	'''
+	按形状分组求值一批表达式，结果按输入顺序返回
+	'''
+	return BatchEvaluator(scope).evaluate(texts)